@@ -37,16 +37,24 @@ from __future__ import annotations
 
 import argparse
 import asyncio
+import contextlib
+import csv
+import dataclasses
+import importlib.util
+import itertools
 import json
 import math
+import multiprocessing
 import os
-import statistics
+import random
+import re
 import sys
 import time
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterator, Awaitable, Callable, TextIO
 
 import httpx
 import urllib3
@@ -54,6 +62,49 @@ import urllib3
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Hit fields the benchmark reads from each phase; also what the non-"source"
+# retrieval modes ask ES for
+ROOT_FIELDS = ("transaction_type", "brand_transaction_id")
+SUB_FIELDS = ("transaction_type", "related_product_transaction_uuid")
+
+RETRIEVAL_MODES = ("source", "source-includes", "docvalue", "fields")
+DISPATCH_MODES = ("per-request", "msearch")
+STRATEGIES = ("two-step", "aggs")
+LOAD_MODELS = ("closed", "open")
+LOAD_PROFILES = ("fixed", "step", "linear", "slo-search")
+CONNECTION_MODES = ("pooled", "small-pool", "fresh", "http2")
+ON_ERROR_MODES = ("abort", "continue", "retry")
+CLIENT_CACHE_MODES = ("off", "root", "full")
+WORKLOADS = ("round-robin", "zipf", "weighted", "replay")
+# Statuses worth retrying; anything else (bad query, missing index) fails fast
+RETRYABLE_STATUSES = (0, 429, 500, 502, 503, 504)
+# httpcore trace steps recorded as connection setup histograms
+TRACE_METRICS = {
+    "connection.connect_tcp": "connect_ms",
+    "connection.start_tls": "tls_ms",
+}
+# Scenario fields that --range/--root-size/... sweep, with their label names
+SWEEP_NAMES = {
+    "range_value": "range",
+    "root_size": "root",
+    "sub_multiplier": "sub_x",
+    "request_cache": "request_cache",
+    "routing": "routing",
+}
+FILTER_PATH = (
+    "took,pit_id,hits.total,hits.hits._id,hits.hits._source,hits.hits.fields,"
+    "hits.hits.sort,aggregations.by_root.buckets.key,"
+    "aggregations.by_root.buckets.children"
+)
+# Runtime keyword that puts a root and its children in one terms bucket: the
+# child's related_product_transaction_uuid, else the root's brand_transaction_id
+ROOT_KEY_SCRIPT = (
+    "if (doc['related_product_transaction_uuid'].size() > 0) "
+    "{ emit(doc['related_product_transaction_uuid'].value); } "
+    "else if (doc['brand_transaction_id'].size() > 0) "
+    "{ emit(doc['brand_transaction_id'].value); }"
+)
+
 
 @dataclass
 class IterationResult:
@@ -66,13 +117,769 @@ class IterationResult:
     root_decode_ms: float
     root_hits: int
     root_brand_ids: int
+    root_bytes: int
     sub_wall_ms: float
     sub_es_took_ms: int | None
     sub_ttfb_ms: float
     sub_read_ms: float
     sub_decode_ms: float
     sub_hits: int
+    sub_bytes: int
     total_wall_ms: float
+    # Per page depth when paginating; the root_*/sub_* fields describe page 1
+    page_root_wall_ms: list[float] = field(default_factory=list)
+    page_root_took_ms: list[int | None] = field(default_factory=list)
+    page_total_wall_ms: list[float] = field(default_factory=list)
+    pit_open_ms: float | None = None
+    pit_close_ms: float | None = None
+    # Open-loop only: wait for a concurrency slot, and latency from the
+    # scheduled send time (queue delay + total wall)
+    queue_delay_ms: float | None = None
+    response_ms: float | None = None
+
+
+@dataclass(frozen=True)
+class Scenario:
+    retrieval: str = "source"
+    filter_path: bool = False
+    dispatch: str = "per-request"
+    strategy: str = "two-step"
+    load_model: str = "closed"
+    connection: str = "pooled"
+    hedge: str = "off"
+    client_cache: str = "off"
+    range_value: str = "6m"
+    root_size: int = 100
+    sub_multiplier: float = 2.0
+    request_cache: str = "false"
+    routing: bool = False
+    # Sweep parameters that vary between scenarios, shown in the label
+    swept: tuple[str, ...] = ()
+
+    @property
+    def sub_size(self) -> int:
+        return max(1, int(self.root_size * self.sub_multiplier))
+
+    def window(self, now: datetime | None = None) -> tuple[str, str]:
+        now = now or datetime.now(timezone.utc)
+        months = parse_range(self.range_value)
+        return iso_utc(now - timedelta(days=30 * months)), iso_utc(now)
+
+    def sweep_value(self, name: str) -> str:
+        value = getattr(self, name)
+        if name == "routing":
+            return "on" if value else "off"
+        return f"{value:g}" if isinstance(value, float) else str(value)
+
+    @property
+    def sweep_label(self) -> str:
+        return " ".join(f"{SWEEP_NAMES[n]}={self.sweep_value(n)}" for n in self.swept)
+
+    @property
+    def label(self) -> str:
+        label = self.retrieval
+        if self.strategy != "two-step":
+            label = f"{self.strategy}:{label}"
+        if self.filter_path:
+            label = f"{label}+filter_path"
+        if self.dispatch != "per-request":
+            label = f"{label}+{self.dispatch}"
+        if self.load_model != "closed":
+            label = f"{label}+{self.load_model}"
+        if self.connection != "pooled":
+            label = f"{label}+{self.connection}"
+        if self.hedge != "off":
+            label = f"{label}+hedge-{self.hedge}"
+        if self.client_cache != "off":
+            label = f"{label}+cache-{self.client_cache}"
+        if self.swept:
+            label = f"{label} {self.sweep_label}"
+        return label
+
+    @property
+    def base_label(self) -> str:
+        # The label without the sweep parameters; groups the sweep matrix
+        return Scenario(
+            self.retrieval,
+            self.filter_path,
+            self.dispatch,
+            self.strategy,
+            self.load_model,
+            self.connection,
+            self.hedge,
+            self.client_cache,
+        ).label
+
+
+class HdrHistogram:
+    """
+    Log-linear histogram in the style of HdrHistogram.
+
+    Values are scaled to integer units; below 2**bits they are counted
+    exactly, above that each power of two is split into 2**(bits-1) equal
+    sub-buckets, so the relative error stays under 1 / 2**(bits-1) (0.2%
+    at the default 10 bits). Counts are kept sparse, memory is bounded by
+    the value range rather than the sample count, and two histograms with
+    the same unit/bits merge by adding counts.
+    """
+
+    def __init__(self, unit: float = 0.001, bits: int = 10) -> None:
+        self.unit = unit
+        self.bits = bits
+        self.half = 1 << (bits - 1)
+        self.counts: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min: float | None = None
+        self.max: float | None = None
+
+    def _index(self, value: float) -> int:
+        scaled = max(int(value / self.unit), 0)
+        shift = scaled.bit_length() - self.bits
+        if shift <= 0:
+            return scaled
+        return shift * self.half + (scaled >> shift)
+
+    def _value(self, index: int) -> float:
+        # Midpoint of the bucket, in the caller's units
+        if index < (1 << self.bits):
+            return index * self.unit
+        shift = index // self.half - 1
+        mantissa = index - shift * self.half
+        low = mantissa << shift
+        return (low + ((1 << shift) - 1) / 2.0) * self.unit
+
+    def record(self, value: float) -> None:
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: HdrHistogram) -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def mean(self) -> float | None:
+        return self.total / self.count if self.count else None
+
+    def percentile(self, p: float) -> float | None:
+        # Nearest rank, same convention as the list-based percentiles before
+        if not self.count:
+            return None
+        rank = max(1, math.ceil((p / 100.0) * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "unit": self.unit,
+            "bits": self.bits,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "counts": {str(k): v for k, v in self.counts.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> HdrHistogram:
+        hist = cls(data["unit"], data["bits"])
+        hist.counts = {int(k): v for k, v in data["counts"].items()}
+        hist.count = data["count"]
+        hist.total = data["total"]
+        hist.min = data["min"]
+        hist.max = data["max"]
+        return hist
+
+
+# IterationResult fields recorded into histograms, with their unit
+STAT_UNITS = {
+    "root_wall_ms": 0.001,
+    "root_ttfb_ms": 0.001,
+    "root_read_ms": 0.001,
+    "root_decode_ms": 0.001,
+    "root_es_took_ms": 1,
+    "root_bytes": 1,
+    "sub_wall_ms": 0.001,
+    "sub_ttfb_ms": 0.001,
+    "sub_read_ms": 0.001,
+    "sub_decode_ms": 0.001,
+    "sub_es_took_ms": 1,
+    "sub_bytes": 1,
+    "total_wall_ms": 0.001,
+    "queue_delay_ms": 0.001,
+    "response_ms": 0.001,
+    "pit_open_ms": 0.001,
+    "pit_close_ms": 0.001,
+}
+# Small-cardinality counts reported as the set of distinct values
+STAT_DISTINCT = ("root_hits", "root_brand_ids", "sub_hits")
+PAGE_STATS = {
+    "page_root_wall_ms": 0.001,
+    "page_root_took_ms": 1,
+    "page_total_wall_ms": 0.001,
+}
+
+
+def hit_bucket(hits: int) -> int:
+    # Lower bound of the power-of-ten bucket: 0, 1, 10, 100, ...
+    return 10 ** (len(str(hits)) - 1) if hits > 0 else 0
+
+
+class RunStats:
+    """Constant-memory aggregate of the IterationResults of one run."""
+
+    def __init__(self) -> None:
+        self.runs = 0
+        self.histograms: dict[str, HdrHistogram] = {}
+        self.distinct: dict[str, set[int]] = {name: set() for name in STAT_DISTINCT}
+        # One {field: histogram} dict per page depth
+        self.pages: list[dict[str, HdrHistogram]] = []
+        self.counters: dict[str, int] = {}
+        # Iterations and hit counts (the account's document volume in range)
+        self.accounts: dict[str, dict[str, int]] = {}
+        # Total wall time per account, and per power-of-ten root hit bucket
+        self.account_latency: dict[str, HdrHistogram] = {}
+        self.hit_buckets: dict[int, HdrHistogram] = {}
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def hist(self, name: str) -> HdrHistogram:
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = HdrHistogram(STAT_UNITS.get(name, 0.001))
+        return hist
+
+    def page_hist(self, page: int, name: str) -> HdrHistogram:
+        while len(self.pages) <= page:
+            self.pages.append({})
+        hist = self.pages[page].get(name)
+        if hist is None:
+            hist = self.pages[page][name] = HdrHistogram(PAGE_STATS[name])
+        return hist
+
+    def add(self, result: IterationResult) -> None:
+        self.runs += 1
+        for name in STAT_UNITS:
+            value = getattr(result, name)
+            if value is not None:
+                self.hist(name).record(value)
+        for name in STAT_DISTINCT:
+            self.distinct[name].add(getattr(result, name))
+        for name in PAGE_STATS:
+            for page, value in enumerate(getattr(result, name)):
+                if value is not None:
+                    self.page_hist(page, name).record(value)
+        account = self.account(result.account_uuid)
+        account["iterations"] += 1
+        account["root_hits"] = max(account["root_hits"], result.root_hits)
+        account["sub_hits"] = max(account["sub_hits"], result.sub_hits)
+        self.latency_hist(self.account_latency, result.account_uuid).record(
+            result.total_wall_ms
+        )
+        self.latency_hist(self.hit_buckets, hit_bucket(result.root_hits)).record(
+            result.total_wall_ms
+        )
+
+    @staticmethod
+    def latency_hist(hists: dict[Any, HdrHistogram], key: Any) -> HdrHistogram:
+        hist = hists.get(key)
+        if hist is None:
+            hist = hists[key] = HdrHistogram()
+        return hist
+
+    def account(self, account_uuid: str) -> dict[str, int]:
+        account = self.accounts.get(account_uuid)
+        if account is None:
+            account = self.accounts[account_uuid] = {
+                "iterations": 0,
+                "root_hits": 0,
+                "sub_hits": 0,
+            }
+        return account
+
+    def merge(self, other: RunStats) -> None:
+        self.runs += other.runs
+        for name, hist in other.histograms.items():
+            self.hist(name).merge(hist)
+        for name, values in other.distinct.items():
+            self.distinct.setdefault(name, set()).update(values)
+        for page, hists in enumerate(other.pages):
+            for name, hist in hists.items():
+                self.page_hist(page, name).merge(hist)
+        for name, amount in other.counters.items():
+            self.count(name, amount)
+        for account_uuid, values in other.accounts.items():
+            account = self.account(account_uuid)
+            account["iterations"] += values["iterations"]
+            account["root_hits"] = max(account["root_hits"], values["root_hits"])
+            account["sub_hits"] = max(account["sub_hits"], values["sub_hits"])
+        for account_uuid, hist in other.account_latency.items():
+            self.latency_hist(self.account_latency, account_uuid).merge(hist)
+        for bucket, hist in other.hit_buckets.items():
+            self.latency_hist(self.hit_buckets, bucket).merge(hist)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "histograms": {k: h.to_dict() for k, h in self.histograms.items()},
+            "distinct": {k: sorted(v) for k, v in self.distinct.items()},
+            "pages": [{k: h.to_dict() for k, h in p.items()} for p in self.pages],
+            "counters": dict(self.counters),
+            "accounts": {k: dict(v) for k, v in self.accounts.items()},
+            "account_latency": {
+                k: h.to_dict() for k, h in self.account_latency.items()
+            },
+            "hit_buckets": {str(k): h.to_dict() for k, h in self.hit_buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> RunStats:
+        stats = cls()
+        stats.runs = data["runs"]
+        stats.histograms = {
+            k: HdrHistogram.from_dict(h) for k, h in data["histograms"].items()
+        }
+        stats.distinct = {k: set(v) for k, v in data["distinct"].items()}
+        stats.pages = [
+            {k: HdrHistogram.from_dict(h) for k, h in p.items()} for p in data["pages"]
+        ]
+        stats.counters = dict(data.get("counters", {}))
+        stats.accounts = {k: dict(v) for k, v in data.get("accounts", {}).items()}
+        stats.account_latency = {
+            k: HdrHistogram.from_dict(h)
+            for k, h in data.get("account_latency", {}).items()
+        }
+        stats.hit_buckets = {
+            int(k): HdrHistogram.from_dict(h)
+            for k, h in data.get("hit_buckets", {}).items()
+        }
+        return stats
+
+
+class ConnectionTracer:
+    """
+    Time connection setup per request through httpx's trace extension.
+
+    Each request gets its own trace callback; TCP connect and TLS handshake
+    durations go into the run's connect_ms/tls_ms histograms, so their
+    count is the number of new connections opened.
+    """
+
+    def __init__(self, stats: RunStats) -> None:
+        self.stats = stats
+
+    def extensions(self) -> dict[str, Any]:
+        started: dict[str, float] = {}
+        stats = self.stats
+
+        async def trace(event_name: str, info: dict[str, Any]) -> None:
+            step, _, phase = event_name.rpartition(".")
+            if step not in TRACE_METRICS:
+                return
+            if phase == "started":
+                started[step] = time.perf_counter()
+            elif phase == "complete" and step in started:
+                elapsed_ms = (time.perf_counter() - started.pop(step)) * 1000.0
+                stats.hist(TRACE_METRICS[step]).record(elapsed_ms)
+
+        stats.count("http_requests")
+        return {"trace": trace}
+
+
+TIMELINE_METRICS = ("root_wall_ms", "sub_wall_ms", "total_wall_ms", "response_ms")
+# Server-side signals from NodeStatsCollector: counter deltas add up within a
+# timeline window, gauges keep the window's highest sample
+SERVER_COUNTERS = (
+    "es_search_queries",
+    "es_search_time_ms",
+    "es_rejected",
+    "es_gc_ms",
+    "es_query_cache_hits",
+    "es_query_cache_misses",
+)
+SERVER_GAUGES = (
+    "es_search_queue_max",
+    "es_search_active",
+    "es_heap_used_pct_max",
+    "es_pending_tasks",
+)
+HEALTH_ORDER = ("green", "yellow", "red")
+
+
+class Timeline:
+    """
+    Per-interval counts and latency histograms for one run.
+
+    Windows are keyed on epoch time // interval, so they line up with other
+    epoch-stamped captures (es_stats.bash) and windows recorded by separate
+    processes merge by key.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.windows: dict[int, dict[str, Any]] = {}
+
+    def _window(self, now: float | None = None) -> dict[str, Any]:
+        key = int((time.time() if now is None else now) // self.interval)
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = {
+                "iterations": 0,
+                "errors": 0,
+                "dropped": 0,
+                "histograms": {},
+                "server": {},
+            }
+        return window
+
+    def add(self, result: IterationResult) -> None:
+        window = self._window()
+        window["iterations"] += 1
+        for name in TIMELINE_METRICS:
+            value = getattr(result, name)
+            if value is not None:
+                hist = window["histograms"].get(name)
+                if hist is None:
+                    hist = window["histograms"][name] = HdrHistogram()
+                hist.record(value)
+
+    def error(self) -> None:
+        self._window()["errors"] += 1
+
+    def drop(self) -> None:
+        self._window()["dropped"] += 1
+
+    def add_server(self, sample: dict[str, Any], now: float | None = None) -> None:
+        merge_server(self._window(now)["server"], sample)
+
+    def server_summary(self) -> dict[str, str]:
+        totals: dict[str, Any] = {}
+        for window in self.windows.values():
+            merge_server(totals, window.get("server", {}))
+        if not totals:
+            return {}
+        span = len(self.windows) * self.interval
+        return {
+            "ES search ops/s (avg)": f"{totals.get('es_search_queries', 0) / span:.2f}",
+            "ES search queue (max)": str(totals.get("es_search_queue_max", "")),
+            "ES search rejections": str(totals.get("es_rejected", 0)),
+            "ES GC time (ms)": str(totals.get("es_gc_ms", 0)),
+            "ES query cache hit %": str(query_cache_hit_pct(totals) or ""),
+            "ES heap used % (max)": str(totals.get("es_heap_used_pct_max", "")),
+            "ES cluster status (worst)": totals.get("es_status", ""),
+        }
+
+    def merge(self, other: Timeline) -> None:
+        for key, theirs in other.windows.items():
+            ours = self.windows.setdefault(
+                key,
+                {
+                    "iterations": 0,
+                    "errors": 0,
+                    "dropped": 0,
+                    "histograms": {},
+                    "server": {},
+                },
+            )
+            for counter in ("iterations", "errors", "dropped"):
+                ours[counter] += theirs[counter]
+            for name, hist in theirs["histograms"].items():
+                ours["histograms"].setdefault(name, HdrHistogram()).merge(hist)
+            merge_server(ours.setdefault("server", {}), theirs.get("server", {}))
+
+    def rows(self, scenario: str) -> list[dict[str, Any]]:
+        rows = []
+        has_server = any(w.get("server") for w in self.windows.values())
+        for key in sorted(self.windows):
+            window = self.windows[key]
+            row: dict[str, Any] = {
+                "scenario": scenario,
+                "start_epoch": key * self.interval,
+                "end_epoch": (key + 1) * self.interval,
+                "iterations": window["iterations"],
+                "ips": round(window["iterations"] / self.interval, 3),
+                "errors": window["errors"],
+                "dropped": window["dropped"],
+            }
+            for name in TIMELINE_METRICS:
+                hist = window["histograms"].get(name)
+                prefix = name.removesuffix("_ms")
+                for p in (50, 99):
+                    value = hist.percentile(p) if hist else None
+                    row[f"{prefix}_p{p}_ms"] = (
+                        round(value, 3) if value is not None else None
+                    )
+            if has_server:
+                row.update(server_columns(window.get("server", {}), self.interval))
+            rows.append(row)
+        return rows
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "windows": {
+                str(key): {
+                    **{k: v for k, v in window.items() if k != "histograms"},
+                    "histograms": {
+                        n: h.to_dict() for n, h in window["histograms"].items()
+                    },
+                }
+                for key, window in self.windows.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Timeline:
+        timeline = cls(data["interval"])
+        for key, window in data["windows"].items():
+            timeline.windows[int(key)] = {
+                **{k: v for k, v in window.items() if k != "histograms"},
+                "histograms": {
+                    n: HdrHistogram.from_dict(h)
+                    for n, h in window["histograms"].items()
+                },
+            }
+        return timeline
+
+
+def merge_server(ours: dict[str, Any], theirs: dict[str, Any]) -> None:
+    for name, value in theirs.items():
+        if name in SERVER_COUNTERS:
+            ours[name] = ours.get(name, 0) + value
+        elif name in SERVER_GAUGES:
+            ours[name] = max(ours.get(name, value), value)
+        elif name == "es_status":
+            worst = max(
+                (ours.get(name, value), value),
+                key=lambda status: (
+                    HEALTH_ORDER.index(status) if status in HEALTH_ORDER else -1
+                ),
+            )
+            ours[name] = worst
+
+
+def query_cache_hit_pct(server: dict[str, Any]) -> float | None:
+    hits = server.get("es_query_cache_hits", 0)
+    lookups = hits + server.get("es_query_cache_misses", 0)
+    return round(100.0 * hits / lookups, 1) if lookups else None
+
+
+def server_columns(server: dict[str, Any], interval: float) -> dict[str, Any]:
+    queries = server.get("es_search_queries")
+    return {
+        "es_search_ops_per_s": (
+            round(queries / interval, 3) if queries is not None else None
+        ),
+        "es_search_avg_ms": (
+            round(server.get("es_search_time_ms", 0) / queries, 3) if queries else None
+        ),
+        "es_rejected": server.get("es_rejected"),
+        "es_gc_ms": server.get("es_gc_ms"),
+        "es_query_cache_hit_pct": query_cache_hit_pct(server),
+        **{name: server.get(name) for name in SERVER_GAUGES},
+        "es_status": server.get("es_status"),
+    }
+
+
+def write_timeline(report_path: Path, runs: list[RunResult]) -> list[Path]:
+    rows = [
+        row
+        for run in runs
+        if run.timeline is not None
+        for row in run.timeline.rows(run.label)
+    ]
+    if not rows:
+        return []
+    base = report_path.with_name(f"{report_path.stem}_timeline")
+    csv_path = base.with_suffix(".csv")
+    jsonl_path = base.with_suffix(".jsonl")
+    with csv_path.open("w", newline="", encoding="utf-8") as f:
+        # Runs without server samples leave those columns empty
+        fieldnames = list(dict.fromkeys(name for row in rows for name in row))
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    with jsonl_path.open("w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+    return [csv_path, jsonl_path]
+
+
+NODE_STATS_PATH = "/_nodes/stats/indices,thread_pool,jvm"
+CAT_THREAD_POOL_PATH = (
+    "/_cat/thread_pool/search?format=json&h=node_name,name,active,queue,rejected"
+)
+CLUSTER_HEALTH_PATH = "/_cluster/health"
+
+
+def node_counters(node: dict[str, Any]) -> dict[str, float]:
+    indices = node.get("indices", {})
+    search = indices.get("search", {})
+    query_cache = indices.get("query_cache", {})
+    pool = node.get("thread_pool", {}).get("search", {})
+    collectors = node.get("jvm", {}).get("gc", {}).get("collectors", {})
+    return {
+        "es_search_queries": search.get("query_total", 0),
+        "es_search_time_ms": search.get("query_time_in_millis", 0),
+        "es_rejected": pool.get("rejected", 0),
+        "es_gc_ms": sum(
+            c.get("collection_time_in_millis", 0) for c in collectors.values()
+        ),
+        "es_query_cache_hits": query_cache.get("hit_count", 0),
+        "es_query_cache_misses": query_cache.get("miss_count", 0),
+    }
+
+
+class NodeStatsCollector:
+    """
+    Sample cluster-side signals while a run is in flight.
+
+    Every --node-stats-interval seconds, aligned to the wall clock, it
+    fetches _nodes/stats, _cat/thread_pool and _cluster/health concurrently
+    over one keep-alive client. Per-node counters are turned into deltas
+    against the previous poll (a restarted node's reset counters count as
+    zero) and added, with the gauges, to a Timeline on the same epoch
+    windows as the client-side latencies.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        base_url: str,
+        interval: float,
+        timeline_interval: float,
+        timeout: float,
+        log: Callable[[str], None],
+    ) -> None:
+        self.client = client
+        self.base_url = base_url
+        self.interval = interval
+        self.timeline_interval = timeline_interval
+        self.timeout = timeout
+        self.log = log
+        self.previous: dict[str, dict[str, float]] = {}
+        self.failures = 0
+
+    async def get(self, path: str) -> Any:
+        response = await self.client.get(f"{self.base_url}{path}", timeout=self.timeout)
+        if response.status_code >= 400:
+            raise HttpError(response.status_code, response.text[:200])
+        return response.json()
+
+    async def poll(self) -> dict[str, Any]:
+        nodes_stats, thread_pools, health = await asyncio.gather(
+            self.get(NODE_STATS_PATH),
+            self.get(CAT_THREAD_POOL_PATH),
+            self.get(CLUSTER_HEALTH_PATH),
+        )
+        sample: dict[str, Any] = {name: 0 for name in SERVER_COUNTERS}
+        current: dict[str, dict[str, float]] = {}
+        heap = []
+        for node_id, node in nodes_stats.get("nodes", {}).items():
+            current[node_id] = node_counters(node)
+            heap.append(node.get("jvm", {}).get("mem", {}).get("heap_used_percent", 0))
+            before = self.previous.get(node_id)
+            if before is None:
+                continue
+            for name, value in current[node_id].items():
+                sample[name] += max(value - before[name], 0)
+        first_poll = not self.previous
+        self.previous = current
+
+        search_pools = [p for p in thread_pools if p.get("name") == "search"]
+        sample["es_search_queue_max"] = max(
+            (int(p.get("queue") or 0) for p in search_pools), default=0
+        )
+        sample["es_search_active"] = sum(
+            int(p.get("active") or 0) for p in search_pools
+        )
+        sample["es_heap_used_pct_max"] = max(heap, default=0)
+        sample["es_pending_tasks"] = int(health.get("number_of_pending_tasks", 0))
+        sample["es_status"] = health.get("status", "")
+        if first_poll:
+            # Nothing to diff against yet; keep the gauges only
+            for name in SERVER_COUNTERS:
+                sample.pop(name)
+        return sample
+
+    async def run(self, timeline: Timeline) -> None:
+        while True:
+            now = time.time()
+            await asyncio.sleep(math.ceil(now / self.interval) * self.interval - now)
+            try:
+                timeline.add_server(await self.poll())
+            except (HttpError, httpx.RequestError, ValueError) as exc:
+                self.failures += 1
+                self.log(f"Node stats poll failed: {exc}")
+
+    @contextlib.asynccontextmanager
+    async def sampling(self) -> AsyncIterator[Timeline]:
+        timeline = Timeline(self.timeline_interval)
+        task = asyncio.create_task(self.run(timeline))
+        try:
+            yield timeline
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One load-profile stage; the defaults are a plain iteration-bounded run."""
+
+    label: str = ""
+    # Run for this long, cycling through accounts, instead of --iterations
+    duration_s: float | None = None
+    # Ramp the rate linearly from target_ips to this by the end of the stage
+    ramp_to_ips: float | None = None
+
+
+@dataclass
+class RunResult:
+    scenario: Scenario
+    stats: RunStats
+    elapsed_s: float
+    achieved_ips: float
+    error_message: str | None = None
+    sample_root_query: dict[str, Any] | None = None
+    sample_sub_query: dict[str, Any] | None = None
+    details: dict[str, str] = field(default_factory=dict)
+    intended_ips: float = 0.0
+    dropped: int = 0
+    delayed: int = 0
+    timeline: Timeline | None = None
+    stage: str = ""
+
+    @property
+    def label(self) -> str:
+        if self.stage:
+            return f"{self.scenario.label} [{self.stage}]"
+        return self.scenario.label
+
+
+# payload, ttfb_ms, read_ms, decode_ms, wall_ms, body_bytes
+FetchTuple = tuple[dict[str, Any], float, float, float, float, int]
+# (query, account_uuid) -> FetchTuple
+# A query dict, or a body already serialized by a QueryTemplate
+QueryBody = dict[str, Any] | bytes
+SearchFn = Callable[[QueryBody, str], Awaitable[FetchTuple]]
 
 
 def iso_utc(dt: datetime) -> str:
@@ -84,10 +891,28 @@ def iso_utc(dt: datetime) -> str:
     )
 
 
+def apply_retrieval(
+    query: dict[str, Any], retrieval: str, fields: tuple[str, ...]
+) -> dict[str, Any]:
+    if retrieval == "source-includes":
+        query["_source"] = {"includes": list(fields)}
+    elif retrieval == "docvalue":
+        query["_source"] = False
+        query["docvalue_fields"] = list(fields)
+    elif retrieval == "fields":
+        query["_source"] = False
+        query["fields"] = list(fields)
+    return query
+
+
 def build_root_query(
-    account_uuid: str, start_date: str, end_date: str, size: int
+    account_uuid: str,
+    start_date: str,
+    end_date: str,
+    size: int,
+    retrieval: str = "source",
 ) -> dict[str, Any]:
-    return {
+    query = {
         "size": size,
         "_source": True,
         "query": {
@@ -112,6 +937,7 @@ def build_root_query(
             {"brand_transaction_id": {"order": "asc"}},
         ],
     }
+    return apply_retrieval(query, retrieval, ROOT_FIELDS)
 
 
 def build_sub_query(
@@ -120,8 +946,9 @@ def build_sub_query(
     end_date: str,
     root_brand_ids: list[str],
     size: int,
+    retrieval: str = "source",
 ) -> dict[str, Any]:
-    return {
+    query = {
         "size": size,
         "_source": True,
         "query": {
@@ -147,6 +974,104 @@ def build_sub_query(
             {"related_product_transaction_uuid": {"order": "asc"}},
         ],
     }
+    return apply_retrieval(query, retrieval, SUB_FIELDS)
+
+
+def build_combined_query(
+    account_uuid: str,
+    start_date: str,
+    end_date: str,
+    root_size: int,
+    children_per_root: int,
+    retrieval: str = "source",
+) -> dict[str, Any]:
+    """
+    Fetch roots and their tax children in a single request.
+
+    The query matches the whole account window; post_filter narrows the hits
+    to the same roots as the two-step root query. A terms aggregation on the
+    root_key runtime field groups each root with its children and orders the
+    buckets like the root sort (root date desc, then brand id), so the top
+    root_size buckets are the returned roots. Each bucket's children filter
+    counts the same documents the two-step sub query matches for that root and
+    returns up to children_per_root of them with top_hits.
+
+    Bucket order is exact when an account lives on one shard (--routing on);
+    otherwise shard_size leaves headroom for buckets split across shards.
+    """
+    children = apply_retrieval(
+        {
+            "size": min(children_per_root, 100),
+            "sort": [{"transaction_date": {"order": "asc"}}],
+        },
+        retrieval,
+        SUB_FIELDS,
+    )
+    query = {
+        "size": root_size,
+        "_source": True,
+        "query": {
+            "bool": {
+                "filter": [
+                    {"term": {"mse_account_uuid": account_uuid}},
+                    {"terms": {"status": ["completed", "draft"]}},
+                    {
+                        "range": {
+                            "transaction_date": {
+                                "gte": start_date,
+                                "lte": end_date,
+                            }
+                        }
+                    },
+                ]
+            }
+        },
+        "post_filter": {
+            "bool": {
+                "must_not": [{"exists": {"field": "related_product_transaction_uuid"}}]
+            }
+        },
+        "sort": [
+            {"transaction_date": {"order": "desc"}},
+            {"brand_transaction_id": {"order": "asc"}},
+        ],
+        "runtime_mappings": {
+            "root_key": {"type": "keyword", "script": {"source": ROOT_KEY_SCRIPT}}
+        },
+        "aggs": {
+            "by_root": {
+                "terms": {
+                    "field": "root_key",
+                    "size": root_size,
+                    "shard_size": max(root_size * 10, 1000),
+                    "order": [{"root>latest": "desc"}, {"_key": "asc"}],
+                },
+                "aggs": {
+                    "root": {
+                        "filter": {
+                            "bool": {
+                                "must_not": [
+                                    {
+                                        "exists": {
+                                            "field": "related_product_transaction_uuid"
+                                        }
+                                    }
+                                ]
+                            }
+                        },
+                        "aggs": {"latest": {"max": {"field": "transaction_date"}}},
+                    },
+                    "children": {
+                        "filter": {
+                            "exists": {"field": "related_product_transaction_uuid"}
+                        },
+                        "aggs": {"docs": {"top_hits": children}},
+                    },
+                },
+            }
+        },
+    }
+    return apply_retrieval(query, retrieval, ROOT_FIELDS)
 
 
 def parse_args() -> argparse.Namespace:
@@ -172,7 +1097,10 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument(
         "--accounts-file",
-        help="Optional file with one account UUID per line.",
+        help=(
+            "Optional file with one account UUID per line, optionally followed "
+            "by a weight for --workload weighted."
+        ),
     )
     parser.add_argument(
         "--iterations",
@@ -182,21 +1110,21 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument(
         "--root-size",
-        type=int,
-        default=100,
-        help="Root query size",
+        default="100",
+        help="Root query size; a comma-separated list sweeps sizes",
     )
     parser.add_argument(
         "--sub-multiplier",
-        type=float,
-        default=2.0,
-        help="Sub query size multiplier (sub_size = root_size * multiplier)",
+        default="2",
+        help=(
+            "Sub query size multiplier (sub_size = root_size * multiplier); "
+            "a comma-separated list sweeps multipliers"
+        ),
     )
     parser.add_argument(
         "--request-cache",
-        choices=["true", "false"],
         default="false",
-        help="Set request_cache query parameter",
+        help="Set request_cache query parameter; true,false sweeps both",
     )
     parser.add_argument(
         "--timeout",
@@ -207,7 +1135,7 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--range",
         default="6m",
-        help="Date range in months, e.g. 1m, 3m, 18m",
+        help="Date range in months, e.g. 1m, 3m, 18m; a comma-separated list sweeps ranges",
     )
     parser.add_argument(
         "--target-ips",
@@ -255,8 +1183,13 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument(
         "--routing",
-        action="store_true",
-        help="Enable routing using the account UUID",
+        nargs="?",
+        const="on",
+        default="off",
+        help=(
+            "Enable routing using the account UUID; --routing off,on sweeps both "
+            "(default: off)"
+        ),
     )
     parser.add_argument(
         "--verbose",
@@ -268,361 +1201,2813 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Print auth header info (no secrets).",
     )
-    return parser.parse_args()
-
-
-def load_accounts(args: argparse.Namespace) -> list[str]:
-    accounts = list(args.account)
-
-    if args.accounts_file:
-        with open(args.accounts_file, "r", encoding="utf-8") as f:
-            for line in f:
-                value = line.strip()
-                if value and not value.startswith("#"):
-                    accounts.append(value)
-
-    deduped = list(dict.fromkeys(accounts))
-    if not deduped:
-        raise SystemExit("No accounts supplied. Use --account and/or --accounts-file.")
-    return deduped
-
-
-class HttpError(Exception):
-    def __init__(self, status_code: int, message: str) -> None:
-        super().__init__(message)
-        self.status_code = status_code
-
-
-async def fetch_json(
-    client: httpx.AsyncClient,
-    url: str,
-    query: dict[str, Any],
-    timeout: float,
-) -> tuple[dict[str, Any], float, float, float, float]:
-    start = time.perf_counter()
-    ttfb_ms: float | None = None
-    read_start: float | None = None
-    body_chunks: list[bytes] = []
-
-    async with client.stream("POST", url, json=query, timeout=timeout) as response:
-        async for chunk in response.aiter_bytes():
-            if ttfb_ms is None:
-                ttfb_ms = (time.perf_counter() - start) * 1000.0
-                read_start = time.perf_counter()
-            body_chunks.append(chunk)
-
-        if ttfb_ms is None:
-            ttfb_ms = (time.perf_counter() - start) * 1000.0
-            read_start = time.perf_counter()
-
-        read_ms = (time.perf_counter() - read_start) * 1000.0 if read_start else 0.0
-        total_ms = (time.perf_counter() - start) * 1000.0
-        body = b"".join(body_chunks)
-
-        if response.status_code >= 400:
-            snippet = body[:400].decode("utf-8", errors="replace").replace("\n", " ")
-            raise HttpError(response.status_code, snippet)
-
-    decode_start = time.perf_counter()
-    try:
-        payload = json.loads(body.decode("utf-8")) if body else {}
-    except json.JSONDecodeError as exc:
-        snippet = body[:400].decode("utf-8", errors="replace").replace("\n", " ")
-        raise HttpError(0, f"Invalid JSON: {exc} | {snippet}") from exc
-    decode_ms = (time.perf_counter() - decode_start) * 1000.0
-
-    return payload, ttfb_ms, read_ms, decode_ms, total_ms
-
-
-def extract_root_brand_ids(payload: dict[str, Any]) -> list[str]:
-    hits = payload.get("hits", {}).get("hits", [])
-    root_types = {"network_charge", "non_network_charge"}
-
-    brand_ids: list[str] = []
-    seen: set[str] = set()
-
-    for hit in hits:
-        source = hit.get("_source", {})
-        txn_type = source.get("transaction_type")
-        brand_id = source.get("brand_transaction_id")
-
-        if (
-            txn_type in root_types
-            and isinstance(brand_id, str)
-            and brand_id
-            and brand_id not in seen
-        ):
-            seen.add(brand_id)
-            brand_ids.append(brand_id)
-
-    return brand_ids
-
-
-def hit_count(payload: dict[str, Any]) -> int:
-    total = payload.get("hits", {}).get("total", {})
-    if isinstance(total, dict):
+    parser.add_argument(
+        "--retrieval",
+        default="source",
+        help=(
+            "Comma-separated hit retrieval modes to run in turn: "
+            f"{', '.join(RETRIEVAL_MODES)} (default: source)"
+        ),
+    )
+    parser.add_argument(
+        "--filter-path",
+        default="off",
+        help=(
+            "Comma-separated on/off values for adding filter_path to the search "
+            "URL, e.g. off,on to compare both (default: off)"
+        ),
+    )
+    parser.add_argument(
+        "--dispatch",
+        default="per-request",
+        help=(
+            "Comma-separated dispatch modes to run in turn: per-request sends one "
+            "_search per query, msearch coalesces concurrent root (and then sub) "
+            "queries into _msearch requests (default: per-request)"
+        ),
+    )
+    parser.add_argument(
+        "--msearch-batch-size",
+        type=int,
+        default=50,
+        help="Max searches per _msearch request",
+    )
+    parser.add_argument(
+        "--msearch-max-wait-ms",
+        type=float,
+        default=5.0,
+        help="Max time a search waits for its _msearch batch to fill",
+    )
+    parser.add_argument(
+        "--strategy",
+        default="two-step",
+        help=(
+            "Comma-separated fetch strategies to run in turn: two-step (root "
+            "query, then sub query) or aggs (the same roots and per-root child "
+            "counts from one request via post_filter and a terms aggregation "
+            "grouping each root with its children) (default: two-step)"
+        ),
+    )
+    parser.add_argument(
+        "--pages",
+        type=int,
+        default=1,
+        help=(
+            "Root pages to walk per account with search_after on the existing "
+            "sort, each followed by its sub query (two-step strategy only)"
+        ),
+    )
+    parser.add_argument(
+        "--pit",
+        action="store_true",
+        help="Page inside a point in time opened per iteration (per-request only)",
+    )
+    parser.add_argument(
+        "--pit-keep-alive",
+        default="1m",
+        help="keep_alive for the point in time (default: 1m)",
+    )
+    parser.add_argument(
+        "--load-model",
+        default="closed",
+        help=(
+            "Comma-separated load models to run in turn: closed (launches wait "
+            "for a free concurrency slot, latency measured from the actual start) "
+            "or open (launches follow a fixed schedule at --target-ips and "
+            "latency is measured from the scheduled send time) (default: closed)"
+        ),
+    )
+    parser.add_argument(
+        "--open-max-pending",
+        type=int,
+        default=1000,
+        help=(
+            "Open model: scheduled requests allowed to wait for a concurrency "
+            "slot before further ones are dropped (default: 1000)"
+        ),
+    )
+    parser.add_argument(
+        "--late-threshold-ms",
+        type=float,
+        default=10.0,
+        help=(
+            "Open model: count a request as delayed when it starts this long "
+            "after its scheduled send time (default: 10)"
+        ),
+    )
+    parser.add_argument(
+        "--raw-samples",
+        default=None,
+        help=(
+            "Also write every iteration as a JSON line to this file (one file per "
+            "worker, suffixed .N, with --workers); the report itself only keeps "
+            "fixed-size histograms"
+        ),
+    )
+    parser.add_argument(
+        "--timeline-interval",
+        type=float,
+        default=10.0,
+        help=(
+            "Seconds per timeline window written as CSV/JSONL next to the report "
+            "(default: 10, 0 = off)"
+        ),
+    )
+    parser.add_argument(
+        "--node-stats-interval",
+        type=float,
+        default=0.0,
+        help=(
+            "Poll _nodes/stats, _cat/thread_pool and _cluster/health every N "
+            "seconds during each run and add search rate, queue, rejections, "
+            "GC time and query cache hit ratio to the timeline and report "
+            "(default: 0 = off; needs --timeline-interval)"
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Worker processes, each with its own event loop and HTTP client; "
+            "accounts are split across them and --target-ips, --max-concurrency "
+            "and the connection limits are divided between them (default: 1)"
+        ),
+    )
+    parser.add_argument(
+        "--load-profile",
+        choices=LOAD_PROFILES,
+        default="fixed",
+        help=(
+            "fixed: one run per scenario at --target-ips; step: --profile-steps "
+            "stages evenly spaced across --profile-ips; linear: one continuous "
+            "ramp across --profile-ips split into --profile-steps stages; "
+            "slo-search: binary search over --profile-ips for the highest rate "
+            "whose p99 stays within --slo-p99-ms (default: fixed)"
+        ),
+    )
+    parser.add_argument(
+        "--profile-ips",
+        default=None,
+        help="START,END iterations per second for step/linear/slo-search",
+    )
+    parser.add_argument(
+        "--profile-steps",
+        type=int,
+        default=5,
+        help="Stages for step/linear, probes for slo-search (default: 5)",
+    )
+    parser.add_argument(
+        "--stage-duration",
+        type=float,
+        default=None,
+        help=(
+            "Seconds per stage, cycling through accounts instead of running "
+            "--iterations (default: 30 for profiles, off for fixed)"
+        ),
+    )
+    parser.add_argument(
+        "--slo-p99-ms",
+        type=float,
+        default=None,
+        help=(
+            "p99 SLO in ms for slo-search (and pass/fail marks on step/linear); "
+            "total wall time for the closed model, response time from schedule "
+            "for the open model"
+        ),
+    )
+    parser.add_argument(
+        "--query-encoding",
+        choices=("template", "dict"),
+        default="template",
+        help=(
+            "template: splice account/brand IDs into query bodies serialized "
+            "once per scenario, caching root bodies per account; dict: build "
+            "and serialize every query (default: template)"
+        ),
+    )
+    parser.add_argument(
+        "--connection-mode",
+        default="pooled",
+        help=(
+            "Comma-separated client connection modes to run in turn: pooled "
+            "(--max-connections keep-alive pool), small-pool (--small-pool-size "
+            "connections), fresh (no keep-alive, a new connection per request) "
+            "or http2 (multiplexed, needs the h2 package; negotiated over TLS, "
+            "plain http:// stays on HTTP/1.1) (default: pooled)"
+        ),
+    )
+    parser.add_argument(
+        "--small-pool-size",
+        type=int,
+        default=8,
+        help="Connections for --connection-mode small-pool (default: 8)",
+    )
+    parser.add_argument(
+        "--on-error",
+        choices=ON_ERROR_MODES,
+        default="abort",
+        help=(
+            "abort: stop the run on the first failed iteration; continue: count "
+            "failures by status and keep going; retry: as continue, retrying "
+            "429/5xx/transport errors with backoff first (default: abort)"
+        ),
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Retries per search with --on-error retry (default: 3)",
+    )
+    parser.add_argument(
+        "--retry-backoff-ms",
+        type=float,
+        default=50.0,
+        help=(
+            "Base retry backoff in ms, doubled per attempt with jitter and "
+            "capped at 2 s (default: 50)"
+        ),
+    )
+    parser.add_argument(
+        "--hedge",
+        default="off",
+        help=(
+            "Comma-separated hedging settings to compare: off, or pNN to send a "
+            "duplicate search once the first has been outstanding longer than "
+            "the NNth percentile of the run's search latencies so far; the "
+            "first response wins (e.g. off,p95) (default: off)"
+        ),
+    )
+    parser.add_argument(
+        "--client-cache",
+        default="off",
+        help=(
+            "Comma-separated client-side cache modes to compare: off, root "
+            "(cache the first root page per account/range/size; the combined "
+            "request for --strategy aggs) or full (cache the whole iteration "
+            "result). Each scenario starts with a cold cache, one per worker "
+            "process (default: off)"
+        ),
+    )
+    parser.add_argument(
+        "--cache-capacity",
+        type=int,
+        default=1000,
+        help="Client cache entries before LRU eviction (default: 1000)",
+    )
+    parser.add_argument(
+        "--cache-ttl-s",
+        type=float,
+        default=0.0,
+        help="Client cache entry lifetime in seconds (default: 0 = no expiry)",
+    )
+    parser.add_argument(
+        "--workload",
+        choices=WORKLOADS,
+        default="round-robin",
+        help=(
+            "round-robin: --iterations per account in turn; zipf: the same "
+            "total number of iterations drawn with Zipf popularity, the first "
+            "account the most popular; weighted: drawn with the --accounts-file "
+            "weights; replay: follow --replay-log (default: round-robin)"
+        ),
+    )
+    parser.add_argument(
+        "--zipf-exponent",
+        type=float,
+        default=1.1,
+        help="Zipf exponent for --workload zipf (default: 1.1)",
+    )
+    parser.add_argument(
+        "--workload-seed",
+        type=int,
+        default=None,
+        help="Random seed for --workload zipf/weighted (default: unseeded)",
+    )
+    parser.add_argument(
+        "--replay-log",
+        default=None,
+        help=(
+            "Access log for --workload replay: TIMESTAMP ACCOUNT per line, epoch "
+            "seconds or ISO 8601; its accounts are added to the account list "
+            "and --target-ips pacing is replaced by the recorded offsets"
+        ),
+    )
+    parser.add_argument(
+        "--replay-speed",
+        type=float,
+        default=1.0,
+        help="Replay speed-up for --workload replay (default: 1.0 = real time)",
+    )
+    parser.add_argument(
+        "--report-top-accounts",
+        type=int,
+        default=20,
+        help="Accounts listed in the per-account report tables (default: 20)",
+    )
+    return parser.parse_args()
+
+
+def parse_list(value: str, choices: tuple[str, ...], flag: str) -> list[str]:
+    items = list(dict.fromkeys(v.strip() for v in value.split(",") if v.strip()))
+    invalid = [v for v in items if v not in choices]
+    if invalid or not items:
+        raise SystemExit(
+            f"{flag} must be a comma-separated list of: {', '.join(choices)}"
+        )
+    return items
+
+
+def build_scenarios(args: argparse.Namespace) -> list[Scenario]:
+    retrievals = parse_list(args.retrieval, RETRIEVAL_MODES, "--retrieval")
+    filter_paths = parse_list(args.filter_path, ("off", "on"), "--filter-path")
+    dispatches = parse_list(args.dispatch, DISPATCH_MODES, "--dispatch")
+    strategies = parse_list(args.strategy, STRATEGIES, "--strategy")
+    load_models = parse_list(args.load_model, LOAD_MODELS, "--load-model")
+    connections = parse_list(
+        args.connection_mode, CONNECTION_MODES, "--connection-mode"
+    )
+    hedges = list(
+        dict.fromkeys(v.strip().lower() for v in args.hedge.split(",") if v.strip())
+    )
+    client_caches = parse_list(args.client_cache, CLIENT_CACHE_MODES, "--client-cache")
+    if not hedges:
+        raise SystemExit("--hedge takes off or a percentile such as p95")
+    for hedge in hedges:
+        parse_hedge(hedge)
+    if "http2" in connections:
+        if importlib.util.find_spec("h2") is None:
+            raise SystemExit(
+                "--connection-mode http2 needs the h2 package "
+                "(uv pip install 'httpx[http2]')"
+            )
+    if args.workload == "replay":
+        if not args.replay_log:
+            raise SystemExit("--workload replay needs --replay-log")
+        if args.load_profile != "fixed":
+            raise SystemExit(
+                "--workload replay sets its own rate; use --load-profile fixed"
+            )
+    elif (
+        "open" in load_models and args.target_ips <= 0 and args.load_profile == "fixed"
+    ):
+        raise SystemExit("--load-model open needs --target-ips > 0")
+    if args.node_stats_interval > 0 and args.timeline_interval <= 0:
+        raise SystemExit("--node-stats-interval needs --timeline-interval > 0")
+    if args.pit and "msearch" in dispatches:
+        raise SystemExit("--pit is only supported with --dispatch per-request")
+
+    ranges = list(
+        dict.fromkeys(v.strip().lower() for v in args.range.split(",") if v.strip())
+    )
+    for range_value in ranges:
+        parse_range(range_value)
+    try:
+        root_sizes = list(
+            dict.fromkeys(int(v) for v in args.root_size.split(",") if v.strip())
+        )
+        sub_multipliers = list(
+            dict.fromkeys(float(v) for v in args.sub_multiplier.split(",") if v.strip())
+        )
+    except ValueError:
+        raise SystemExit("--root-size and --sub-multiplier take numbers")
+    request_caches = parse_list(
+        args.request_cache, ("true", "false"), "--request-cache"
+    )
+    routings = parse_list(args.routing, ("off", "on"), "--routing")
+    sweep_axes = {
+        "range_value": ranges,
+        "root_size": root_sizes,
+        "sub_multiplier": sub_multipliers,
+        "request_cache": request_caches,
+        "routing": [r == "on" for r in routings],
+    }
+    swept = tuple(name for name, values in sweep_axes.items() if len(values) > 1)
+    return [
+        Scenario(
+            retrieval=retrieval,
+            filter_path=filter_path == "on",
+            dispatch=dispatch,
+            strategy=strategy,
+            load_model=load_model,
+            connection=connection,
+            hedge=hedge,
+            client_cache=client_cache,
+            range_value=range_value,
+            root_size=root_size,
+            sub_multiplier=sub_multiplier,
+            request_cache=request_cache,
+            routing=routing,
+            swept=swept,
+        )
+        for (
+            range_value,
+            root_size,
+            sub_multiplier,
+            request_cache,
+            routing,
+            load_model,
+            connection,
+            hedge,
+            client_cache,
+            strategy,
+            retrieval,
+            filter_path,
+            dispatch,
+        ) in itertools.product(
+            *sweep_axes.values(),
+            load_models,
+            connections,
+            hedges,
+            client_caches,
+            strategies,
+            retrievals,
+            filter_paths,
+            dispatches,
+        )
+    ]
+
+
+def describe_workload(args: argparse.Namespace) -> str:
+    if args.workload == "zipf":
+        return f"zipf (exponent {args.zipf_exponent:g})"
+    if args.workload == "weighted":
+        return f"weighted ({args.accounts_file})"
+    if args.workload == "replay":
+        return f"replay ({args.replay_log}, speed {args.replay_speed:g}x)"
+    return args.workload
+
+
+def parse_hedge(value: str) -> float | None:
+    if value == "off":
+        return None
+    match = re.fullmatch(r"p(\d+(?:\.\d+)?)", value)
+    if not match or not 0 < float(match.group(1)) < 100:
+        raise SystemExit("--hedge takes off or a percentile such as p95")
+    return float(match.group(1))
+
+
+def parse_range(value: str) -> int:
+    if not value.endswith("m") or not value[:-1].isdigit():
+        raise SystemExit("Range must be in months, e.g. 1m, 3m, 18m")
+    months = int(value[:-1])
+    if months <= 0:
+        raise SystemExit("Range must be a positive month value, e.g. 1m")
+    return months
+
+
+def account_file_rows(path: str) -> list[list[str]]:
+    # One account per line, optionally followed by a weight; # starts a comment
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            value = line.strip()
+            if value and not value.startswith("#"):
+                rows.append(value.replace(",", " ").split())
+    return rows
+
+
+def load_account_weights(path: str | None) -> dict[str, float]:
+    weights: dict[str, float] = {}
+    for row in account_file_rows(path) if path else []:
+        try:
+            weight = float(row[1]) if len(row) > 1 else 1.0
+        except ValueError:
+            raise SystemExit(f"Invalid account weight in {path}: {' '.join(row)}")
+        if not (weight > 0 and math.isfinite(weight)):
+            raise SystemExit(
+                f"Account weights must be positive in {path}: {' '.join(row)}"
+            )
+        weights[row[0]] = weight
+    return weights
+
+
+def parse_timestamp(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise SystemExit(f"Invalid replay log timestamp: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+# The account is the last column, so timestamps may contain a space
+_REPLAY_LINE = re.compile(r"^(.*?)[\s,]+([^\s,]+)$")
+_TIME_OF_DAY = re.compile(r"^\d{1,2}:\d{2}(:\d{2}([.,]\d+)?)?(Z|[+-]\d{2}:?\d{2})?$")
+
+
+def load_replay_log(path: str) -> list[tuple[float, str]]:
+    # TIMESTAMP ACCOUNT per line (epoch seconds or ISO 8601), sorted by time
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            value = line.strip()
+            if not value or value.startswith("#"):
+                continue
+            match = _REPLAY_LINE.match(value)
+            if not match:
+                raise SystemExit(
+                    f"Replay log lines need TIMESTAMP ACCOUNT: {path}:{number}"
+                )
+            timestamp, account = match.groups()
+            if _TIME_OF_DAY.match(account):
+                raise SystemExit(
+                    f"Replay log account looks like a time of day, is the "
+                    f"account column missing? {path}:{number}: {value}"
+                )
+            entries.append((parse_timestamp(timestamp), account))
+    entries.sort(key=lambda entry: entry[0])
+    return entries
+
+
+def load_accounts(args: argparse.Namespace) -> list[str]:
+    accounts = list(args.account)
+
+    if args.accounts_file:
+        accounts.extend(row[0] for row in account_file_rows(args.accounts_file))
+    if args.workload == "replay":
+        accounts.extend(account for _, account in load_replay_log(args.replay_log))
+
+    deduped = list(dict.fromkeys(accounts))
+    if not deduped:
+        raise SystemExit("No accounts supplied. Use --account and/or --accounts-file.")
+    return deduped
+
+
+class HttpError(Exception):
+    def __init__(self, status_code: int, message: str) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+async def fetch_json(
+    client: httpx.AsyncClient,
+    url: str,
+    query: QueryBody,
+    timeout: float,
+    tracer: ConnectionTracer | None = None,
+) -> FetchTuple:
+    extensions = tracer.extensions() if tracer is not None else None
+    start = time.perf_counter()
+    ttfb_ms: float | None = None
+    read_start: float | None = None
+    body_chunks: list[bytes] = []
+    body_bytes = 0
+
+    if isinstance(query, bytes):
+        request = client.stream(
+            "POST", url, content=query, timeout=timeout, extensions=extensions
+        )
+    else:
+        request = client.stream(
+            "POST", url, json=query, timeout=timeout, extensions=extensions
+        )
+    async with request as response:
+        async for chunk in response.aiter_bytes():
+            if ttfb_ms is None:
+                ttfb_ms = (time.perf_counter() - start) * 1000.0
+                read_start = time.perf_counter()
+            body_bytes += len(chunk)
+            body_chunks.append(chunk)
+
+        if ttfb_ms is None:
+            ttfb_ms = (time.perf_counter() - start) * 1000.0
+            read_start = time.perf_counter()
+
+        read_ms = (time.perf_counter() - read_start) * 1000.0 if read_start else 0.0
+        total_ms = (time.perf_counter() - start) * 1000.0
+        body = b"".join(body_chunks)
+
+        if response.status_code >= 400:
+            snippet = body[:400].decode("utf-8", errors="replace").replace("\n", " ")
+            raise HttpError(response.status_code, snippet)
+
+    decode_start = time.perf_counter()
+    try:
+        # json.loads takes the UTF-8 bytes directly, no intermediate str
+        payload = json.loads(body) if body else {}
+    except ValueError as exc:
+        snippet = body[:400].decode("utf-8", errors="replace").replace("\n", " ")
+        raise HttpError(0, f"Invalid JSON: {exc} | {snippet}") from exc
+    decode_ms = (time.perf_counter() - decode_start) * 1000.0
+
+    return payload, ttfb_ms, read_ms, decode_ms, total_ms, body_bytes
+
+
+class MsearchBatcher:
+    """
+    Coalesce concurrent searches into `_msearch` requests.
+
+    A batch is sent once it holds --msearch-batch-size searches or its oldest
+    search has waited --msearch-max-wait-ms. Each caller gets its own response
+    item; TTFB/read/decode are those of the shared request, bytes are the
+    batch body split evenly, and wall time runs from submission, so it
+    includes the time spent waiting for the batch.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        base_url: str,
+        index: str,
+        request_cache: str,
+        routing_enabled: bool,
+        filter_path: bool,
+        batch_size: int,
+        max_wait_ms: float,
+        timeout: float,
+        tracer: ConnectionTracer | None = None,
+    ) -> None:
+        self.client = client
+        self.tracer = tracer
+        self.url = f"{base_url}/_msearch"
+        if filter_path:
+            paths = ",".join(f"responses.{p}" for p in FILTER_PATH.split(","))
+            self.url = (
+                f"{self.url}?filter_path=responses.status,responses.error,{paths}"
+            )
+        self.index = index
+        self.request_cache = request_cache == "true"
+        self.routing_enabled = routing_enabled
+        self.batch_size = max(1, batch_size)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000.0
+        self.timeout = timeout
+        self.pending: list[tuple[dict[str, Any], QueryBody, asyncio.Future]] = []
+        self.timer: asyncio.TimerHandle | None = None
+        self.tasks: set[asyncio.Task[None]] = set()
+        self.batches = 0
+        self.searches = 0
+
+    async def search(
+        self,
+        query: QueryBody,
+        account_uuid: str,
+    ) -> FetchTuple:
+        header: dict[str, Any] = {
+            "index": self.index,
+            "request_cache": self.request_cache,
+        }
+        if self.routing_enabled:
+            header["routing"] = account_uuid
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        submitted = time.perf_counter()
+        self.pending.append((header, query, future))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_wait_s, self.flush)
+        payload, ttfb_ms, read_ms, decode_ms, item_bytes = await future
+        wall_ms = (time.perf_counter() - submitted) * 1000.0
+        return payload, ttfb_ms, read_ms, decode_ms, wall_ms, item_bytes
+
+    def flush(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        task = asyncio.create_task(self.send(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def send(
+        self, batch: list[tuple[dict[str, Any], QueryBody, asyncio.Future]]
+    ) -> None:
+        self.batches += 1
+        self.searches += len(batch)
+        lines: list[bytes] = []
+        for header, query, _ in batch:
+            lines.append(json.dumps(header).encode("utf-8"))
+            if not isinstance(query, bytes):
+                query = json.dumps(query).encode("utf-8")
+            lines.append(query)
+        body = b"\n".join(lines) + b"\n"
+
+        start = time.perf_counter()
+        try:
+            async with self.client.stream(
+                "POST",
+                self.url,
+                content=body,
+                headers={"Content-Type": "application/x-ndjson"},
+                timeout=self.timeout,
+                extensions=self.tracer.extensions() if self.tracer else None,
+            ) as response:
+                chunks: list[bytes] = []
+                ttfb_ms: float | None = None
+                read_start = start
+                async for chunk in response.aiter_bytes():
+                    if ttfb_ms is None:
+                        ttfb_ms = (time.perf_counter() - start) * 1000.0
+                        read_start = time.perf_counter()
+                    chunks.append(chunk)
+                if ttfb_ms is None:
+                    ttfb_ms = (time.perf_counter() - start) * 1000.0
+                read_ms = (time.perf_counter() - read_start) * 1000.0
+                raw = b"".join(chunks)
+                if response.status_code >= 400:
+                    snippet = raw[:400].decode("utf-8", errors="replace")
+                    raise HttpError(response.status_code, snippet.replace("\n", " "))
+
+            decode_start = time.perf_counter()
+            try:
+                responses = json.loads(raw).get("responses", []) if raw else []
+            except json.JSONDecodeError as exc:
+                snippet = raw[:400].decode("utf-8", errors="replace")
+                raise HttpError(0, f"Invalid JSON: {exc} | {snippet}") from exc
+            decode_ms = (time.perf_counter() - decode_start) * 1000.0
+        except (HttpError, httpx.RequestError) as exc:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        item_bytes = len(raw) // len(batch)
+        for i, (_, _, future) in enumerate(batch):
+            if future.done():
+                continue
+            if i >= len(responses):
+                future.set_exception(HttpError(0, "Missing _msearch response item"))
+                continue
+            item = responses[i]
+            if "error" in item:
+                snippet = json.dumps(item["error"])[:400]
+                future.set_exception(HttpError(int(item.get("status", 0)), snippet))
+                continue
+            future.set_result((item, ttfb_ms, read_ms, decode_ms, item_bytes))
+
+    async def close(self) -> None:
+        self.flush()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+def error_key(exc: Exception) -> str:
+    if isinstance(exc, HttpError):
+        return f"HTTP {exc.status_code}" if exc.status_code else "Invalid response"
+    return type(exc).__name__
+
+
+class ResilientSearch:
+    """
+    Wrap a SearchFn with retries and an optional hedged request.
+
+    Every failed attempt is counted in the run's counters by status code
+    (or exception type). Retryable failures (429, 5xx, transport errors)
+    are retried up to `retries` times with jittered exponential backoff.
+    With a hedge percentile set, a second identical request is sent once
+    the first has been outstanding longer than that percentile of the
+    primary requests' latencies seen so far. The first success wins. A
+    losing hedge is cancelled, but a losing primary runs to completion so
+    that its own latency feeds the delay. Otherwise hedging would shorten
+    the tail the delay is read from and hedge ever more often. Those
+    primaries are kept in `background` until drain() awaits them. Failed
+    primaries feed the delay too. The returned wall time covers all
+    attempts.
+    """
+
+    # Latencies needed before the hedge delay is trusted
+    HEDGE_MIN_SAMPLES = 20
+
+    def __init__(
+        self,
+        search: SearchFn,
+        stats: RunStats,
+        retries: int = 0,
+        backoff_ms: float = 50.0,
+        hedge_percentile: float | None = None,
+    ) -> None:
+        self.search = search
+        self.stats = stats
+        self.retries = max(retries, 0)
+        self.backoff_ms = backoff_ms
+        self.hedge_percentile = hedge_percentile
+        # Primary requests only; hedged end-to-end times go to hedged_search_ms
+        self.primary_latency = HdrHistogram()
+        # Primaries that lost to their hedge and are still running
+        self.background: set[asyncio.Future[FetchTuple]] = set()
+
+    def hedge_delay(self) -> float | None:
+        if self.hedge_percentile is None:
+            return None
+        if self.primary_latency.count < self.HEDGE_MIN_SAMPLES:
+            return None
+        value = self.primary_latency.percentile(self.hedge_percentile)
+        return value / 1000.0 if value is not None else None
+
+    async def __call__(
+        self,
+        query: QueryBody,
+        account_uuid: str,
+    ) -> FetchTuple:
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                fetched = await self._attempt(query, account_uuid)
+                break
+            except (HttpError, httpx.RequestError) as exc:
+                self.stats.count(f"error {error_key(exc)}")
+                retryable = not isinstance(exc, HttpError) or (
+                    exc.status_code in RETRYABLE_STATUSES
+                )
+                if attempt >= self.retries or not retryable:
+                    raise
+                attempt += 1
+                self.stats.count("retries")
+                backoff_s = min(self.backoff_ms * 2 ** (attempt - 1), 2000.0) / 1000.0
+                await asyncio.sleep(backoff_s * random.uniform(0.5, 1.0))
+        wall_ms = (time.perf_counter() - start) * 1000.0
+        payload, ttfb_ms, read_ms, decode_ms, _, body_bytes = fetched
+        return payload, ttfb_ms, read_ms, decode_ms, wall_ms, body_bytes
+
+    async def _attempt(
+        self,
+        query: QueryBody,
+        account_uuid: str,
+    ) -> FetchTuple:
+        start = time.perf_counter()
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(self.search(query, account_uuid))
+        primary.add_done_callback(lambda task: self._record_primary(task, start))
+        if delay is not None:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if not done:
+                self.stats.count("hedged_requests")
+                hedge = asyncio.ensure_future(self.search(query, account_uuid))
+                try:
+                    return await self._first_success(primary, hedge)
+                finally:
+                    self.stats.hist("hedged_search_ms").record(
+                        (time.perf_counter() - start) * 1000.0
+                    )
+        return await primary
+
+    def _record_primary(self, task: asyncio.Future[FetchTuple], start: float) -> None:
+        # A failed primary still took this long; only cancellation is unmeasured
+        if not task.cancelled():
+            self.primary_latency.record((time.perf_counter() - start) * 1000.0)
+
+    def _reap_background(self, task: asyncio.Future[FetchTuple]) -> None:
+        self.background.discard(task)
+        # Its error already lost to the hedge's result; read it so it is not logged
+        if not task.cancelled():
+            task.exception()
+
+    async def drain(self) -> None:
+        """Wait for losing primaries so their latencies land before stats are read."""
+        if self.background:
+            await asyncio.gather(*self.background, return_exceptions=True)
+
+    async def _first_success(
+        self, primary: asyncio.Future[FetchTuple], hedge: asyncio.Future[FetchTuple]
+    ) -> FetchTuple:
+        pending = {primary, hedge}
+        error: BaseException | None = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # Check every finished task, so a loser's error is not left unread
+                winner = None
+                for task in done:
+                    if task.exception() is None:
+                        winner = winner or task
+                    else:
+                        error = task.exception()
+                if winner is not None:
+                    if winner is hedge:
+                        self.stats.count("hedge_wins")
+                    return winner.result()
+        finally:
+            # The primary finishes in the background to record its latency
+            if hedge in pending:
+                hedge.cancel()
+            if primary in pending:
+                self.background.add(primary)
+                primary.add_done_callback(self._reap_background)
+        assert error is not None
+        raise error
+
+
+class ResultCache:
+    """
+    In-process LRU cache with an optional TTL, modelling an application
+    cache in front of ES.
+
+    Lookups, hits, evictions and expiries go into the run's counters.
+    Concurrent misses on the same key each go to ES, as they would in an
+    application without request coalescing.
+    """
+
+    def __init__(self, stats: RunStats, capacity: int, ttl_s: float = 0.0) -> None:
+        self.stats = stats
+        self.capacity = max(capacity, 1)
+        self.ttl_s = ttl_s
+        self.entries: OrderedDict[tuple[Any, ...], tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: tuple[Any, ...]) -> Any | None:
+        self.stats.count("cache_lookups")
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if self.ttl_s > 0 and time.monotonic() - stored_at > self.ttl_s:
+            del self.entries[key]
+            self.stats.count("cache_expired")
+            return None
+        self.entries.move_to_end(key)
+        self.stats.count("cache_hits")
+        return value
+
+    def put(self, key: tuple[Any, ...], value: Any) -> None:
+        self.entries[key] = (time.monotonic(), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.stats.count("cache_evictions")
+
+
+def cache_hit_result(result: IterationResult, wall_ms: float) -> IterationResult:
+    # Same hits as the cached iteration, no ES time and nothing on the wire
+    return dataclasses.replace(
+        result,
+        root_wall_ms=wall_ms,
+        root_es_took_ms=None,
+        root_ttfb_ms=0.0,
+        root_read_ms=0.0,
+        root_decode_ms=0.0,
+        root_bytes=0,
+        sub_wall_ms=0.0,
+        sub_es_took_ms=None,
+        sub_ttfb_ms=0.0,
+        sub_read_ms=0.0,
+        sub_decode_ms=0.0,
+        sub_bytes=0,
+        total_wall_ms=wall_ms,
+        page_root_wall_ms=[],
+        page_root_took_ms=[],
+        page_total_wall_ms=[],
+        pit_open_ms=None,
+        pit_close_ms=None,
+    )
+
+
+def account_weights(args: argparse.Namespace, accounts: list[str]) -> list[float]:
+    """Relative draw weight of each account under --workload."""
+    if args.workload == "zipf":
+        # The first account is the most popular
+        return [
+            1.0 / (rank**args.zipf_exponent) for rank in range(1, len(accounts) + 1)
+        ]
+    if args.workload == "weighted":
+        weights = load_account_weights(args.accounts_file)
+        return [weights.get(account, 1.0) for account in accounts]
+    return [1.0] * len(accounts)
+
+
+class Workload:
+    """
+    Order, and for replay the timing, in which a run visits its accounts.
+
+    round-robin gives every account --iterations in turn; zipf and weighted
+    draw the same total at random with Zipf or --accounts-file weights;
+    replay follows --replay-log (restricted to this run's accounts) at the
+    recorded offsets divided by --replay-speed. Time-bounded stages keep
+    drawing, and replay loops, until the stage ends.
+
+    A --workers process passes every account as `population` and its own
+    share as `accounts`. Weights are ranked over the population and the
+    process draws its share of the total, so the processes together follow
+    the global distribution.
+    """
+
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        accounts: list[str],
+        time_bounded: bool,
+        population: list[str] | None = None,
+    ) -> None:
+        self.kind = args.workload
+        self.accounts = list(accounts)
+        self.time_bounded = time_bounded
+        self.index = 0
+        self.remaining = {account: args.iterations for account in accounts}
+        self.rng = random.Random(args.workload_seed)
+        self.cum_weights: list[float] | None = None
+        self.replay: list[tuple[float, str]] = []
+        self.replay_span = 0.0
+
+        population = population or self.accounts
+        weights = dict(zip(population, account_weights(args, population)))
+        own = [weights[account] for account in self.accounts]
+        share = sum(own) / sum(weights.values())
+        self.draws_left = round(args.iterations * len(population) * share)
+        if self.kind in ("zipf", "weighted"):
+            self.cum_weights = list(itertools.accumulate(own))
+        elif self.kind == "replay":
+            entries = load_replay_log(args.replay_log)
+            # Offsets from the first entry of the whole log, so workers that
+            # replay different accounts stay on the same clock
+            first = entries[0][0] if entries else 0.0
+            speed = max(args.replay_speed, 1e-9)
+            wanted = set(accounts)
+            self.replay = [
+                ((at - first) / speed, account)
+                for at, account in entries
+                if account in wanted
+            ]
+            if entries:
+                span = (entries[-1][0] - first) / speed
+                self.replay_span = span + span / max(len(entries) - 1, 1) or 1.0
+
+    def replay_ips(self) -> float | None:
+        if self.kind != "replay" or not self.replay_span:
+            return None
+        return len(self.replay) / self.replay_span
+
+    def next(self) -> tuple[str, float | None] | None:
+        """The next account, with its send offset in seconds for replay."""
+        if self.kind == "replay":
+            if not self.replay:
+                return None
+            lap, position = divmod(self.index, len(self.replay))
+            if lap and not self.time_bounded:
+                return None
+            self.index += 1
+            offset, account = self.replay[position]
+            return account, offset + lap * self.replay_span
+        if self.cum_weights is not None:
+            if not self.time_bounded:
+                if self.draws_left <= 0:
+                    return None
+                self.draws_left -= 1
+            return (
+                self.rng.choices(self.accounts, cum_weights=self.cum_weights)[0],
+                None,
+            )
+        if self.time_bounded:
+            # Time-bounded stage: keep cycling through the accounts
+            account = self.accounts[self.index % len(self.accounts)]
+            self.index += 1
+            return account, None
+        for _ in range(len(self.accounts)):
+            account = self.accounts[self.index % len(self.accounts)]
+            self.index += 1
+            remaining = self.remaining.get(account, 0)
+            if remaining > 0:
+                self.remaining[account] = remaining - 1
+                return account, None
+        return None
+
+
+ACCOUNT_PLACEHOLDER = "__bench_account__"
+IDS_PLACEHOLDER = "__bench_brand_ids__"
+_PLACEHOLDER_RE = re.compile(f'("{ACCOUNT_PLACEHOLDER}"|"{IDS_PLACEHOLDER}")')
+
+
+class QueryTemplate:
+    """
+    A query serialized once with placeholders, rendered by splicing bytes.
+
+    build() is called with ACCOUNT_PLACEHOLDER as the account and
+    [IDS_PLACEHOLDER] as the brand ID list; render() swaps in the JSON of
+    the real values, giving the same bytes as serializing the real query.
+    """
+
+    def __init__(self, build: Callable[[str, list[str]], dict[str, Any]]) -> None:
+        body = json.dumps(
+            build(ACCOUNT_PLACEHOLDER, [IDS_PLACEHOLDER]), separators=(",", ":")
+        )
+        self.parts: list[bytes | str] = []
+        for piece in _PLACEHOLDER_RE.split(body):
+            if piece == f'"{ACCOUNT_PLACEHOLDER}"':
+                self.parts.append(ACCOUNT_PLACEHOLDER)
+            elif piece == f'"{IDS_PLACEHOLDER}"':
+                self.parts.append(IDS_PLACEHOLDER)
+            elif piece:
+                self.parts.append(piece.encode("utf-8"))
+
+    def render(self, account_uuid: str, ids: list[str] | None = None) -> bytes:
+        account = json.dumps(account_uuid).encode("utf-8")
+        # The list brackets stay in the template; splice in the elements only
+        id_items = json.dumps(ids or [], separators=(",", ":"))[1:-1].encode("utf-8")
+        return b"".join(
+            (
+                account
+                if part is ACCOUNT_PLACEHOLDER
+                else id_items if part is IDS_PLACEHOLDER else part
+            )
+            for part in self.parts
+        )
+
+
+class QueryTemplates:
+    """Pre-serialized root/sub/aggs bodies for one scenario's fixed window."""
+
+    def __init__(
+        self,
+        start_date: str,
+        end_date: str,
+        root_size: int,
+        sub_size: int,
+        retrieval: str,
+    ) -> None:
+        children_per_root = max(1, math.ceil(sub_size / max(root_size, 1)))
+        self.root_template = QueryTemplate(
+            lambda account, _: build_root_query(
+                account, start_date, end_date, root_size, retrieval
+            )
+        )
+        self.sub_template = QueryTemplate(
+            lambda account, ids: build_sub_query(
+                account, start_date, end_date, ids, sub_size, retrieval
+            )
+        )
+        self.combined_template = QueryTemplate(
+            lambda account, _: build_combined_query(
+                account, start_date, end_date, root_size, children_per_root, retrieval
+            )
+        )
+        # Root and aggs bodies depend only on the account for the whole run
+        self.root_bodies: dict[str, bytes] = {}
+        self.combined_bodies: dict[str, bytes] = {}
+
+    def root(self, account_uuid: str) -> bytes:
+        body = self.root_bodies.get(account_uuid)
+        if body is None:
+            body = self.root_bodies[account_uuid] = self.root_template.render(
+                account_uuid
+            )
+        return body
+
+    def sub(self, account_uuid: str, ids: list[str]) -> bytes:
+        return self.sub_template.render(account_uuid, ids)
+
+    def combined(self, account_uuid: str) -> bytes:
+        body = self.combined_bodies.get(account_uuid)
+        if body is None:
+            body = self.combined_bodies[account_uuid] = self.combined_template.render(
+                account_uuid
+            )
+        return body
+
+
+class PointInTime:
+    """Open, search within and close a point in time for one iteration."""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        base_url: str,
+        index: str,
+        request_cache: str,
+        keep_alive: str,
+        routing_enabled: bool,
+        filter_path: bool,
+        timeout: float,
+        tracer: ConnectionTracer | None = None,
+    ) -> None:
+        self.client = client
+        self.tracer = tracer
+        self.base_url = base_url
+        self.open_url = f"{base_url}/{index}/_pit?keep_alive={keep_alive}"
+        self.search_url = search_url(base_url, "", request_cache, filter_path)
+        self.keep_alive = keep_alive
+        self.routing_enabled = routing_enabled
+        self.timeout = timeout
+
+    async def open(self, account_uuid: str) -> tuple[str, float]:
+        url = self.open_url
+        if self.routing_enabled:
+            url = f"{url}&routing={account_uuid}"
+        start = time.perf_counter()
+        response = await self.client.post(url, timeout=self.timeout)
+        open_ms = (time.perf_counter() - start) * 1000.0
+        if response.status_code >= 400:
+            snippet = response.text[:400].replace("\n", " ")
+            raise HttpError(response.status_code, f"PIT open failed | {snippet}")
+        return response.json()["id"], open_ms
+
+    async def search(self, query: QueryBody) -> FetchTuple:
+        return await fetch_json(
+            self.client, self.search_url, query, self.timeout, self.tracer
+        )
+
+    async def close(self, pit_id: str) -> float | None:
+        start = time.perf_counter()
+        try:
+            await self.client.request(
+                "DELETE",
+                f"{self.base_url}/_pit",
+                json={"id": pit_id},
+                timeout=self.timeout,
+            )
+        except httpx.RequestError:
+            # Best effort; the PIT expires after keep_alive anyway
+            return None
+        return (time.perf_counter() - start) * 1000.0
+
+
+def hit_field(hit: dict[str, Any], name: str) -> Any:
+    source = hit.get("_source")
+    if isinstance(source, dict) and name in source:
+        return source[name]
+    # docvalue_fields / fields always come back as arrays
+    values = (hit.get("fields") or {}).get(name)
+    if isinstance(values, list) and values:
+        return values[0]
+    return None
+
+
+def extract_root_brand_ids(payload: dict[str, Any]) -> list[str]:
+    hits = payload.get("hits", {}).get("hits", [])
+    root_types = {"network_charge", "non_network_charge"}
+
+    brand_ids: list[str] = []
+    seen: set[str] = set()
+
+    for hit in hits:
+        txn_type = hit_field(hit, "transaction_type")
+        brand_id = hit_field(hit, "brand_transaction_id")
+
+        if (
+            txn_type in root_types
+            and isinstance(brand_id, str)
+            and brand_id
+            and brand_id not in seen
+        ):
+            seen.add(brand_id)
+            brand_ids.append(brand_id)
+
+    return brand_ids
+
+
+def count_joined_children(payload: dict[str, Any], root_ids: list[str]) -> int:
+    buckets = payload.get("aggregations", {}).get("by_root", {}).get("buckets", [])
+    wanted = set(root_ids)
+    return sum(
+        int(bucket.get("children", {}).get("doc_count", 0))
+        for bucket in buckets
+        if bucket.get("key") in wanted
+    )
+
+
+def hit_count(payload: dict[str, Any]) -> int:
+    total = payload.get("hits", {}).get("total", {})
+    if isinstance(total, dict):
         return int(total.get("value", 0))
     return int(total or 0)
 
 
-def build_report_table(results: list[IterationResult]) -> str:
-    root_wall = [r.root_wall_ms for r in results]
-    sub_wall = [r.sub_wall_ms for r in results]
-    total_wall = [r.total_wall_ms for r in results]
-    root_es = [r.root_es_took_ms for r in results if r.root_es_took_ms is not None]
-    sub_es = [r.sub_es_took_ms for r in results if r.sub_es_took_ms is not None]
-    root_ttfb = [r.root_ttfb_ms for r in results]
-    root_read = [r.root_read_ms for r in results]
-    root_decode = [r.root_decode_ms for r in results]
-    sub_ttfb = [r.sub_ttfb_ms for r in results]
-    sub_read = [r.sub_read_ms for r in results]
-    sub_decode = [r.sub_decode_ms for r in results]
-    root_counts = [r.root_hits for r in results]
-    sub_counts = [r.sub_hits for r in results]
-    brand_counts = [r.root_brand_ids for r in results]
-
-    def mean_or_blank(values: list[float | int]) -> str:
-        return f"{statistics.mean(values):.2f}" if values else ""
-
-    def min_max(values: list[float]) -> str:
-        return f"{min(values):.2f} / {max(values):.2f}" if values else ""
-
-    def unique_list(values: list[int]) -> str:
-        return ", ".join(str(v) for v in sorted(set(values))) if values else ""
-
-    def percentile(values: list[float], p: float) -> str:
-        if not values:
-            return ""
-        sorted_values = sorted(values)
-        rank = max(0, math.ceil((p / 100.0) * len(sorted_values)) - 1)
-        return f"{sorted_values[rank]:.2f}"
+def new_connection_share(stats: RunStats) -> str:
+    requests = stats.counters.get("http_requests", 0)
+    if not requests:
+        return ""
+    return f"{100.0 * stats.hist('connect_ms').count / requests:.1f}"
+
+
+def cache_hit_rate(stats: RunStats) -> str:
+    lookups = stats.counters.get("cache_lookups", 0)
+    if not lookups:
+        return ""
+    return f"{100.0 * stats.counters.get('cache_hits', 0) / lookups:.1f}"
+
+
+def es_requests_per_iteration(stats: RunStats) -> str:
+    if not stats.runs:
+        return ""
+    return f"{stats.counters.get('http_requests', 0) / stats.runs:.2f}"
+
+
+def error_rate(stats: RunStats) -> str:
+    failed = stats.counters.get("failed_iterations", 0)
+    attempted = stats.runs + failed
+    return f"{100.0 * failed / attempted:.2f}" if attempted else ""
+
+
+def error_counts(stats: RunStats) -> str:
+    return ", ".join(
+        f"{name[len('error '):]}: {count}"
+        for name, count in sorted(stats.counters.items())
+        if name.startswith("error ")
+    )
+
+
+def build_report_table(stats: RunStats) -> str:
+    def mean_or_blank(name: str) -> str:
+        value = stats.hist(name).mean()
+        return f"{value:.2f}" if value is not None else ""
+
+    def min_max(name: str) -> str:
+        hist = stats.hist(name)
+        return f"{hist.min:.2f} / {hist.max:.2f}" if hist.count else ""
+
+    def unique_list(name: str) -> str:
+        return ", ".join(str(v) for v in sorted(stats.distinct.get(name, ())))
+
+    def percentile(name: str, p: float) -> str:
+        value = stats.hist(name).percentile(p)
+        return f"{value:.2f}" if value is not None else ""
+
+    rows = [
+        ("Runs", str(stats.runs)),
+        ("Root avg wall (ms)", mean_or_blank("root_wall_ms")),
+        ("Root min/max wall (ms)", min_max("root_wall_ms")),
+        ("Root p50 wall (ms)", percentile("root_wall_ms", 50)),
+        ("Root p90 wall (ms)", percentile("root_wall_ms", 90)),
+        ("Root p99 wall (ms)", percentile("root_wall_ms", 99)),
+        ("Root avg TTFB (ms)", mean_or_blank("root_ttfb_ms")),
+        ("Root p50 TTFB (ms)", percentile("root_ttfb_ms", 50)),
+        ("Root p90 TTFB (ms)", percentile("root_ttfb_ms", 90)),
+        ("Root p99 TTFB (ms)", percentile("root_ttfb_ms", 99)),
+        ("HTTP requests", str(stats.counters.get("http_requests", 0))),
+        ("New connections (% of requests)", new_connection_share(stats)),
+        ("Connect avg (ms)", mean_or_blank("connect_ms")),
+        ("Connect p99 (ms)", percentile("connect_ms", 99)),
+        ("TLS handshake avg (ms)", mean_or_blank("tls_ms")),
+        ("TLS handshake p99 (ms)", percentile("tls_ms", 99)),
+        ("Root avg read (ms)", mean_or_blank("root_read_ms")),
+        ("Root p50 read (ms)", percentile("root_read_ms", 50)),
+        ("Root p90 read (ms)", percentile("root_read_ms", 90)),
+        ("Root p99 read (ms)", percentile("root_read_ms", 99)),
+        ("Root avg decode (ms)", mean_or_blank("root_decode_ms")),
+        ("Root p50 decode (ms)", percentile("root_decode_ms", 50)),
+        ("Root p90 decode (ms)", percentile("root_decode_ms", 90)),
+        ("Root p99 decode (ms)", percentile("root_decode_ms", 99)),
+        ("Sub avg wall (ms)", mean_or_blank("sub_wall_ms")),
+        ("Sub min/max wall (ms)", min_max("sub_wall_ms")),
+        ("Sub p50 wall (ms)", percentile("sub_wall_ms", 50)),
+        ("Sub p90 wall (ms)", percentile("sub_wall_ms", 90)),
+        ("Sub p99 wall (ms)", percentile("sub_wall_ms", 99)),
+        ("Sub avg TTFB (ms)", mean_or_blank("sub_ttfb_ms")),
+        ("Sub p50 TTFB (ms)", percentile("sub_ttfb_ms", 50)),
+        ("Sub p90 TTFB (ms)", percentile("sub_ttfb_ms", 90)),
+        ("Sub p99 TTFB (ms)", percentile("sub_ttfb_ms", 99)),
+        ("Sub avg read (ms)", mean_or_blank("sub_read_ms")),
+        ("Sub p50 read (ms)", percentile("sub_read_ms", 50)),
+        ("Sub p90 read (ms)", percentile("sub_read_ms", 90)),
+        ("Sub p99 read (ms)", percentile("sub_read_ms", 99)),
+        ("Sub avg decode (ms)", mean_or_blank("sub_decode_ms")),
+        ("Sub p50 decode (ms)", percentile("sub_decode_ms", 50)),
+        ("Sub p90 decode (ms)", percentile("sub_decode_ms", 90)),
+        ("Sub p99 decode (ms)", percentile("sub_decode_ms", 99)),
+        ("Total avg wall (ms)", mean_or_blank("total_wall_ms")),
+        ("Total min/max (ms)", min_max("total_wall_ms")),
+        ("Total p50 wall (ms)", percentile("total_wall_ms", 50)),
+        ("Total p90 wall (ms)", percentile("total_wall_ms", 90)),
+        ("Total p99 wall (ms)", percentile("total_wall_ms", 99)),
+        ("Root avg ES took (ms)", mean_or_blank("root_es_took_ms")),
+        ("Sub avg ES took (ms)", mean_or_blank("sub_es_took_ms")),
+        ("Root hits (unique)", unique_list("root_hits")),
+        ("Root brand IDs (unique)", unique_list("root_brand_ids")),
+        ("Sub hits (unique)", unique_list("sub_hits")),
+        ("Root avg payload (bytes)", mean_or_blank("root_bytes")),
+        ("Root p99 payload (bytes)", percentile("root_bytes", 99)),
+        ("Sub avg payload (bytes)", mean_or_blank("sub_bytes")),
+        ("Sub p99 payload (bytes)", percentile("sub_bytes", 99)),
+    ]
+    failed = stats.counters.get("failed_iterations", 0)
+    if failed or error_counts(stats):
+        rows.extend(
+            [
+                ("Failed iterations", str(failed)),
+                ("Error rate (% of iterations)", error_rate(stats)),
+                ("Errors by status (all attempts)", error_counts(stats)),
+                ("Retries", str(stats.counters.get("retries", 0))),
+            ]
+        )
+    if stats.counters.get("cache_lookups"):
+        rows.extend(
+            [
+                ("Client cache hit rate (%)", cache_hit_rate(stats)),
+                (
+                    "Client cache hits / lookups",
+                    f"{stats.counters.get('cache_hits', 0)} / "
+                    f"{stats.counters['cache_lookups']}",
+                ),
+                (
+                    "Client cache evictions",
+                    str(stats.counters.get("cache_evictions", 0)),
+                ),
+                ("Client cache expiries", str(stats.counters.get("cache_expired", 0))),
+                ("ES requests per iteration", es_requests_per_iteration(stats)),
+            ]
+        )
+    if "hedged_requests" in stats.counters:
+        rows.extend(
+            [
+                ("Hedged searches", str(stats.counters["hedged_requests"])),
+                ("Hedge wins", str(stats.counters.get("hedge_wins", 0))),
+                ("Hedged search p50 (ms)", percentile("hedged_search_ms", 50)),
+                ("Hedged search p99 (ms)", percentile("hedged_search_ms", 99)),
+            ]
+        )
+    if stats.hist("response_ms").count:
+        rows.extend(
+            [
+                ("Queue delay avg (ms)", mean_or_blank("queue_delay_ms")),
+                ("Queue delay p99 (ms)", percentile("queue_delay_ms", 99)),
+                ("Response avg from schedule (ms)", mean_or_blank("response_ms")),
+                ("Response p50 from schedule (ms)", percentile("response_ms", 50)),
+                ("Response p90 from schedule (ms)", percentile("response_ms", 90)),
+                ("Response p99 from schedule (ms)", percentile("response_ms", 99)),
+            ]
+        )
+
+    lines = ["| Metric | Value |", "| --- | --- |"]
+    lines.extend([f"| {label} | {value} |" for label, value in rows])
+    lines.append("")
+    return "\n".join(lines)
+
+
+def account_labels(accounts: list[str]) -> dict[str, str]:
+    # Reports keep account UUIDs out; #N is the account's place in the input
+    return {account: f"#{i + 1}" for i, account in enumerate(accounts)}
+
+
+def build_account_workload_table(
+    stats: RunStats, labels: dict[str, str], top: int
+) -> str:
+    ranked = sorted(
+        stats.accounts.items(), key=lambda item: item[1]["iterations"], reverse=True
+    )
+    total = sum(values["iterations"] for _, values in ranked) or 1
+    lines = [
+        "| Account | Iterations | Share % | Root hits (docs in range) | Sub hits |",
+        "| --- | --- | --- | --- | --- |",
+    ]
+    for account_uuid, values in ranked[: max(top, 0)]:
+        lines.append(
+            f"| {labels.get(account_uuid, '?')} | {values['iterations']} "
+            f"| {100.0 * values['iterations'] / total:.1f} "
+            f"| {values['root_hits']} | {values['sub_hits']} |"
+        )
+    head = ranked[: max(1, math.ceil(len(ranked) / 10))]
+    head_share = 100.0 * sum(values["iterations"] for _, values in head) / total
+    lines.extend(
+        [
+            "",
+            f"- Accounts visited: {len(ranked)}",
+            f"- Busiest 10% of accounts: {head_share:.1f}% of iterations",
+            f"- Docs in range, all visited accounts: "
+            f"{sum(values['root_hits'] for _, values in ranked)}",
+            "",
+        ]
+    )
+    return "\n".join(lines)
+
+
+def build_account_latency_table(
+    stats: RunStats, labels: dict[str, str], top: int
+) -> str:
+    def cell(value: float | None) -> str:
+        return f"{value:.2f}" if value is not None else ""
+
+    ranked = sorted(
+        stats.account_latency.items(),
+        key=lambda item: item[1].percentile(99) or 0.0,
+        reverse=True,
+    )
+    lines = [
+        "| Account | Iterations | Root hits | Sub hits | Total p50 (ms) "
+        "| Total p99 (ms) | Total max (ms) |",
+        "| --- | --- | --- | --- | --- | --- | --- |",
+    ]
+    for account_uuid, hist in ranked[: max(top, 0)]:
+        values = stats.accounts.get(account_uuid, {})
+        lines.append(
+            f"| {labels.get(account_uuid, '?')} | {hist.count} "
+            f"| {values.get('root_hits', '')} | {values.get('sub_hits', '')} "
+            f"| {cell(hist.percentile(50))} | {cell(hist.percentile(99))} "
+            f"| {cell(hist.max)} |"
+        )
+    overall_p99 = stats.hist("total_wall_ms").percentile(99)
+    if overall_p99 is not None:
+        slow = sum(1 for _, h in ranked if (h.percentile(99) or 0.0) > overall_p99)
+        lines.extend(
+            [
+                "",
+                f"- Accounts with p99 above the overall p99 ({overall_p99:.2f} ms): "
+                f"{slow} of {len(ranked)}",
+            ]
+        )
+    lines.append("")
+    return "\n".join(lines)
+
+
+def build_hit_bucket_table(stats: RunStats) -> str:
+    def cell(value: float | None) -> str:
+        return f"{value:.2f}" if value is not None else ""
+
+    accounts_per_bucket: dict[int, int] = {}
+    for values in stats.accounts.values():
+        bucket = hit_bucket(values["root_hits"])
+        accounts_per_bucket[bucket] = accounts_per_bucket.get(bucket, 0) + 1
+
+    lines = [
+        "| Root hits | Accounts | Iterations | Total p50 (ms) | Total p90 (ms) "
+        "| Total p99 (ms) |",
+        "| --- | --- | --- | --- | --- | --- |",
+    ]
+    for bucket, hist in sorted(stats.hit_buckets.items()):
+        span = f"{bucket}-{bucket * 10 - 1}" if bucket else "0"
+        lines.append(
+            f"| {span} | {accounts_per_bucket.get(bucket, 0)} | {hist.count} "
+            f"| {cell(hist.percentile(50))} | {cell(hist.percentile(90))} "
+            f"| {cell(hist.percentile(99))} |"
+        )
+    lines.append("")
+    return "\n".join(lines)
+
+
+def build_page_depth_table(stats: RunStats) -> str:
+    def cell(hist: HdrHistogram | None, p: float) -> str:
+        value = hist.percentile(p) if hist else None
+        return f"{value:.2f}" if value is not None else ""
+
+    lines = [
+        "| Page | Runs | Root p50 (ms) | Root p99 (ms) | Root avg ES took (ms) "
+        "| Page p50 (ms) | Page p99 (ms) |",
+        "| --- | --- | --- | --- | --- | --- | --- |",
+    ]
+    for page, hists in enumerate(stats.pages):
+        root_wall = hists.get("page_root_wall_ms")
+        page_wall = hists.get("page_total_wall_ms")
+        took = hists.get("page_root_took_ms")
+        avg_took = f"{took.mean():.2f}" if took and took.count else ""
+        lines.append(
+            f"| {page + 1} | {page_wall.count if page_wall else 0} "
+            f"| {cell(root_wall, 50)} | {cell(root_wall, 99)} | {avg_took} "
+            f"| {cell(page_wall, 50)} | {cell(page_wall, 99)} |"
+        )
+
+    pit_open = stats.hist("pit_open_ms")
+    pit_close = stats.hist("pit_close_ms")
+    lines.append("")
+    if pit_open.count:
+        lines.append(
+            f"- PIT open p50/p99 (ms): {cell(pit_open, 50)} / {cell(pit_open, 99)}"
+        )
+    if pit_close.count:
+        lines.append(
+            f"- PIT close p50/p99 (ms): {cell(pit_close, 50)} / {cell(pit_close, 99)}"
+        )
+    if pit_open.count or pit_close.count:
+        lines.append("")
+    return "\n".join(lines)
+
+
+def build_comparison_table(runs: list[RunResult]) -> str:
+    def cell(hist: HdrHistogram, p: float) -> str:
+        value = hist.percentile(p)
+        return f"{value:.2f}" if value is not None else ""
+
+    def mean_cell(hist: HdrHistogram) -> str:
+        value = hist.mean()
+        return f"{value:.0f}" if value is not None else ""
+
+    lines = [
+        "| Scenario | Runs | Intended IPS | Achieved IPS | Dropped | Delayed "
+        "| Root avg bytes | Sub avg bytes "
+        "| Root p50 (ms) | Root p99 (ms) | Sub p50 (ms) | Sub p99 (ms) "
+        "| Total p50 (ms) | Total p99 (ms) | Response p99 (ms) "
+        "| New conn % | Connect p99 (ms) | ES req/iter | Cache hit % "
+        "| Error % | Hedged | Aborted |",
+        "| --- | --- | --- | --- | --- | --- | --- | --- | --- | --- "
+        "| --- | --- | --- | --- | --- | --- | --- | --- | --- | --- | --- | --- |",
+    ]
+    for run in runs:
+        stats = run.stats
+        root_wall = stats.hist("root_wall_ms")
+        sub_wall = stats.hist("sub_wall_ms")
+        total_wall = stats.hist("total_wall_ms")
+        response = stats.hist("response_ms")
+        lines.append(
+            f"| {run.label} | {stats.runs} | {run.intended_ips:.2f} "
+            f"| {run.achieved_ips:.2f} | {run.dropped} | {run.delayed} "
+            f"| {mean_cell(stats.hist('root_bytes'))} "
+            f"| {mean_cell(stats.hist('sub_bytes'))} "
+            f"| {cell(root_wall, 50)} | {cell(root_wall, 99)} "
+            f"| {cell(sub_wall, 50)} | {cell(sub_wall, 99)} "
+            f"| {cell(total_wall, 50)} | {cell(total_wall, 99)} "
+            f"| {cell(response, 99)} | {new_connection_share(stats)} "
+            f"| {cell(stats.hist('connect_ms'), 99)} "
+            f"| {es_requests_per_iteration(stats)} | {cache_hit_rate(stats)} "
+            f"| {error_rate(stats)} | {stats.counters.get('hedged_requests', '')} "
+            f"| {'yes' if run.error_message else ''} |"
+        )
+    lines.append("")
+    return "\n".join(lines)
+
+
+def build_sweep_matrix(runs: list[RunResult]) -> str:
+    """
+    Pivot the swept parameters: rows are the first swept parameter, columns
+    the second (if any), one table per remaining combination.
+    """
+    swept = runs[0].scenario.swept
+    row_axis = swept[0]
+    col_axis = swept[1] if len(swept) > 1 else None
+
+    def group_key(run: RunResult) -> str:
+        rest = [
+            f"{SWEEP_NAMES[n]}={run.scenario.sweep_value(n)}"
+            for n in swept
+            if n not in (row_axis, col_axis)
+        ]
+        return " ".join([run.scenario.base_label, *rest, run.stage]).strip()
+
+    groups: dict[str, list[RunResult]] = {}
+    for run in runs:
+        groups.setdefault(group_key(run), []).append(run)
+
+    lines = ["Cells: total p50 / p99 (ms) / achieved IPS.", ""]
+    for key, group in groups.items():
+        rows = list(dict.fromkeys(r.scenario.sweep_value(row_axis) for r in group))
+        cols = (
+            list(dict.fromkeys(r.scenario.sweep_value(col_axis) for r in group))
+            if col_axis
+            else [""]
+        )
+        cells: dict[tuple[str, str], str] = {}
+        for run in group:
+            hist = run.stats.hist("total_wall_ms")
+            p50, p99 = hist.percentile(50), hist.percentile(99)
+            cell = (
+                f"{p50:.1f} / {p99:.1f} / {run.achieved_ips:.1f}"
+                if p50 is not None and p99 is not None
+                else "no results"
+            )
+            if run.error_message:
+                cell = f"{cell} (error)"
+            col = run.scenario.sweep_value(col_axis) if col_axis else ""
+            cells[(run.scenario.sweep_value(row_axis), col)] = cell
+
+        corner = SWEEP_NAMES[row_axis]
+        if col_axis:
+            corner = f"{corner} \\ {SWEEP_NAMES[col_axis]}"
+        header = [corner, *(cols if col_axis else ["total p50 / p99 / IPS"])]
+        lines.extend(
+            [
+                f"### {key}",
+                "",
+                "| " + " | ".join(header) + " |",
+                "| " + " | ".join("---" for _ in header) + " |",
+            ]
+        )
+        for row in rows:
+            lines.append(
+                f"| {row} | "
+                + " | ".join(cells.get((row, col), "") for col in cols)
+                + " |"
+            )
+        lines.append("")
+    return "\n".join(lines)
+
+
+def build_report(
+    base_url: str,
+    index: str,
+    iterations: int,
+    target_ips: float,
+    max_concurrency: int,
+    runs: list[RunResult],
+    pages: int = 1,
+    pit_keep_alive: str | None = None,
+    profile_summary: list[str] | None = None,
+    workload: str = "round-robin",
+    accounts: list[str] | None = None,
+    top_accounts: int = 20,
+) -> str:
+    generated = iso_utc(datetime.now(timezone.utc))
+    achieved_ips = runs[0].achieved_ips if len(runs) == 1 else None
+    scenarios = [run.scenario for run in runs]
+
+    def values(attribute: str) -> str:
+        return ", ".join(dict.fromkeys(str(getattr(s, attribute)) for s in scenarios))
+
+    ranges = list(dict.fromkeys(s.range_value for s in scenarios))
+    if len(ranges) == 1:
+        start_date, end_date = scenarios[0].window()
+        date_range = f"{start_date} .. {end_date}"
+    else:
+        date_range = "last <range> months, per scenario"
+    routing = ", ".join(
+        dict.fromkeys("enabled" if s.routing else "disabled" for s in scenarios)
+    )
+    lines = [
+        "# ES Performance Report",
+        "",
+        f"- Generated: {generated}",
+        f"- Base URL: {base_url}",
+        f"- Index: {index}",
+        f"- Date range: {date_range}",
+        f"- Range: {values('range_value')}",
+        f"- Root size: {values('root_size')}",
+        f"- Sub multiplier: {values('sub_multiplier')}",
+        f"- Sub size: {values('sub_size')}",
+        f"- Iterations: {iterations}",
+        f"- Target IPS: {target_ips}",
+        (
+            f"- Achieved IPS: {achieved_ips:.2f}"
+            if achieved_ips is not None
+            else "- Achieved IPS:"
+        ),
+        f"- Max concurrency: {max_concurrency}",
+        f"- Request cache: {values('request_cache')}",
+        f"- Routing: {routing}",
+        f"- Pages per iteration: {pages}"
+        + (f" (PIT, keep_alive {pit_keep_alive})" if pit_keep_alive else ""),
+        f"- Workload: {workload}",
+        "- Scenarios: " + ", ".join(dict.fromkeys(run.scenario.label for run in runs)),
+        "",
+    ]
+    labels = account_labels(accounts or [])
+
+    if len(runs) > 1:
+        lines.extend(["## Scenario Comparison", "", build_comparison_table(runs)])
+    if runs and len(runs[0].scenario.swept) >= 1:
+        lines.extend(["## Sweep Matrix", "", build_sweep_matrix(runs)])
+    if profile_summary:
+        lines.extend(["## Load Profile", "", *profile_summary, ""])
+
+    for run in runs:
+        if len(runs) > 1:
+            lines.extend([f"## Results Summary: {run.label}", ""])
+        else:
+            lines.extend(["## Results Summary", ""])
+        if run.error_message:
+            lines.extend([f"Error: {run.error_message}", ""])
+
+        if run.stats.runs:
+            lines.append(build_report_table(run.stats))
+        else:
+            lines.extend(["No results collected.", ""])
+        if run.details:
+            lines.extend(
+                [f"- {label}: {value}" for label, value in run.details.items()]
+            )
+            lines.append("")
+        if len(run.stats.pages) > 1:
+            lines.extend(
+                ["### Latency by Page Depth", "", build_page_depth_table(run.stats)]
+            )
+        if len(run.stats.accounts) > 1:
+            lines.extend(
+                [
+                    "### Account Workload",
+                    "",
+                    build_account_workload_table(run.stats, labels, top_accounts),
+                    "### Slowest Accounts",
+                    "",
+                    build_account_latency_table(run.stats, labels, top_accounts),
+                ]
+            )
+        if run.stats.hit_buckets:
+            lines.extend(
+                ["### Latency by Root Hit Count", "", build_hit_bucket_table(run.stats)]
+            )
+
+    sampled: set[Scenario] = set()
+    for run in runs:
+        if not (run.sample_root_query or run.sample_sub_query):
+            continue
+        # Profile stages repeat the same queries; show them once per scenario
+        if run.scenario in sampled:
+            continue
+        sampled.add(run.scenario)
+        heading = "## Sample Queries"
+        if len(runs) > 1:
+            heading = f"{heading}: {run.scenario.label}"
+        lines.extend(
+            [
+                heading,
+                "",
+                "Account UUID and transaction IDs are redacted.",
+                f"Routing: {'routing=<REDACTED_ACCOUNT>' if run.scenario.routing else 'disabled'}",
+                "",
+            ]
+        )
+        if run.sample_root_query:
+            lines.extend(
+                [
+                    "### Root Query",
+                    "",
+                    "```json",
+                    json.dumps(run.sample_root_query, indent=2),
+                    "```",
+                    "",
+                ]
+            )
+        if run.sample_sub_query:
+            lines.extend(
+                [
+                    "### Sub Query",
+                    "",
+                    "```json",
+                    json.dumps(run.sample_sub_query, indent=2),
+                    "```",
+                    "",
+                ]
+            )
+
+    return "\n".join(lines).rstrip() + "\n"
+
+
+def search_url(base_url: str, index: str, request_cache: str, filter_path: bool) -> str:
+    # An empty index gives the index-less endpoint that PIT searches require
+    path = f"/{index}/_search" if index else "/_search"
+    url = f"{base_url}{path}?request_cache={request_cache}"
+    if filter_path:
+        url = f"{url}&filter_path={FILTER_PATH}"
+    return url
+
+
+async def run_iteration(
+    root_search: SearchFn,
+    sub_search: SearchFn,
+    account_uuid: str,
+    start_date: str,
+    end_date: str,
+    root_size: int,
+    sub_size: int,
+    retrieval: str,
+    strategy: str = "two-step",
+    pages: int = 1,
+    pit: PointInTime | None = None,
+    templates: QueryTemplates | None = None,
+    root_cache: ResultCache | None = None,
+) -> tuple[IterationResult, list[str]]:
+    total_start = time.perf_counter()
+
+    if strategy == "aggs":
+        return await run_combined_iteration(
+            root_search,
+            account_uuid,
+            start_date,
+            end_date,
+            root_size,
+            sub_size,
+            retrieval,
+            total_start,
+            templates,
+        )
+
+    def sub_body(ids: list[str]) -> QueryBody:
+        if templates is not None:
+            return templates.sub(account_uuid, ids)
+        return build_sub_query(
+            account_uuid, start_date, end_date, ids, sub_size, retrieval
+        )
+
+    pit_id: str | None = None
+    pit_open_ms: float | None = None
+    pit_close_ms: float | None = None
+    if pit is not None:
+        pit_id, pit_open_ms = await pit.open(account_uuid)
+
+    async def fetch_root_page(search_after: list[Any] | None) -> FetchTuple:
+        cacheable = root_cache is not None and search_after is None and pit is None
+        cache_key = (account_uuid, start_date, end_date, root_size)
+        if root_cache is not None and cacheable:
+            lookup_start = time.perf_counter()
+            cached = root_cache.get(cache_key)
+            if cached is not None:
+                lookup_ms = (time.perf_counter() - lookup_start) * 1000.0
+                # No ES request was made, so drop the cached response's took
+                return {**cached[0], "took": None}, 0.0, 0.0, 0.0, lookup_ms, 0
+        fetched = await search_root_page(search_after)
+        if root_cache is not None and cacheable:
+            root_cache.put(cache_key, fetched)
+        return fetched
+
+    async def search_root_page(search_after: list[Any] | None) -> FetchTuple:
+        nonlocal pit_id
+        if templates is not None and search_after is None and pit is None:
+            return await root_search(templates.root(account_uuid), account_uuid)
+        query = build_root_query(
+            account_uuid, start_date, end_date, root_size, retrieval
+        )
+        if search_after is not None:
+            query["search_after"] = search_after
+        if pit is None:
+            return await root_search(query, account_uuid)
+        query["pit"] = {"id": pit_id, "keep_alive": pit.keep_alive}
+        fetched = await pit.search(query)
+        pit_id = fetched[0].get("pit_id", pit_id)
+        return fetched
+
+    page_root_wall_ms: list[float] = []
+    page_root_took_ms: list[int | None] = []
+    page_total_wall_ms: list[float] = []
+    try:
+        page_start = time.perf_counter()
+        (
+            root_payload,
+            root_ttfb_ms,
+            root_read_ms,
+            root_decode_ms,
+            root_wall_ms,
+            root_bytes,
+        ) = await fetch_root_page(None)
+        root_ids = extract_root_brand_ids(root_payload)
+
+        sub_query = sub_body(root_ids)
+        (
+            sub_payload,
+            sub_ttfb_ms,
+            sub_read_ms,
+            sub_decode_ms,
+            sub_wall_ms,
+            sub_bytes,
+        ) = await sub_search(sub_query, account_uuid)
+        page_root_wall_ms.append(root_wall_ms)
+        page_root_took_ms.append(root_payload.get("took"))
+        page_total_wall_ms.append((time.perf_counter() - page_start) * 1000.0)
+
+        page_payload = root_payload
+        for _ in range(1, pages):
+            hits = page_payload.get("hits", {}).get("hits", [])
+            if len(hits) < root_size or not hits[-1].get("sort"):
+                # Reached the end of the account history
+                break
+            page_start = time.perf_counter()
+            page_payload, _, _, _, page_wall_ms, _ = await fetch_root_page(
+                hits[-1]["sort"]
+            )
+            page_ids = extract_root_brand_ids(page_payload)
+            page_sub_query = sub_body(page_ids)
+            await sub_search(page_sub_query, account_uuid)
+            page_root_wall_ms.append(page_wall_ms)
+            page_root_took_ms.append(page_payload.get("took"))
+            page_total_wall_ms.append((time.perf_counter() - page_start) * 1000.0)
+    finally:
+        if pit is not None and pit_id is not None:
+            pit_close_ms = await pit.close(pit_id)
+    total_wall_ms = (time.perf_counter() - total_start) * 1000.0
+
+    result = IterationResult(
+        account_uuid=account_uuid,
+        iteration=0,
+        root_wall_ms=root_wall_ms,
+        root_es_took_ms=root_payload.get("took"),
+        root_ttfb_ms=root_ttfb_ms,
+        root_read_ms=root_read_ms,
+        root_decode_ms=root_decode_ms,
+        root_hits=hit_count(root_payload),
+        root_brand_ids=len(root_ids),
+        root_bytes=root_bytes,
+        sub_wall_ms=sub_wall_ms,
+        sub_es_took_ms=sub_payload.get("took"),
+        sub_ttfb_ms=sub_ttfb_ms,
+        sub_read_ms=sub_read_ms,
+        sub_decode_ms=sub_decode_ms,
+        sub_hits=hit_count(sub_payload),
+        sub_bytes=sub_bytes,
+        total_wall_ms=total_wall_ms,
+        page_root_wall_ms=page_root_wall_ms,
+        page_root_took_ms=page_root_took_ms,
+        page_total_wall_ms=page_total_wall_ms,
+        pit_open_ms=pit_open_ms,
+        pit_close_ms=pit_close_ms,
+    )
+
+    return result, root_ids
+
+
+async def run_combined_iteration(
+    search: SearchFn,
+    account_uuid: str,
+    start_date: str,
+    end_date: str,
+    root_size: int,
+    sub_size: int,
+    retrieval: str,
+    total_start: float,
+    templates: QueryTemplates | None = None,
+) -> tuple[IterationResult, list[str]]:
+    children_per_root = max(1, math.ceil(sub_size / max(root_size, 1)))
+    if templates is not None:
+        query: QueryBody = templates.combined(account_uuid)
+    else:
+        query = build_combined_query(
+            account_uuid, start_date, end_date, root_size, children_per_root, retrieval
+        )
+    (
+        payload,
+        ttfb_ms,
+        read_ms,
+        decode_ms,
+        wall_ms,
+        body_bytes,
+    ) = await search(query, account_uuid)
+    root_ids = extract_root_brand_ids(payload)
+    total_wall_ms = (time.perf_counter() - total_start) * 1000.0
+
+    # There is no second request; sub_* timings stay zero and sub_hits counts
+    # the aggregated children that joined onto a returned root
+    result = IterationResult(
+        account_uuid=account_uuid,
+        iteration=0,
+        root_wall_ms=wall_ms,
+        root_es_took_ms=payload.get("took"),
+        root_ttfb_ms=ttfb_ms,
+        root_read_ms=read_ms,
+        root_decode_ms=decode_ms,
+        root_hits=hit_count(payload),
+        root_brand_ids=len(root_ids),
+        root_bytes=body_bytes,
+        sub_wall_ms=0.0,
+        sub_es_took_ms=None,
+        sub_ttfb_ms=0.0,
+        sub_read_ms=0.0,
+        sub_decode_ms=0.0,
+        sub_hits=count_joined_children(payload, root_ids),
+        sub_bytes=0,
+        total_wall_ms=total_wall_ms,
+    )
+    return result, root_ids
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    args: argparse.Namespace,
+    accounts: list[str],
+    base_url: str,
+    scenario: Scenario,
+    target_ips: float,
+    log: Callable[[str], None],
+    raw_samples: TextIO | None = None,
+    stage: Stage = Stage(),
+    population: list[str] | None = None,
+) -> RunResult:
+    start_date, end_date = scenario.window()
+    sub_size = scenario.sub_size
+    templates: QueryTemplates | None = None
+    if args.query_encoding == "template":
+        templates = QueryTemplates(
+            start_date, end_date, scenario.root_size, sub_size, scenario.retrieval
+        )
+    url = search_url(base_url, args.index, scenario.request_cache, scenario.filter_path)
+    stage_label = f" [{stage.label}]" if stage.label else ""
+    log(f"Running scenario {scenario.label}{stage_label} against {url}")
+    stats = RunStats()
+    tracer = ConnectionTracer(stats)
+
+    batchers: list[MsearchBatcher] = []
+    if scenario.dispatch == "msearch":
+        for _ in ("root", "sub"):
+            batchers.append(
+                MsearchBatcher(
+                    client,
+                    base_url,
+                    args.index,
+                    scenario.request_cache,
+                    scenario.routing,
+                    scenario.filter_path,
+                    args.msearch_batch_size,
+                    args.msearch_max_wait_ms,
+                    args.timeout,
+                    tracer,
+                )
+            )
+        root_search: SearchFn = batchers[0].search
+        sub_search: SearchFn = batchers[1].search
+    else:
+
+        async def direct_search(
+            query: QueryBody,
+            account_uuid: str,
+        ) -> FetchTuple:
+            request_url = url
+            if scenario.routing:
+                request_url = f"{url}&routing={account_uuid}"
+            return await fetch_json(client, request_url, query, args.timeout, tracer)
+
+        root_search = sub_search = direct_search
+
+    # Root caching of the aggs strategy's single request caches the whole result
+    cache = None
+    if scenario.client_cache != "off":
+        cache = ResultCache(stats, args.cache_capacity, args.cache_ttl_s)
+    root_cache = result_cache = None
+    if scenario.client_cache == "full" or scenario.strategy == "aggs":
+        result_cache = cache
+    else:
+        root_cache = cache
+
+    retries = args.retries if args.on_error == "retry" else 0
+    hedge_percentile = parse_hedge(scenario.hedge)
+    resilient = [
+        ResilientSearch(search, stats, retries, args.retry_backoff_ms, hedge_percentile)
+        for search in (root_search, sub_search)
+    ]
+    root_search, sub_search = resilient
+
+    pit: PointInTime | None = None
+    if args.pit and scenario.strategy == "two-step":
+        pit = PointInTime(
+            client,
+            base_url,
+            args.index,
+            scenario.request_cache,
+            args.pit_keep_alive,
+            scenario.routing,
+            scenario.filter_path,
+            args.timeout,
+            tracer,
+        )
+
+    timeline = Timeline(args.timeline_interval) if args.timeline_interval > 0 else None
+    error_message: str | None = None
+    sample_root_query: dict[str, Any] | None = None
+    sample_sub_query: dict[str, Any] | None = None
+    sample_lock = asyncio.Lock()
+    results_lock = asyncio.Lock()
+    error_event = asyncio.Event()
+    start_time = time.perf_counter()
+    max_sample_ids = 10
+
+    workload = Workload(args, accounts, stage.duration_s is not None, population)
+
+    async def record_sample(root_ids: list[str]) -> None:
+        nonlocal sample_root_query, sample_sub_query
+        async with sample_lock:
+            if sample_root_query or sample_sub_query:
+                return
+            redacted_account = "<REDACTED_ACCOUNT>"
+            redacted_ids = [
+                f"<REDACTED_TXN_{i + 1}>"
+                for i in range(min(len(root_ids), max_sample_ids))
+            ]
+            if len(root_ids) > max_sample_ids:
+                redacted_ids.append("<REDACTED_TXN_MORE>")
+            if scenario.strategy == "aggs":
+                sample_root_query = build_combined_query(
+                    redacted_account,
+                    start_date,
+                    end_date,
+                    scenario.root_size,
+                    max(1, math.ceil(sub_size / max(scenario.root_size, 1))),
+                    scenario.retrieval,
+                )
+                return
+            sample_root_query = build_root_query(
+                redacted_account,
+                start_date,
+                end_date,
+                scenario.root_size,
+                scenario.retrieval,
+            )
+            sample_sub_query = build_sub_query(
+                redacted_account,
+                start_date,
+                end_date,
+                redacted_ids,
+                sub_size,
+                scenario.retrieval,
+            )
+
+    async def run_one(account_uuid: str, scheduled_at: float | None = None) -> None:
+        nonlocal error_message
+        if error_event.is_set():
+            return
+        started = time.perf_counter()
+        cache_key = (account_uuid, start_date, end_date, scenario.root_size, sub_size)
+        try:
+            cached = result_cache.get(cache_key) if result_cache else None
+            if cached is not None:
+                lookup_ms = (time.perf_counter() - started) * 1000.0
+                result, root_ids = cache_hit_result(cached[0], lookup_ms), cached[1]
+            else:
+                result, root_ids = await run_iteration(
+                    root_search,
+                    sub_search,
+                    account_uuid,
+                    start_date,
+                    end_date,
+                    scenario.root_size,
+                    sub_size,
+                    scenario.retrieval,
+                    scenario.strategy,
+                    max(1, args.pages),
+                    pit,
+                    templates,
+                    root_cache,
+                )
+                if result_cache is not None:
+                    result_cache.put(cache_key, (result, root_ids))
+            if scheduled_at is not None:
+                result.queue_delay_ms = max(started - scheduled_at, 0.0) * 1000.0
+                result.response_ms = result.queue_delay_ms + result.total_wall_ms
+            await record_sample(root_ids)
+            async with results_lock:
+                stats.add(result)
+                if timeline is not None:
+                    timeline.add(result)
+                if raw_samples is not None:
+                    record = {
+                        "scenario": scenario.label,
+                        "stage": stage.label,
+                        **asdict(result),
+                    }
+                    raw_samples.write(json.dumps(record) + "\n")
+            log(
+                f"{account_uuid} | "
+                f"root wall={result.root_wall_ms:8.2f} ms | "
+                f"root took={str(result.root_es_took_ms):>4} ms | "
+                f"root hits={result.root_hits:>4} | "
+                f"root ids={result.root_brand_ids:>3} | "
+                f"sub wall={result.sub_wall_ms:8.2f} ms | "
+                f"sub took={str(result.sub_es_took_ms):>4} ms | "
+                f"sub hits={result.sub_hits:>4} | "
+                f"total={result.total_wall_ms:8.2f} ms"
+            )
+        except (HttpError, httpx.RequestError) as exc:
+            if isinstance(exc, HttpError):
+                message = (
+                    "Query failed for account "
+                    f"{account_uuid}: HTTP {exc.status_code}"
+                )
+                if str(exc):
+                    message = f"{message} | {exc}"
+            else:
+                message = f"Request error for account {account_uuid}: {exc}"
+            stats.count("failed_iterations")
+            if timeline is not None:
+                timeline.error()
+            if args.on_error == "abort":
+                error_message = message
+                error_event.set()
+            else:
+                log(message)
+
+    deadline = None
+    if stage.duration_s is not None:
+        deadline = start_time + stage.duration_s
+
+    def current_rate(at: float) -> float:
+        if stage.ramp_to_ips is None or not stage.duration_s:
+            return target_ips
+        progress = min(max(at - start_time, 0.0) / stage.duration_s, 1.0)
+        return target_ips + (stage.ramp_to_ips - target_ips) * progress
+
+    max_concurrency = max(1, args.max_concurrency)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks: set[asyncio.Task[None]] = set()
+
+    dropped = 0
+    delayed = 0
+    pending = 0
+    late_threshold_s = max(args.late_threshold_ms, 0.0) / 1000.0
+
+    async def run_scheduled(account_uuid: str, scheduled_at: float) -> None:
+        nonlocal pending, delayed
+        try:
+            await semaphore.acquire()
+        finally:
+            pending -= 1
+        try:
+            if time.perf_counter() - scheduled_at > late_threshold_s:
+                delayed += 1
+            await run_one(account_uuid, scheduled_at)
+        finally:
+            semaphore.release()
+
+    async def dispatch_open() -> None:
+        nonlocal pending, dropped
+        # Fixed schedule from the start time: a slow ES (or a busy event loop)
+        # never pushes later sends back, it shows up as queue delay instead.
+        next_at = start_time
+        while not error_event.is_set():
+            item = workload.next()
+            if item is None:
+                break
+            account_uuid, offset = item
+            scheduled_at = next_at if offset is None else start_time + offset
+            if deadline is not None and scheduled_at >= deadline:
+                break
+            if offset is None:
+                next_at = scheduled_at + 1.0 / current_rate(scheduled_at)
+            sleep_for = scheduled_at - time.perf_counter()
+            if sleep_for > 0:
+                await asyncio.sleep(sleep_for)
+            if pending >= max(args.open_max_pending, 0):
+                dropped += 1
+                if timeline is not None:
+                    timeline.drop()
+                continue
+            pending += 1
+            task = asyncio.create_task(run_scheduled(account_uuid, scheduled_at))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    async def dispatch_closed() -> None:
+        next_fire = time.perf_counter()
+        while not error_event.is_set():
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            item = workload.next()
+            if item is None:
+                break
+            account_uuid, offset = item
+            if offset is not None:
+                sleep_for = start_time + offset - time.perf_counter()
+                if deadline is not None and start_time + offset >= deadline:
+                    break
+                if sleep_for > 0:
+                    await asyncio.sleep(sleep_for)
+            elif target_ips > 0:
+                now = time.perf_counter()
+                sleep_for = next_fire - now
+                if sleep_for > 0:
+                    await asyncio.sleep(sleep_for)
+            await semaphore.acquire()
+            task = asyncio.create_task(run_one(account_uuid))
+            tasks.add(task)
+
+            def _done_callback(done_task: asyncio.Task[None]) -> None:
+                tasks.discard(done_task)
+                semaphore.release()
+
+            task.add_done_callback(_done_callback)
+            if target_ips > 0:
+                next_fire += 1.0 / current_rate(next_fire)
 
-    rows = [
-        ("Runs", str(len(results))),
-        ("Root avg wall (ms)", mean_or_blank(root_wall)),
-        ("Root min/max wall (ms)", min_max(root_wall)),
-        ("Root p50 wall (ms)", percentile(root_wall, 50)),
-        ("Root p90 wall (ms)", percentile(root_wall, 90)),
-        ("Root p99 wall (ms)", percentile(root_wall, 99)),
-        ("Root avg TTFB (ms)", mean_or_blank(root_ttfb)),
-        ("Root p50 TTFB (ms)", percentile(root_ttfb, 50)),
-        ("Root p90 TTFB (ms)", percentile(root_ttfb, 90)),
-        ("Root p99 TTFB (ms)", percentile(root_ttfb, 99)),
-        ("Root avg read (ms)", mean_or_blank(root_read)),
-        ("Root p50 read (ms)", percentile(root_read, 50)),
-        ("Root p90 read (ms)", percentile(root_read, 90)),
-        ("Root p99 read (ms)", percentile(root_read, 99)),
-        ("Root avg decode (ms)", mean_or_blank(root_decode)),
-        ("Root p50 decode (ms)", percentile(root_decode, 50)),
-        ("Root p90 decode (ms)", percentile(root_decode, 90)),
-        ("Root p99 decode (ms)", percentile(root_decode, 99)),
-        ("Sub avg wall (ms)", mean_or_blank(sub_wall)),
-        ("Sub min/max wall (ms)", min_max(sub_wall)),
-        ("Sub p50 wall (ms)", percentile(sub_wall, 50)),
-        ("Sub p90 wall (ms)", percentile(sub_wall, 90)),
-        ("Sub p99 wall (ms)", percentile(sub_wall, 99)),
-        ("Sub avg TTFB (ms)", mean_or_blank(sub_ttfb)),
-        ("Sub p50 TTFB (ms)", percentile(sub_ttfb, 50)),
-        ("Sub p90 TTFB (ms)", percentile(sub_ttfb, 90)),
-        ("Sub p99 TTFB (ms)", percentile(sub_ttfb, 99)),
-        ("Sub avg read (ms)", mean_or_blank(sub_read)),
-        ("Sub p50 read (ms)", percentile(sub_read, 50)),
-        ("Sub p90 read (ms)", percentile(sub_read, 90)),
-        ("Sub p99 read (ms)", percentile(sub_read, 99)),
-        ("Sub avg decode (ms)", mean_or_blank(sub_decode)),
-        ("Sub p50 decode (ms)", percentile(sub_decode, 50)),
-        ("Sub p90 decode (ms)", percentile(sub_decode, 90)),
-        ("Sub p99 decode (ms)", percentile(sub_decode, 99)),
-        ("Total avg wall (ms)", mean_or_blank(total_wall)),
-        ("Total min/max (ms)", min_max(total_wall)),
-        ("Total p50 wall (ms)", percentile(total_wall, 50)),
-        ("Total p90 wall (ms)", percentile(total_wall, 90)),
-        ("Total p99 wall (ms)", percentile(total_wall, 99)),
-        ("Root avg ES took (ms)", mean_or_blank(root_es)),
-        ("Sub avg ES took (ms)", mean_or_blank(sub_es)),
-        ("Root hits (unique)", unique_list(root_counts)),
-        ("Root brand IDs (unique)", unique_list(brand_counts)),
-        ("Sub hits (unique)", unique_list(sub_counts)),
-    ]
+    if scenario.load_model == "open":
+        await dispatch_open()
+    else:
+        await dispatch_closed()
 
-    lines = ["| Metric | Value |", "| --- | --- |"]
-    lines.extend([f"| {label} | {value} |" for label, value in rows])
-    lines.append("")
-    return "\n".join(lines)
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    # Losing primaries may still be queued in a batcher, so drain them first
+    for search in resilient:
+        await search.drain()
+    for batcher in batchers:
+        await batcher.close()
+
+    end_time = time.perf_counter()
+    elapsed = max(end_time - start_time, 0.000001)
+    achieved_ips = stats.runs / elapsed if stats.runs else 0.0
 
+    details: dict[str, str] = {}
+    if scenario.load_model == "open":
+        details["Dropped (pending limit)"] = str(dropped)
+        details[f"Delayed (> {args.late_threshold_ms:g} ms late)"] = str(delayed)
+    for phase, batcher in zip(("Root", "Sub"), batchers):
+        details[f"{phase} _msearch requests"] = str(batcher.batches)
+        if batcher.batches:
+            avg_batch = batcher.searches / batcher.batches
+            details[f"{phase} avg searches per _msearch"] = f"{avg_batch:.2f}"
 
-def build_report(
-    base_url: str,
-    index: str,
-    start_date: str,
-    end_date: str,
-    root_size: int,
-    sub_multiplier: float,
-    sub_size: int,
-    iterations: int,
-    request_cache: str,
-    range_value: str,
-    routing_enabled: bool,
-    target_ips: float,
-    achieved_ips: float | None,
-    max_concurrency: int,
-    all_results: list[IterationResult],
-    sample_root_query: dict[str, Any] | None,
-    sample_sub_query: dict[str, Any] | None,
-    error_message: str | None,
-) -> str:
-    generated = iso_utc(datetime.now(timezone.utc))
+    intended_ips = workload.replay_ips()
+    if intended_ips is None:
+        intended_ips = (
+            (target_ips + stage.ramp_to_ips) / 2.0
+            if stage.ramp_to_ips is not None
+            else target_ips
+        )
+    return RunResult(
+        scenario=scenario,
+        stats=stats,
+        elapsed_s=elapsed,
+        achieved_ips=achieved_ips,
+        error_message=error_message,
+        sample_root_query=sample_root_query,
+        sample_sub_query=sample_sub_query,
+        details=details,
+        intended_ips=intended_ips,
+        dropped=dropped,
+        delayed=delayed,
+        timeline=timeline,
+        stage=stage.label,
+    )
+
+
+def parse_profile_ips(args: argparse.Namespace) -> tuple[float, float]:
+    try:
+        start_ips, end_ips = (float(v) for v in args.profile_ips.split(","))
+    except (AttributeError, ValueError):
+        raise SystemExit(
+            f"--load-profile {args.load_profile} needs --profile-ips START,END"
+        )
+    if start_ips <= 0 or end_ips <= 0:
+        raise SystemExit("--profile-ips rates must be positive")
+    return start_ips, end_ips
+
+
+def slo_p99_ms(run: RunResult) -> float | None:
+    metric = "response_ms" if run.scenario.load_model == "open" else "total_wall_ms"
+    return run.stats.hist(metric).percentile(99)
+
+
+def meets_slo(run: RunResult, slo_ms: float) -> bool:
+    # A stage only counts if ES kept up: no errors, no drops, >= 90% of the rate
+    p99 = slo_p99_ms(run)
+    return (
+        run.error_message is None
+        and run.dropped == 0
+        and p99 is not None
+        and p99 <= slo_ms
+        and run.achieved_ips >= 0.9 * run.intended_ips
+    )
+
+
+def build_profile_table(runs: list[RunResult], slo_ms: float | None) -> list[str]:
     lines = [
-        "# ES Performance Report",
-        "",
-        f"- Generated: {generated}",
-        f"- Base URL: {base_url}",
-        f"- Index: {index}",
-        f"- Date range: {start_date} .. {end_date}",
-        f"- Range: {range_value}",
-        f"- Root size: {root_size}",
-        f"- Sub multiplier: {sub_multiplier}",
-        f"- Sub size: {sub_size}",
-        f"- Iterations: {iterations}",
-        f"- Target IPS: {target_ips}",
-        (
-            f"- Achieved IPS: {achieved_ips:.2f}"
-            if achieved_ips is not None
-            else "- Achieved IPS:"
-        ),
-        f"- Max concurrency: {max_concurrency}",
-        f"- Request cache: {request_cache}",
-        f"- Routing: {'enabled' if routing_enabled else 'disabled'}",
-        "",
+        "| Stage | Intended IPS | Achieved IPS | p99 (ms) | Errors | Dropped "
+        + ("| Within SLO |" if slo_ms is not None else "|"),
+        "| --- | --- | --- | --- | --- | --- |"
+        + (" --- |" if slo_ms is not None else ""),
     ]
+    for run in runs:
+        p99 = slo_p99_ms(run)
+        row = (
+            f"| {run.stage} | {run.intended_ips:.2f} | {run.achieved_ips:.2f} "
+            f"| {f'{p99:.2f}' if p99 is not None else ''} "
+            f"| {'yes' if run.error_message else ''} | {run.dropped} |"
+        )
+        if slo_ms is not None:
+            row += f" {'yes' if meets_slo(run, slo_ms) else 'no'} |"
+        lines.append(row)
+    return lines
 
-    lines.extend(["## Results Summary", ""])
-    if error_message:
-        lines.extend([f"Error: {error_message}", ""])
 
-    if all_results:
-        lines.append(build_report_table(all_results))
-    else:
-        lines.extend(["No results collected.", ""])
+async def run_profile(
+    args: argparse.Namespace,
+    scenario: Scenario,
+    run_stage: Callable[[Scenario, float, Stage], Awaitable[RunResult]],
+) -> tuple[list[RunResult], list[str]]:
+    """Run the --load-profile stages for one scenario; returns runs and report lines."""
+    start_ips, end_ips = parse_profile_ips(args)
+    steps = max(1, args.profile_steps)
+    duration = args.stage_duration or 30.0
+    runs: list[RunResult] = []
+    summary = [f"### {scenario.label}: {args.load_profile}", ""]
 
-    if sample_root_query or sample_sub_query:
-        lines.extend(
-            [
-                "## Sample Queries",
-                "",
-                "Account UUID and transaction IDs are redacted.",
-                f"Routing: {'routing=<REDACTED_ACCOUNT>' if routing_enabled else 'disabled'}",
-                "",
-            ]
-        )
-        if sample_root_query:
-            lines.extend(
-                [
-                    "### Root Query",
-                    "",
-                    "```json",
-                    json.dumps(sample_root_query, indent=2),
-                    "```",
-                    "",
-                ]
-            )
-        if sample_sub_query:
-            lines.extend(
-                [
-                    "### Sub Query",
-                    "",
-                    "```json",
-                    json.dumps(sample_sub_query, indent=2),
-                    "```",
-                    "",
-                ]
+    if args.load_profile == "step":
+        for i in range(steps):
+            ips = start_ips + (end_ips - start_ips) * i / max(steps - 1, 1)
+            stage = Stage(f"step {i + 1}/{steps} @ {ips:g} IPS", duration)
+            runs.append(await run_stage(scenario, ips, stage))
+    elif args.load_profile == "linear":
+        span = (end_ips - start_ips) / steps
+        for i in range(steps):
+            low = start_ips + span * i
+            stage = Stage(
+                f"ramp {i + 1}/{steps} {low:g}->{low + span:g} IPS",
+                duration,
+                low + span,
             )
+            runs.append(await run_stage(scenario, low, stage))
+    else:
+        if args.slo_p99_ms is None:
+            raise SystemExit("--load-profile slo-search needs --slo-p99-ms")
+        low, high = min(start_ips, end_ips), max(start_ips, end_ips)
+        best: float | None = None
+        # The first probe checks the top of the range; then bisect
+        probe = high
+        for i in range(steps):
+            stage = Stage(f"probe {i + 1} @ {probe:g} IPS", duration)
+            run = await run_stage(scenario, probe, stage)
+            runs.append(run)
+            if meets_slo(run, args.slo_p99_ms):
+                best = probe
+                low = probe
+            else:
+                high = probe
+            if best == high:
+                break
+            probe = (low + high) / 2.0
+        summary.append(
+            f"- Max IPS with p99 <= {args.slo_p99_ms:g} ms: "
+            + (f"{best:g}" if best is not None else f"none at or above {low:g}")
+        )
+        summary.append("")
 
-    return "\n".join(lines).rstrip() + "\n"
+    summary.extend(build_profile_table(runs, args.slo_p99_ms))
+    summary.append("")
+    return runs, summary
 
 
-async def run_iteration(
-    client: httpx.AsyncClient,
-    account_uuid: str,
-    url: str,
-    start_date: str,
-    end_date: str,
-    root_size: int,
-    sub_size: int,
-    timeout: float,
-    routing_enabled: bool,
-) -> tuple[IterationResult, list[str]]:
-    total_start = time.perf_counter()
+def build_client(
+    args: argparse.Namespace, headers: dict[str, str], connection: str = "pooled"
+) -> httpx.AsyncClient:
+    max_connections = args.max_connections
+    max_keepalive = args.max_keepalive_connections
+    if connection == "small-pool":
+        max_connections = max_keepalive = max(1, args.small_pool_size)
+    elif connection == "fresh":
+        # Nothing is returned to the pool and the server is asked to close too
+        max_keepalive = 0
+        headers = {**headers, "Connection": "close"}
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+    )
+    return httpx.AsyncClient(
+        headers=headers,
+        timeout=args.timeout,
+        verify=False,
+        limits=limits,
+        http2=connection == "http2",
+    )
 
-    root_query = build_root_query(account_uuid, start_date, end_date, root_size)
-    root_url = url
-    if routing_enabled:
-        root_url = f"{url}&routing={account_uuid}"
-    (
-        root_payload,
-        root_ttfb_ms,
-        root_read_ms,
-        root_decode_ms,
-        root_wall_ms,
-    ) = await fetch_json(client, root_url, root_query, timeout)
-    root_ids = extract_root_brand_ids(root_payload)
-
-    sub_query = build_sub_query(account_uuid, start_date, end_date, root_ids, sub_size)
-    sub_url = url
-    if routing_enabled:
-        sub_url = f"{url}&routing={account_uuid}"
-    (
-        sub_payload,
-        sub_ttfb_ms,
-        sub_read_ms,
-        sub_decode_ms,
-        sub_wall_ms,
-    ) = await fetch_json(client, sub_url, sub_query, timeout)
-    total_wall_ms = (time.perf_counter() - total_start) * 1000.0
 
-    result = IterationResult(
-        account_uuid=account_uuid,
-        iteration=0,
-        root_wall_ms=root_wall_ms,
-        root_es_took_ms=root_payload.get("took"),
-        root_ttfb_ms=root_ttfb_ms,
-        root_read_ms=root_read_ms,
-        root_decode_ms=root_decode_ms,
-        root_hits=hit_count(root_payload),
-        root_brand_ids=len(root_ids),
-        sub_wall_ms=sub_wall_ms,
-        sub_es_took_ms=sub_payload.get("took"),
-        sub_ttfb_ms=sub_ttfb_ms,
-        sub_read_ms=sub_read_ms,
-        sub_decode_ms=sub_decode_ms,
-        sub_hits=hit_count(sub_payload),
-        total_wall_ms=total_wall_ms,
+def merge_details(details: list[dict[str, str]]) -> dict[str, str]:
+    # Counters add up across workers; averages are averaged
+    merged: dict[str, str] = {}
+    for label in dict.fromkeys(k for d in details for k in d):
+        values = [d[label] for d in details if label in d]
+        try:
+            merged[label] = str(sum(int(v) for v in values))
+        except ValueError:
+            try:
+                average = sum(float(v) for v in values) / len(values)
+                merged[label] = f"{average:.2f}"
+            except ValueError:
+                merged[label] = values[0]
+    return merged
+
+
+async def run_worker(
+    tasks: Any,
+    results: Any,
+    worker_id: int,
+    args: argparse.Namespace,
+    accounts: list[str],
+    population: list[str],
+    base_url: str,
+    headers: dict[str, str],
+) -> None:
+    """Run stages sent by the parent until it sends None."""
+
+    def log(message: str) -> None:
+        if args.verbose:
+            print(f"[worker {worker_id}] {message}", flush=True)
+
+    raw_samples = (
+        open(f"{args.raw_samples}.{worker_id}", "a", encoding="utf-8")
+        if args.raw_samples
+        else contextlib.nullcontext()
     )
+    with raw_samples:
+        # Clients live as long as the worker, so later stages reuse warm pools
+        async with contextlib.AsyncExitStack() as clients:
+            by_mode: dict[str, httpx.AsyncClient] = {}
+            results.put(("ready", worker_id, None))
+            while True:
+                task = await asyncio.to_thread(tasks.get)
+                if task is None:
+                    return
+                scenario, target_ips, stage, start_at = task
+                try:
+                    client = by_mode.get(scenario.connection)
+                    if client is None:
+                        client = await clients.enter_async_context(
+                            build_client(args, headers, scenario.connection)
+                        )
+                        by_mode[scenario.connection] = client
+                    await asyncio.sleep(max(0.0, start_at - time.time()))
+                    started = time.time()
+                    run = await run_load(
+                        client,
+                        args,
+                        accounts,
+                        base_url,
+                        scenario,
+                        target_ips,
+                        log,
+                        raw_samples if args.raw_samples else None,
+                        stage,
+                        population,
+                    )
+                    results.put(("run", worker_id, (run, started, time.time())))
+                except Exception as exc:
+                    results.put(("failed", worker_id, f"{type(exc).__name__}: {exc}"))
 
-    return result, root_ids
+
+def worker_process(tasks: Any, results: Any, worker_id: int, *params: Any) -> None:
+    try:
+        asyncio.run(run_worker(tasks, results, worker_id, *params))
+    except BaseException as exc:
+        results.put(("failed", worker_id, f"{type(exc).__name__}: {exc}"))
+
+
+class WorkerPool:
+    """
+    --workers processes that stay up for every scenario and stage.
+
+    Each worker owns a slice of the accounts and keeps its HTTP clients
+    between stages, like the single-process path. The target rate is split
+    by each slice's share of the --workload weight. A stage starts on all
+    workers at the same wall-clock instant, and its elapsed time runs from
+    the first worker's start to the last worker's end.
+    """
+
+    # Lead time for a stage's shared start, enough for every worker to get it
+    start_delay_s = 0.05
+
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        accounts: list[str],
+        base_url: str,
+        headers: dict[str, str],
+        log: Callable[[str], None],
+    ) -> None:
+        self.workers = max(1, min(args.workers, len(accounts)))
+        self.timeline_interval = args.timeline_interval
+        self.log = log
+        worker_args = argparse.Namespace(**vars(args))
+        worker_args.max_concurrency = math.ceil(
+            max(1, args.max_concurrency) / self.workers
+        )
+        worker_args.max_connections = math.ceil(args.max_connections / self.workers)
+        worker_args.max_keepalive_connections = math.ceil(
+            args.max_keepalive_connections / self.workers
+        )
+        worker_args.small_pool_size = math.ceil(
+            max(1, args.small_pool_size) / self.workers
+        )
+        self.max_concurrency = worker_args.max_concurrency
+        slices = [
+            accounts[worker_id :: self.workers] for worker_id in range(self.workers)
+        ]
+        weights = dict(zip(accounts, account_weights(args, accounts)))
+        total_weight = sum(weights.values())
+        self.shares = [
+            sum(weights[account] for account in part) / total_weight for part in slices
+        ]
+
+        # spawn: a fresh interpreter per worker instead of a fork of the running loop
+        context = multiprocessing.get_context("spawn")
+        self.results = context.Queue()
+        self.tasks = [context.Queue() for _ in range(self.workers)]
+        self.processes = []
+        for worker_id in range(self.workers):
+            own_args = argparse.Namespace(**vars(worker_args))
+            if args.workload_seed is not None:
+                # Distinct seeds, or every worker would draw in lockstep
+                own_args.workload_seed = args.workload_seed + worker_id
+            self.processes.append(
+                context.Process(
+                    target=worker_process,
+                    args=(
+                        self.tasks[worker_id],
+                        self.results,
+                        worker_id,
+                        own_args,
+                        slices[worker_id],
+                        accounts,
+                        base_url,
+                        headers,
+                    ),
+                )
+            )
+        self.alive = set(range(self.workers))
+        self.startup_failures: list[str] = []
+
+    def __enter__(self) -> WorkerPool:
+        for process in self.processes:
+            process.start()
+        # Interpreter start and imports take 100+ ms; wait so stage 1 is not skewed
+        _, self.startup_failures = self.collect("ready")
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        for worker_id in self.alive:
+            self.tasks[worker_id].put(None)
+        for process in self.processes:
+            process.join(timeout=10.0)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    def collect(self, kind: str) -> tuple[dict[int, Any], list[str]]:
+        """Wait for one `kind` message from every live worker."""
+        messages: dict[int, Any] = {}
+        failures: list[str] = []
+        pending = set(self.alive)
+        while pending:
+            try:
+                message, worker_id, payload = self.results.get(timeout=1.0)
+            except Exception:
+                # Nothing queued; give up on workers that died without reporting
+                for worker_id in list(pending):
+                    if not self.processes[worker_id].is_alive():
+                        code = self.processes[worker_id].exitcode
+                        failures.append(f"worker {worker_id} exited with code {code}")
+                        pending.discard(worker_id)
+                        self.alive.discard(worker_id)
+                continue
+            pending.discard(worker_id)
+            if message == kind:
+                messages[worker_id] = payload
+            else:
+                failures.append(f"worker {worker_id}: {payload}")
+                if not self.processes[worker_id].is_alive():
+                    self.alive.discard(worker_id)
+        return messages, failures
+
+    def run_stage(
+        self, scenario: Scenario, target_ips: float, stage: Stage = Stage()
+    ) -> RunResult:
+        """Run one scenario stage across the workers and merge their results."""
+        self.log(
+            f"Running scenario {scenario.label} on {len(self.alive)} workers "
+            f"({target_ips:g} IPS split by account weight, "
+            f"{self.max_concurrency} in flight each)"
+        )
+        start_at = time.time() + self.start_delay_s
+        for worker_id in self.alive:
+            share = self.shares[worker_id]
+            worker_stage = stage
+            if stage.ramp_to_ips is not None:
+                worker_stage = dataclasses.replace(
+                    stage, ramp_to_ips=stage.ramp_to_ips * share
+                )
+            self.tasks[worker_id].put(
+                (scenario, target_ips * share, worker_stage, start_at)
+            )
+        finished, failures = self.collect("run")
+
+        runs = [run for run, _, _ in finished.values()]
+        stats = RunStats()
+        timeline = (
+            Timeline(self.timeline_interval) if self.timeline_interval > 0 else None
+        )
+        for run in runs:
+            stats.merge(run.stats)
+            if timeline is not None and run.timeline is not None:
+                timeline.merge(run.timeline)
+        # The stage spans every worker's window, not just the slowest worker's
+        elapsed = max(
+            (
+                max(end for _, _, end in finished.values())
+                - min(start for _, start, _ in finished.values())
+                if finished
+                else 0.0
+            ),
+            0.000001,
+        )
+        errors = (
+            [run.error_message for run in runs if run.error_message]
+            + self.startup_failures
+            + failures
+        )
+        details = merge_details([run.details for run in runs])
+        details["Workers"] = str(self.workers)
+        first = next((run for run in runs if run.sample_root_query), None)
+        return RunResult(
+            scenario=scenario,
+            stats=stats,
+            elapsed_s=elapsed,
+            achieved_ips=stats.runs / elapsed if stats.runs else 0.0,
+            error_message="; ".join(errors) if errors else None,
+            sample_root_query=first.sample_root_query if first else None,
+            sample_sub_query=first.sample_sub_query if first else None,
+            details=details,
+            intended_ips=(
+                (target_ips + stage.ramp_to_ips) / 2.0
+                if stage.ramp_to_ips is not None
+                else target_ips
+            ),
+            dropped=sum(run.dropped for run in runs),
+            delayed=sum(run.delayed for run in runs),
+            timeline=timeline,
+            stage=stage.label,
+        )
 
 
 async def main() -> int:
     args = parse_args()
     accounts = load_accounts(args)
-
-    range_value = args.range.strip().lower()
-    if not range_value.endswith("m") or not range_value[:-1].isdigit():
-        raise SystemExit("Range must be in months, e.g. 1m, 3m, 18m")
-    range_months = int(range_value[:-1])
-    if range_months <= 0:
-        raise SystemExit("Range must be a positive month value, e.g. 1m")
-
-    now = datetime.now(timezone.utc)
-    start_date = iso_utc(now - timedelta(days=30 * range_months))
-    end_date = iso_utc(now)
-    sub_size = max(1, int(args.root_size * args.sub_multiplier))
+    scenarios = build_scenarios(args)
+    first = scenarios[0]
+    start_date, end_date = first.window()
 
     base_url = args.base_url.rstrip("/")
-    url = f"{base_url}/{args.index}/_search?request_cache={args.request_cache}"
 
     if args.pretty_root_query:
-        query = build_root_query(accounts[0], start_date, end_date, args.root_size)
+        query = build_root_query(
+            accounts[0],
+            start_date,
+            end_date,
+            first.root_size,
+            first.retrieval,
+        )
         print(json.dumps(query, indent=2))
         return 0
 
@@ -633,7 +4018,12 @@ async def main() -> int:
             "Chg:GINV:12407948:20260301T00:09:26UTC:20260323T00:09:26UTC",
         ]
         query = build_sub_query(
-            accounts[0], start_date, end_date, example_root_ids, sub_size
+            accounts[0],
+            start_date,
+            end_date,
+            example_root_ids,
+            first.sub_size,
+            first.retrieval,
         )
         print(json.dumps(query, indent=2))
         return 0
@@ -643,20 +4033,25 @@ async def main() -> int:
             print(message)
 
     log("Benchmark configuration")
-    log(f"  URL:                     {url}")
+    log(f"  Base URL:                {base_url}")
+    log(f"  Index:                   {args.index}")
     log(f"  Accounts:                {len(accounts)}")
-    log(f"  Date range:              {start_date} .. {end_date}")
-    log(f"  Range:                   {range_value}")
+    log(f"  Range:                   {args.range}")
     log(f"  Root size:               {args.root_size}")
     log(f"  Sub multiplier:          {args.sub_multiplier}")
-    log(f"  Sub size:                {sub_size}")
     log(f"  Iterations:              {args.iterations}")
     target_ips = args.target_ips if args.target_ips > 0 else 0.0
     log(f"  Target IPS:              {target_ips}")
+    log(f"  Load model:              {args.load_model}")
     log(f"  Max concurrency:         {args.max_concurrency}")
     log(f"  Max connections:         {args.max_connections}")
     log(f"  Max keepalive conns:     {args.max_keepalive_connections}")
-    log(f"  Routing:                 {'enabled' if args.routing else 'disabled'}")
+    log(f"  Connection modes:        {args.connection_mode}")
+    log(f"  Routing:                 {args.routing}")
+    log(f"  Request cache:           {args.request_cache}")
+    log(f"  Workers:                 {args.workers}")
+    log(f"  Load profile:            {args.load_profile}")
+    log(f"  Scenarios:               {', '.join(s.label for s in scenarios)}")
 
     api_key = os.environ.get(args.api_key_env)
     if not api_key:
@@ -684,177 +4079,130 @@ async def main() -> int:
             f" | env={args.api_key_env}"
         )
 
-    limits = httpx.Limits(
-        max_connections=args.max_connections,
-        max_keepalive_connections=args.max_keepalive_connections,
-    )
+    runs: list[RunResult] = []
+    profile_summary: list[str] = []
 
-    all_results: list[IterationResult] = []
-    error_message: str | None = None
-    sample_root_query: dict[str, Any] | None = None
-    sample_sub_query: dict[str, Any] | None = None
-    sample_lock = asyncio.Lock()
-    results_lock = asyncio.Lock()
-    error_event = asyncio.Event()
-    start_time = time.perf_counter()
-    max_sample_ids = 10
+    async def run_scenarios(
+        run_stage: Callable[[Scenario, float, Stage], Awaitable[RunResult]],
+    ) -> None:
+        if args.node_stats_interval > 0:
+            # A client of its own, so polls never wait on the benchmark's pool
+            async with build_client(args, headers) as stats_client:
+                collector = NodeStatsCollector(
+                    stats_client,
+                    base_url,
+                    args.node_stats_interval,
+                    args.timeline_interval,
+                    args.timeout,
+                    log,
+                )
 
-    account_index = 0
-    accounts_list = list(accounts)
-    remaining_by_account = {account: args.iterations for account in accounts}
+                async def observed_stage(
+                    scenario: Scenario, stage_ips: float, stage: Stage
+                ) -> RunResult:
+                    async with collector.sampling() as server_timeline:
+                        run = await run_stage(scenario, stage_ips, stage)
+                    if run.timeline is None:
+                        run.timeline = Timeline(args.timeline_interval)
+                    run.timeline.merge(server_timeline)
+                    run.details.update(server_timeline.server_summary())
+                    return run
 
-    async def record_sample(root_ids: list[str]) -> None:
-        nonlocal sample_root_query, sample_sub_query
-        async with sample_lock:
-            if sample_root_query or sample_sub_query:
-                return
-            redacted_account = "<REDACTED_ACCOUNT>"
-            redacted_ids = [
-                f"<REDACTED_TXN_{i + 1}>"
-                for i in range(min(len(root_ids), max_sample_ids))
-            ]
-            if len(root_ids) > max_sample_ids:
-                redacted_ids.append("<REDACTED_TXN_MORE>")
-            sample_root_query = build_root_query(
-                redacted_account, start_date, end_date, args.root_size
-            )
-            sample_sub_query = build_sub_query(
-                redacted_account,
-                start_date,
-                end_date,
-                redacted_ids,
-                sub_size,
-            )
+                await run_stages(observed_stage)
+        else:
+            await run_stages(run_stage)
 
-    async def run_one(account_uuid: str) -> None:
-        nonlocal error_message
-        if error_event.is_set():
-            return
-        try:
-            result, root_ids = await run_iteration(
-                client,
-                account_uuid,
-                url,
-                start_date,
-                end_date,
-                args.root_size,
-                sub_size,
-                args.timeout,
-                args.routing,
-            )
-            await record_sample(root_ids)
-            async with results_lock:
-                all_results.append(result)
-            log(
-                f"{account_uuid} | "
-                f"root wall={result.root_wall_ms:8.2f} ms | "
-                f"root took={str(result.root_es_took_ms):>4} ms | "
-                f"root hits={result.root_hits:>4} | "
-                f"root ids={result.root_brand_ids:>3} | "
-                f"sub wall={result.sub_wall_ms:8.2f} ms | "
-                f"sub took={str(result.sub_es_took_ms):>4} ms | "
-                f"sub hits={result.sub_hits:>4} | "
-                f"total={result.total_wall_ms:8.2f} ms"
-            )
-        except HttpError as exc:
-            error_message = (
-                "Query failed for account " f"{account_uuid}: HTTP {exc.status_code}"
-            )
-            if str(exc):
-                error_message = f"{error_message} | {exc}"
-            error_event.set()
-        except httpx.RequestError as exc:
-            error_message = f"Request error for account {account_uuid}: {exc}"
-            error_event.set()
-
-    def next_account() -> str | None:
-        nonlocal account_index
-        if not remaining_by_account:
-            return None
-        for _ in range(len(accounts_list)):
-            account = accounts_list[account_index % len(accounts_list)]
-            account_index += 1
-            remaining = remaining_by_account.get(account, 0)
-            if remaining > 0:
-                remaining_by_account[account] = remaining - 1
-                if remaining_by_account[account] == 0:
-                    remaining_by_account.pop(account, None)
-                return account
-        return None
+    async def run_stages(
+        run_stage: Callable[[Scenario, float, Stage], Awaitable[RunResult]],
+    ) -> None:
+        for scenario in scenarios:
+            if args.load_profile == "fixed":
+                stage = Stage(duration_s=args.stage_duration)
+                runs.append(await run_stage(scenario, target_ips, stage))
+            else:
+                stage_runs, summary = await run_profile(args, scenario, run_stage)
+                runs.extend(stage_runs)
+                profile_summary.extend(summary)
 
-    total_iterations = args.iterations * len(accounts)
-    max_concurrency = max(1, args.max_concurrency)
-    semaphore = asyncio.Semaphore(max_concurrency)
-    tasks: set[asyncio.Task[None]] = set()
+    if args.workers > 1:
+        for worker_id in range(args.workers):
+            if args.raw_samples:
+                Path(f"{args.raw_samples}.{worker_id}").unlink(missing_ok=True)
 
-    async with httpx.AsyncClient(
-        headers=headers,
-        timeout=args.timeout,
-        verify=False,
-        limits=limits,
-    ) as client:
-        next_fire = time.perf_counter()
-        for _ in range(total_iterations):
-            if error_event.is_set():
-                break
-            account_uuid = next_account()
-            if not account_uuid:
-                break
-            if target_ips > 0:
-                now = time.perf_counter()
-                sleep_for = next_fire - now
-                if sleep_for > 0:
-                    await asyncio.sleep(sleep_for)
-            await semaphore.acquire()
-            task = asyncio.create_task(run_one(account_uuid))
-            tasks.add(task)
+        with WorkerPool(args, accounts, base_url, headers, log) as pool:
 
-            def _done_callback(done_task: asyncio.Task[None]) -> None:
-                tasks.discard(done_task)
-                semaphore.release()
+            async def run_worker_stage(
+                scenario: Scenario, stage_ips: float, stage: Stage
+            ) -> RunResult:
+                return await asyncio.to_thread(
+                    pool.run_stage, scenario, stage_ips, stage
+                )
 
-            task.add_done_callback(_done_callback)
-            if target_ips > 0:
-                next_fire += 1.0 / target_ips
+            await run_scenarios(run_worker_stage)
+    else:
+        raw_samples = (
+            open(args.raw_samples, "w", encoding="utf-8")
+            if args.raw_samples
+            else contextlib.nullcontext()
+        )
+        with raw_samples:
+            # One client per connection mode, shared by every scenario and
+            # stage, keeps the pool warm
+            async with contextlib.AsyncExitStack() as clients:
+                by_mode: dict[str, httpx.AsyncClient] = {}
 
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+                async def run_local_stage(
+                    scenario: Scenario, stage_ips: float, stage: Stage
+                ) -> RunResult:
+                    client = by_mode.get(scenario.connection)
+                    if client is None:
+                        client = await clients.enter_async_context(
+                            build_client(args, headers, scenario.connection)
+                        )
+                        by_mode[scenario.connection] = client
+                    return await run_load(
+                        client,
+                        args,
+                        accounts,
+                        base_url,
+                        scenario,
+                        stage_ips,
+                        log,
+                        raw_samples if args.raw_samples else None,
+                        stage,
+                    )
 
-    end_time = time.perf_counter()
-    elapsed = max(end_time - start_time, 0.000001)
-    achieved_ips = len(all_results) / elapsed if all_results else 0.0
+                await run_scenarios(run_local_stage)
 
     if args.report_md is not None:
         report_path = Path(args.report_md)
     else:
-        report_filename = f"es_performance_report_{range_value}_root{args.root_size}.md"
+        ranges = "-".join(dict.fromkeys(s.range_value for s in scenarios))
+        root_sizes = "-".join(dict.fromkeys(str(s.root_size) for s in scenarios))
+        report_filename = f"es_performance_report_{ranges}_root{root_sizes}.md"
         report_path = Path("es_reports") / report_filename
     if report_path:
         report_path.parent.mkdir(parents=True, exist_ok=True)
         report_content = build_report(
             base_url,
             args.index,
-            start_date,
-            end_date,
-            args.root_size,
-            args.sub_multiplier,
-            sub_size,
             args.iterations,
-            args.request_cache,
-            range_value,
-            args.routing,
             target_ips,
-            achieved_ips,
-            max_concurrency,
-            all_results,
-            sample_root_query,
-            sample_sub_query,
-            error_message,
+            max(1, args.max_concurrency),
+            runs,
+            max(1, args.pages),
+            args.pit_keep_alive if args.pit else None,
+            profile_summary,
+            describe_workload(args),
+            accounts,
+            args.report_top_accounts,
         )
         report_path.write_text(report_content, encoding="utf-8")
         print(f"Report written: {report_path}")
+        for timeline_path in write_timeline(report_path, runs):
+            print(f"Timeline written: {timeline_path}")
 
-    return 1 if error_message else 0
+    return 1 if any(run.error_message for run in runs) else 0
 
 
 if __name__ == "__main__":
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Low-overhead replacement for the es_stats.bash collector loops.
+
+One long-lived process keeps keep-alive connections to ES. Every
+--interval seconds, on wall-clock multiples of the interval, it fetches
+_nodes/stats, _cat/thread_pool, _cluster/health and a / probe
+concurrently. Each response is appended as one JSON line to a single
+gzip stream; es_stats_summarize.py reads the stream as well as
+es_stats.bash capture directories.
+
+Unlike the bash loops, there is no curl fork, TLS handshake or temp file
+per sample, so sub-second intervals are practical and the probe measures
+the request rather than connection setup. An endpoint still in flight
+when its next tick comes is skipped for that tick rather than piling up.
+_nodes/stats is trimmed with filter_path to the fields the summarizer
+reads, unless --full-node-stats is given.
+
+Usage:
+  export ES_API_KEY="..."
+  python es_stats_collect.py --base-url https://your-es-host:9200 \\
+    --interval 0.1 --out es_capture.jsonl.gz
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import gzip
+import json
+import math
+import os
+import signal
+import sys
+import time
+from datetime import datetime
+from typing import Any, BinaryIO
+
+import httpx
+
+NODE_STATS_PATH = "/_nodes/stats/indices,thread_pool,http,breaker,jvm,os"
+NODE_STATS_FILTER = ",".join(
+    f"nodes.*.{field}"
+    for field in (
+        "name",
+        "indices.search",
+        "indices.query_cache",
+        "thread_pool.search",
+        "jvm.mem.heap_used_percent",
+        "jvm.gc",
+        "breakers.*.tripped",
+        "os.cpu.percent",
+        "http.current_open",
+    )
+)
+# Same pools and columns as es_stats.bash, so both captures parse alike
+THREAD_POOL_PATH = (
+    "/_cat/thread_pool/search,search_coordination,search_worker"
+    "?v&h=node_name,name,active,queue,rejected,completed"
+)
+CLUSTER_HEALTH_PATH = "/_cluster/health"
+HTTP_PROBE_PATH = "/"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Collect ES node stats into one compressed JSONL stream."
+    )
+    parser.add_argument(
+        "--base-url",
+        default=os.environ.get("ES_HOST", "http://localhost:9200"),
+        help="Base Elasticsearch URL (default: $ES_HOST or http://localhost:9200)",
+    )
+    parser.add_argument(
+        "--api-key-env",
+        default="ES_API_KEY",
+        help="Env var name that holds the Elasticsearch API key",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=1.0,
+        help="Seconds between samples, aligned to the wall clock (default: 1)",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=None,
+        help="Stop after this many seconds (default: until Ctrl-C)",
+    )
+    parser.add_argument(
+        "--out",
+        default=None,
+        help=(
+            "gzip JSONL stream to append to "
+            "(default: es_capture_<YYYYmmdd_HHMMSS>.jsonl.gz)"
+        ),
+    )
+    parser.add_argument(
+        "--flush-interval",
+        type=float,
+        default=5.0,
+        help="Seconds between gzip flushes; at most this much is lost on a crash",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=10.0,
+        help="HTTP timeout in seconds (default: 10)",
+    )
+    parser.add_argument(
+        "--full-node-stats",
+        action="store_true",
+        help="Keep the whole _nodes/stats response instead of the summarized fields",
+    )
+    return parser.parse_args()
+
+
+def log(message: str) -> None:
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S} {message}", file=sys.stderr, flush=True)
+
+
+class StreamWriter:
+    """Append JSON lines to a gzip stream, flushing on a timer."""
+
+    def __init__(self, out: BinaryIO, flush_interval: float) -> None:
+        self.out = out
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        self.records = 0
+
+    def write(self, record: dict[str, Any]) -> None:
+        self.out.write(json.dumps(record, separators=(",", ":")).encode("utf-8"))
+        self.out.write(b"\n")
+        self.records += 1
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.out.flush()
+            self.last_flush = time.monotonic()
+
+
+class Collector:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        base_url: str,
+        writer: StreamWriter,
+        full_node_stats: bool,
+    ) -> None:
+        self.client = client
+        self.base_url = base_url
+        self.writer = writer
+        self.node_stats_params = (
+            {} if full_node_stats else {"filter_path": NODE_STATS_FILTER}
+        )
+        self.in_flight: dict[str, asyncio.Task[None]] = {}
+        self.samples: dict[str, int] = {}
+        self.skipped: dict[str, int] = {}
+        self.failures: dict[str, int] = {}
+
+    async def fetch(
+        self, endpoint: str, tick: float, path: str, params: dict[str, str]
+    ) -> None:
+        record: dict[str, Any] = {"ts": tick, "endpoint": endpoint}
+        start = time.perf_counter()
+        try:
+            async with self.client.stream(
+                "GET", f"{self.base_url}{path}", params=params
+            ) as response:
+                ttfb_ms = (time.perf_counter() - start) * 1000.0
+                body = await response.aread()
+        except httpx.RequestError as exc:
+            self.failures[endpoint] = self.failures.get(endpoint, 0) + 1
+            record["ms"] = round((time.perf_counter() - start) * 1000.0, 3)
+            record["error"] = f"{type(exc).__name__}: {exc}"
+            self.writer.write(record)
+            return
+        record["ms"] = round((time.perf_counter() - start) * 1000.0, 3)
+        record["ttfb_ms"] = round(ttfb_ms, 3)
+        record["status"] = response.status_code
+        if response.status_code >= 400:
+            self.failures[endpoint] = self.failures.get(endpoint, 0) + 1
+            record["error"] = body[:200].decode("utf-8", errors="replace")
+        elif endpoint == "thread_pool":
+            record["body"] = body.decode("utf-8", errors="replace")
+        elif endpoint != "http_probe":
+            try:
+                record["body"] = json.loads(body)
+            except ValueError as exc:
+                self.failures[endpoint] = self.failures.get(endpoint, 0) + 1
+                record["error"] = f"Invalid JSON: {exc}"
+        if "error" not in record:
+            self.samples[endpoint] = self.samples.get(endpoint, 0) + 1
+        self.writer.write(record)
+
+    def tick(self, tick: float) -> None:
+        endpoints = {
+            "node_stats": (NODE_STATS_PATH, self.node_stats_params),
+            "thread_pool": (THREAD_POOL_PATH, {}),
+            "cluster_health": (CLUSTER_HEALTH_PATH, {}),
+            "http_probe": (HTTP_PROBE_PATH, {}),
+        }
+        for endpoint, (path, params) in endpoints.items():
+            running = self.in_flight.get(endpoint)
+            if running is not None and not running.done():
+                self.skipped[endpoint] = self.skipped.get(endpoint, 0) + 1
+                continue
+            self.in_flight[endpoint] = asyncio.create_task(
+                self.fetch(endpoint, tick, path, params)
+            )
+
+    async def run(
+        self, interval: float, duration: float | None, stop: asyncio.Event
+    ) -> None:
+        deadline = time.time() + duration if duration is not None else None
+        # Ticks are counted in whole intervals so their timestamps never drift
+        index = math.ceil(time.time() / interval)
+        while deadline is None or index * interval < deadline:
+            sleep_for = index * interval - time.time()
+            if sleep_for > 0:
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(stop.wait(), timeout=sleep_for)
+            if stop.is_set():
+                break
+            self.tick(round(index * interval, 6))
+            # Skip ticks missed while the event loop was busy instead of bursting
+            index = max(index + 1, math.ceil(time.time() / interval))
+        await self.drain()
+
+    async def drain(self) -> None:
+        running = [t for t in self.in_flight.values() if not t.done()]
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+
+def build_headers(args: argparse.Namespace) -> dict[str, str]:
+    api_key = os.environ.get(args.api_key_env, "").strip()
+    if not api_key:
+        raise SystemExit(
+            f"Missing API key. Set env var {args.api_key_env} or pass --api-key-env."
+        )
+    if not api_key.lower().startswith("apikey "):
+        api_key = f"ApiKey {api_key}"
+    return {"Authorization": api_key}
+
+
+async def main() -> int:
+    args = parse_args()
+    if args.interval <= 0:
+        raise SystemExit("--interval must be positive")
+    base_url = args.base_url.rstrip("/")
+    out_path = args.out or f"es_capture_{datetime.now():%Y%m%d_%H%M%S}.jsonl.gz"
+
+    limits = httpx.Limits(max_connections=8, max_keepalive_connections=8)
+    async with httpx.AsyncClient(
+        headers=build_headers(args),
+        timeout=args.timeout,
+        verify=False,
+        limits=limits,
+    ) as client:
+        response = await client.get(f"{base_url}{CLUSTER_HEALTH_PATH}")
+        if response.status_code >= 400:
+            raise SystemExit(
+                f"Connectivity check failed: HTTP {response.status_code} "
+                f"{response.text[:200]}"
+            )
+        log(f"Connectivity check passed; appending to {out_path}")
+
+        # Appending adds a gzip member; gzip readers treat the file as one stream
+        with gzip.open(out_path, "ab", compresslevel=6) as out:
+            writer = StreamWriter(out, args.flush_interval)
+            collector = Collector(client, base_url, writer, args.full_node_stats)
+            log(f"Collecting every {args.interval:g} s; press Ctrl-C to stop")
+            stop = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            # SIGHUP too, so a dropped ssh session still closes the gzip member
+            for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+                loop.add_signal_handler(signum, stop.set)
+            started = time.perf_counter()
+            await collector.run(args.interval, args.duration, stop)
+            elapsed = time.perf_counter() - started
+
+    for endpoint in ("node_stats", "thread_pool", "cluster_health", "http_probe"):
+        log(
+            f"{endpoint}: {collector.samples.get(endpoint, 0)} samples, "
+            f"{collector.failures.get(endpoint, 0)} failed, "
+            f"{collector.skipped.get(endpoint, 0)} skipped (still in flight)"
+        )
+    log(
+        f"{writer.records} records in {elapsed:.1f} s, "
+        f"{os.path.getsize(out_path)} bytes in {out_path}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,650 @@
+#!/usr/bin/env python3
+"""
+Summarize an es_stats.bash capture directory.
+
+es_stats.bash leaves one file per endpoint per sample:
+
+  node_stats/node_stats_<epoch>.json
+  thread_pool/thread_pool_<epoch>.txt
+  cluster_health/cluster_health_<epoch>.json
+  http_probe/http_probe.log
+
+This reads them with a process pool, keeping only the handful of counters
+and gauges needed from each file, then turns consecutive samples into
+per-node rates:
+- search ops/s and average search time
+- search queue and active threads
+- rejections
+- breaker trips
+- heap
+- GC time and collections
+
+The rates are written as one CSV row per node per sample (epoch-stamped,
+so it lines up with the benchmark's _timeline.csv), with a Markdown
+summary per node and for the cluster.
+
+The gzip JSONL stream written by es_stats_collect.py is read the same
+way: pass the .jsonl.gz file instead of a directory. It is decompressed
+in this process and parsed in batches on the pool. A stream still being
+written is read up to its last flush, and a run killed mid-write does
+not hide the runs appended after it.
+
+Usage:
+  python es_stats_summarize.py es_capture_20260301_120000
+  python es_stats_summarize.py es_capture_20260301_120000 --workers 8 \\
+    --out-csv series.csv --out-md summary.md
+  python es_stats_summarize.py es_capture_20260301_120000.jsonl.gz
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import sys
+import time
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+# Thread pools listed by es_stats.bash's _cat/thread_pool request
+THREAD_POOLS = ("search", "search_coordination", "search_worker")
+HEALTH_ORDER = ("green", "yellow", "red")
+# es_stats_collect.py stream lines per batch handed to a worker
+STREAM_BATCH = 500
+# Compressed bytes fed to zlib at a time
+STREAM_READ = 64 * 1024
+GZIP_MAGIC = b"\x1f\x8b\x08"
+# Replay step when salvaging the lines before a damaged member's cut
+SALVAGE_STEP = 256
+FILE_TS = re.compile(r"_(\d+)\.(?:json|txt)$")
+
+# Per-node counters turned into per-second rates between samples
+NODE_COUNTERS = (
+    "search_queries",
+    "search_time_ms",
+    "search_rejected",
+    "breaker_trips",
+    "gc_young_ms",
+    "gc_young_count",
+    "gc_old_ms",
+    "gc_old_count",
+)
+NODE_GAUGES = (
+    "search_queue",
+    "search_active",
+    "heap_used_pct",
+    "cpu_pct",
+    "http_open",
+)
+SERIES_FIELDS = (
+    "epoch",
+    "node",
+    "interval_s",
+    "search_ops_per_s",
+    "search_avg_ms",
+    "search_rejected_per_s",
+    "breaker_trips",
+    "gc_young_ms_per_s",
+    "gc_old_ms_per_s",
+    "gc_old_collections",
+    *NODE_GAUGES,
+    # _cat/thread_pool columns, tp_<pool>_<field>; rejected is the delta
+    *(f"tp_{pool}_{name}" for pool in THREAD_POOLS for name in ("active", "queue")),
+    *(f"tp_{pool}_rejected" for pool in THREAD_POOLS),
+    "cluster_status",
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Summarize an es_stats.bash capture into per-node rate series."
+    )
+    parser.add_argument(
+        "capture",
+        help=(
+            "Capture directory written by es_stats.bash, or a .jsonl.gz stream "
+            "written by es_stats_collect.py"
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes parsing capture files (default: CPU count)",
+    )
+    parser.add_argument(
+        "--out-csv",
+        default=None,
+        help=(
+            "Rate series CSV (default: <capture>/es_stats_series.csv, or "
+            "<stream>_series.csv)"
+        ),
+    )
+    parser.add_argument(
+        "--out-md",
+        default=None,
+        help=(
+            "Markdown summary (default: <capture>/es_stats_summary.md, or "
+            "<stream>_summary.md)"
+        ),
+    )
+    return parser.parse_args()
+
+
+def file_epoch(path: Path) -> int | None:
+    match = FILE_TS.search(path.name)
+    return int(match.group(1)) if match else None
+
+
+def node_sample(node: dict[str, Any]) -> dict[str, float]:
+    indices = node.get("indices", {})
+    search = indices.get("search", {})
+    pool = node.get("thread_pool", {}).get("search", {})
+    collectors = node.get("jvm", {}).get("gc", {}).get("collectors", {})
+    young = collectors.get("young", {})
+    old = collectors.get("old", {})
+    return {
+        "search_queries": search.get("query_total", 0),
+        "search_time_ms": search.get("query_time_in_millis", 0),
+        "search_rejected": pool.get("rejected", 0),
+        "breaker_trips": sum(
+            b.get("tripped", 0) for b in node.get("breakers", {}).values()
+        ),
+        "gc_young_ms": young.get("collection_time_in_millis", 0),
+        "gc_young_count": young.get("collection_count", 0),
+        "gc_old_ms": old.get("collection_time_in_millis", 0),
+        "gc_old_count": old.get("collection_count", 0),
+        "search_queue": pool.get("queue", 0),
+        "search_active": pool.get("active", 0),
+        "heap_used_pct": node.get("jvm", {}).get("mem", {}).get("heap_used_percent"),
+        "cpu_pct": node.get("os", {}).get("cpu", {}).get("percent"),
+        "http_open": node.get("http", {}).get("current_open"),
+    }
+
+
+def node_stats_samples(payload: dict[str, Any]) -> dict[str, dict[str, float]]:
+    return {
+        node.get("name", node_id): node_sample(node)
+        for node_id, node in payload.get("nodes", {}).items()
+    }
+
+
+def thread_pool_rows(text: str) -> dict[str, dict[str, int]]:
+    # `_cat/thread_pool?v` text: a header line, then one line per node and pool
+    lines = [line.split() for line in text.splitlines() if line.strip()]
+    if not lines:
+        return {}
+    header = lines[0]
+    pools: dict[str, dict[str, int]] = {}
+    for values in lines[1:]:
+        row = dict(zip(header, values))
+        if row.get("name") not in THREAD_POOLS:
+            continue
+        node = pools.setdefault(row.get("node_name", "?"), {})
+        for name in ("active", "queue", "rejected"):
+            try:
+                node[f"{row['name']}_{name}"] = int(row.get(name, 0))
+            except ValueError:
+                pass
+    return pools
+
+
+def read_node_stats(path: Path) -> tuple[int, dict[str, dict[str, float]]] | None:
+    try:
+        with path.open("rb") as f:
+            return file_epoch(path) or 0, node_stats_samples(json.load(f))
+    except (OSError, ValueError):
+        return None
+
+
+def read_thread_pool(path: Path) -> tuple[int, dict[str, dict[str, int]]] | None:
+    try:
+        return file_epoch(path) or 0, thread_pool_rows(path.read_text("utf-8"))
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def health_fields(health: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "status": health.get("status", ""),
+        "pending_tasks": health.get("number_of_pending_tasks", 0),
+        "unassigned_shards": health.get("unassigned_shards", 0),
+        "relocating_shards": health.get("relocating_shards", 0),
+    }
+
+
+def read_cluster_health(path: Path) -> tuple[int, dict[str, Any]] | None:
+    try:
+        with path.open("rb") as f:
+            return file_epoch(path) or 0, health_fields(json.load(f))
+    except (OSError, ValueError):
+        return None
+
+
+def parse_stream_batch(lines: list[bytes]) -> dict[str, list[Any]]:
+    """Samples from a batch of es_stats_collect.py stream lines."""
+    parsed: dict[str, list[Any]] = {
+        "node_stats": [],
+        "thread_pool": [],
+        "cluster_health": [],
+        "http_probe": [],
+    }
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        endpoint = record.get("endpoint")
+        ts = record.get("ts", 0)
+        if endpoint == "http_probe":
+            # Same shape as an http_probe.log line, times in seconds
+            probe = {"epoch": ts, "code": record.get("status", 0)}
+            if "ms" in record:
+                probe["total"] = record["ms"] / 1000.0
+            if "ttfb_ms" in record:
+                probe["ttfb"] = record["ttfb_ms"] / 1000.0
+            parsed["http_probe"].append(probe)
+            continue
+        body = record.get("body")
+        if body is None:
+            continue
+        if endpoint == "node_stats":
+            parsed["node_stats"].append((ts, node_stats_samples(body)))
+        elif endpoint == "thread_pool":
+            parsed["thread_pool"].append((ts, thread_pool_rows(body)))
+        elif endpoint == "cluster_health":
+            parsed["cluster_health"].append((ts, health_fields(body)))
+    return parsed
+
+
+def salvage(decompressor: Any, piece: bytes) -> bytes:
+    """Output of `piece` up to the point where it stops being valid."""
+    out: list[bytes] = []
+    for offset in range(0, len(piece), SALVAGE_STEP):
+        step = piece[offset : offset + SALVAGE_STEP]
+        before = decompressor.copy()
+        try:
+            out.append(decompressor.decompress(step))
+        except zlib.error:
+            # Replay the failing step a byte at a time to get right up to the cut
+            for byte in range(len(step)):
+                try:
+                    out.append(before.decompress(step[byte : byte + 1]))
+                except zlib.error:
+                    break
+            break
+    return b"".join(out)
+
+
+def stream_lines(path: Path, damage: dict[str, int]) -> Iterator[bytes]:
+    """
+    Complete lines of a gzip stream, which holds one member per collector run.
+
+    A member left unterminated by a killed collector is read up to its last
+    flush. Its partial last line is dropped, and reading resumes at the next
+    member's header, so a rerun appended after it is still read.
+    """
+    decompressor = zlib.decompressobj(wbits=31)
+    started = False
+    raw = b""
+    pending = b""
+    with open(path, "rb") as f:
+        while True:
+            if not raw:
+                raw = f.read(STREAM_READ)
+                if not raw:
+                    break
+            piece, raw = raw[:STREAM_READ], raw[STREAM_READ:]
+            # A member's own header is at the start of its first piece
+            skip = 0 if started else 1
+            started = True
+            snapshot = decompressor.copy()
+            try:
+                data = decompressor.decompress(piece)
+            except zlib.error:
+                damage["damaged stream members"] = (
+                    damage.get("damaged stream members", 0) + 1
+                )
+                # Keep the lines flushed before the damage; drop the cut one
+                yield from (pending + salvage(snapshot, piece)).split(b"\n")[:-1]
+                pending = b""
+                # Resync on the next gzip header; keep two bytes in case one
+                # straddles the read boundary
+                raw = piece[skip:] + raw
+                while True:
+                    found = raw.find(GZIP_MAGIC)
+                    if found >= 0:
+                        raw = raw[found:]
+                        break
+                    more = f.read(STREAM_READ)
+                    if not more:
+                        raw = b""
+                        break
+                    raw = raw[-2:] + more
+                decompressor = zlib.decompressobj(wbits=31)
+                started = False
+                continue
+            lines = (pending + data).split(b"\n")
+            pending = lines.pop()
+            yield from lines
+            if decompressor.eof:
+                # End of one run's member; the next one starts in unused_data
+                raw = decompressor.unused_data + raw
+                decompressor = zlib.decompressobj(wbits=31)
+                started = False
+    if started and not decompressor.eof:
+        # Still being written: everything up to the last flush is there
+        damage["truncated stream tail"] = 1
+
+
+def stream_batches(path: Path, damage: dict[str, int]) -> Iterator[list[bytes]]:
+    batch: list[bytes] = []
+    for line in stream_lines(path, damage):
+        batch.append(line)
+        if len(batch) >= STREAM_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_probe_line(line: str) -> dict[str, float] | None:
+    # "<epoch> connect=0.01 tls=0.03 ttfb=0.05 total=0.05 bytes=540 code=200"
+    parts = line.split()
+    if not parts or not parts[0].isdigit():
+        return None
+    probe: dict[str, float] = {"epoch": int(parts[0])}
+    for part in parts[1:]:
+        name, _, value = part.partition("=")
+        try:
+            probe[name] = float(value)
+        except ValueError:
+            pass
+    return probe
+
+
+def parallel_read(
+    executor: ProcessPoolExecutor,
+    reader: Callable[[Path], Any],
+    paths: list[Path],
+    workers: int,
+) -> list[Any]:
+    # Large chunks keep the per-file IPC overhead below the parsing cost
+    chunksize = max(1, math.ceil(len(paths) / (workers * 4)))
+    return [r for r in executor.map(reader, paths, chunksize=chunksize) if r]
+
+
+def read_stream(
+    executor: ProcessPoolExecutor, path: Path, workers: int, damage: dict[str, int]
+) -> dict[str, list[Any]]:
+    # A bounded window of batches in flight keeps memory flat on long captures
+    parsed: dict[str, list[Any]] = {}
+    window: list[Future[dict[str, list[Any]]]] = []
+
+    def collect(future: Future[dict[str, list[Any]]]) -> None:
+        for name, samples in future.result().items():
+            parsed.setdefault(name, []).extend(samples)
+
+    for batch in stream_batches(path, damage):
+        window.append(executor.submit(parse_stream_batch, batch))
+        if len(window) >= workers * 2:
+            collect(window.pop(0))
+    for future in window:
+        collect(future)
+    return parsed
+
+
+def build_series(
+    node_stats: Iterable[tuple[int, dict[str, dict[str, float]]]],
+    thread_pools: dict[int, dict[str, dict[str, int]]],
+    health: dict[int, dict[str, Any]],
+) -> list[dict[str, Any]]:
+    """Per-node rate rows from samples sorted by epoch."""
+    rows: list[dict[str, Any]] = []
+    previous: dict[str, tuple[int, dict[str, float]]] = {}
+    previous_pools: dict[str, dict[str, int]] = {}
+    for epoch, nodes in node_stats:
+        # The bash collector loops drift apart; take the previous second too
+        pools_now = thread_pools.get(epoch) or thread_pools.get(epoch - 1, {})
+        health_now = health.get(epoch) or health.get(epoch - 1)
+        for node, sample in sorted(nodes.items()):
+            row: dict[str, Any] = {"epoch": epoch, "node": node}
+            row.update({name: sample.get(name) for name in NODE_GAUGES})
+            before = previous.get(node)
+            previous[node] = (epoch, sample)
+            if before is not None and epoch > before[0]:
+                interval = round(epoch - before[0], 6)
+                delta = {name: sample[name] - before[1][name] for name in NODE_COUNTERS}
+                # A restarted node resets its counters; skip that interval
+                if all(value >= 0 for value in delta.values()):
+                    queries = delta["search_queries"]
+                    row.update(
+                        {
+                            "interval_s": interval,
+                            "search_ops_per_s": round(queries / interval, 3),
+                            "search_avg_ms": (
+                                round(delta["search_time_ms"] / queries, 3)
+                                if queries
+                                else None
+                            ),
+                            "search_rejected_per_s": round(
+                                delta["search_rejected"] / interval, 3
+                            ),
+                            "breaker_trips": delta["breaker_trips"],
+                            "gc_young_ms_per_s": round(
+                                delta["gc_young_ms"] / interval, 3
+                            ),
+                            "gc_old_ms_per_s": round(delta["gc_old_ms"] / interval, 3),
+                            "gc_old_collections": delta["gc_old_count"],
+                        }
+                    )
+            pools = pools_now.get(node)
+            if pools:
+                for pool in THREAD_POOLS:
+                    for name in ("active", "queue"):
+                        row[f"tp_{pool}_{name}"] = pools.get(f"{pool}_{name}")
+                    rejected = pools.get(f"{pool}_rejected")
+                    before_rejected = previous_pools.get(node, {}).get(
+                        f"{pool}_rejected"
+                    )
+                    if rejected is not None and before_rejected is not None:
+                        row[f"tp_{pool}_rejected"] = max(rejected - before_rejected, 0)
+                previous_pools[node] = pools
+            if health_now:
+                row["cluster_status"] = health_now["status"]
+            rows.append(row)
+    return rows
+
+
+def percentile(values: list[float], p: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100.0 * len(ordered)) - 1)]
+
+
+def fmt(value: float | None, digits: int = 2) -> str:
+    return f"{value:.{digits}f}" if value is not None else ""
+
+
+def build_summary(
+    capture: Path,
+    rows: list[dict[str, Any]],
+    health: dict[int, dict[str, Any]],
+    probes: list[dict[str, float]],
+    files: dict[str, int],
+    elapsed_s: float,
+) -> str:
+    epochs = [row["epoch"] for row in rows]
+    lines = [
+        "# ES Stats Capture Summary",
+        "",
+        f"- Capture: {capture}",
+        "- Samples read: " + ", ".join(f"{k} {v}" for k, v in files.items()),
+        f"- Span: {min(epochs, default=0)} .. {max(epochs, default=0)} "
+        f"({max(epochs, default=0) - min(epochs, default=0):g} s)",
+        f"- Parsed in: {elapsed_s:.2f} s",
+        "",
+        "## Nodes",
+        "",
+        "| Node | Samples | Search ops/s avg | Search ops/s max | Search avg ms p50 "
+        "| Search avg ms max | Queue max | Rejected | Breaker trips | Heap % max "
+        "| Young GC ms/s max | Old GCs |",
+        "| --- | --- | --- | --- | --- | --- | --- | --- | --- | --- | --- | --- |",
+    ]
+    by_node: dict[str, list[dict[str, Any]]] = {}
+    for row in rows:
+        by_node.setdefault(row["node"], []).append(row)
+
+    def column(node_rows: list[dict[str, Any]], name: str) -> list[float]:
+        return [row[name] for row in node_rows if row.get(name) is not None]
+
+    for node, node_rows in sorted(by_node.items()):
+        ops = column(node_rows, "search_ops_per_s")
+        avg_ms = column(node_rows, "search_avg_ms")
+        intervals = column(node_rows, "interval_s")
+        rejected = sum(
+            rate * interval
+            for rate, interval in zip(
+                column(node_rows, "search_rejected_per_s"), intervals
+            )
+        )
+        lines.append(
+            f"| {node} | {len(node_rows)} "
+            f"| {fmt(sum(ops) / len(ops) if ops else None)} "
+            f"| {fmt(max(ops, default=None))} | {fmt(percentile(avg_ms, 50), 3)} "
+            f"| {fmt(max(avg_ms, default=None), 3)} "
+            f"| {max(column(node_rows, 'search_queue'), default='')} "
+            f"| {rejected:.0f} | {sum(column(node_rows, 'breaker_trips')):.0f} "
+            f"| {max(column(node_rows, 'heap_used_pct'), default='')} "
+            f"| {fmt(max(column(node_rows, 'gc_young_ms_per_s'), default=None))} "
+            f"| {sum(column(node_rows, 'gc_old_collections')):.0f} |"
+        )
+    lines.append("")
+
+    if health:
+        statuses = [h["status"] for h in health.values()]
+        worst = max(
+            statuses,
+            key=lambda s: HEALTH_ORDER.index(s) if s in HEALTH_ORDER else -1,
+        )
+        counts = ", ".join(f"{s} {statuses.count(s)}" for s in dict.fromkeys(statuses))
+        lines.extend(
+            [
+                "## Cluster Health",
+                "",
+                f"- Samples by status: {counts}",
+                f"- Worst status: {worst}",
+                "- Pending tasks max: "
+                f"{max(h['pending_tasks'] for h in health.values())}",
+                "- Unassigned shards max: "
+                f"{max(h['unassigned_shards'] for h in health.values())}",
+                "",
+            ]
+        )
+
+    if probes:
+        lines.extend(
+            [
+                "## HTTP Probe",
+                "",
+                "| Metric | p50 (ms) | p99 (ms) | Max (ms) |",
+                "| --- | --- | --- | --- |",
+            ]
+        )
+        for name in ("connect", "tls", "ttfb", "total"):
+            values = [p[name] * 1000.0 for p in probes if name in p]
+            lines.append(
+                f"| {name} | {fmt(percentile(values, 50))} "
+                f"| {fmt(percentile(values, 99))} | {fmt(max(values, default=None))} |"
+            )
+        failed = sum(
+            1 for p in probes if p.get("code", 200) >= 400 or not p.get("code")
+        )
+        lines.extend(["", f"- Probes: {len(probes)}, failed: {failed}", ""])
+    return "\n".join(lines)
+
+
+def write_series(path: Path, rows: list[dict[str, Any]]) -> None:
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(SERIES_FIELDS))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def read_capture_dir(
+    executor: ProcessPoolExecutor, capture: Path, workers: int
+) -> dict[str, list[Any]]:
+    node_paths = sorted(capture.glob("node_stats/node_stats_*.json"))
+    pool_paths = sorted(capture.glob("thread_pool/thread_pool_*.txt"))
+    health_paths = sorted(capture.glob("cluster_health/cluster_health_*.json"))
+    probes: list[dict[str, float]] = []
+    probe_log = capture / "http_probe" / "http_probe.log"
+    if probe_log.exists():
+        with probe_log.open("r", encoding="utf-8", errors="replace") as f:
+            probes = [p for p in map(parse_probe_line, f) if p]
+    return {
+        "node_stats": parallel_read(executor, read_node_stats, node_paths, workers),
+        "thread_pool": parallel_read(executor, read_thread_pool, pool_paths, workers),
+        "cluster_health": parallel_read(
+            executor, read_cluster_health, health_paths, workers
+        ),
+        "http_probe": probes,
+    }
+
+
+def main() -> int:
+    args = parse_args()
+    capture = Path(args.capture)
+    stream = capture.is_file()
+    if not stream and not capture.is_dir():
+        raise SystemExit(f"Not a capture directory or stream file: {capture}")
+
+    started = time.perf_counter()
+    workers = max(1, args.workers)
+    damage: dict[str, int] = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if stream:
+            parsed = read_stream(executor, capture, workers, damage)
+        else:
+            parsed = read_capture_dir(executor, capture, workers)
+    node_stats = sorted(parsed.get("node_stats", []), key=lambda sample: sample[0])
+    thread_pools = dict(parsed.get("thread_pool", []))
+    health = dict(parsed.get("cluster_health", []))
+    probes = parsed.get("http_probe", [])
+
+    rows = build_series(node_stats, thread_pools, health)
+    elapsed_s = time.perf_counter() - started
+    files = {
+        "node_stats": len(node_stats),
+        "thread_pool": len(thread_pools),
+        "cluster_health": len(health),
+        "http_probe": len(probes),
+    }
+    files.update(damage)
+
+    if stream:
+        stem = capture.name.removesuffix(".gz").removesuffix(".jsonl")
+        default_csv = capture.with_name(f"{stem}_series.csv")
+        default_md = capture.with_name(f"{stem}_summary.md")
+    else:
+        default_csv = capture / "es_stats_series.csv"
+        default_md = capture / "es_stats_summary.md"
+    out_csv = Path(args.out_csv) if args.out_csv else default_csv
+    out_md = Path(args.out_md) if args.out_md else default_md
+    write_series(out_csv, rows)
+    summary = build_summary(capture, rows, health, probes, files, elapsed_s)
+    out_md.write_text(summary, encoding="utf-8")
+    print(summary)
+    print(f"Series written: {out_csv}")
+    print(f"Summary written: {out_md}")
+    return 0 if rows else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,13 +4,14 @@ import re
 from collections import OrderedDict, defaultdict
 
 from redis.cluster import RedisCluster as Redis
-from redis.cluster import ClusterNode as Node
+
+from redis_client import add_connection_args, get_client
+from redis_progress import Progress, add_progress_args
 
 parser = argparse.ArgumentParser(description="Audit memory usage of Redis Cluster")
-parser.add_argument("host", type=str)
-parser.add_argument("password", type=str)
+add_connection_args(parser)
+add_progress_args(parser)
 parser.add_argument("--percentage", "-p", type=float, default=100)
-parser.add_argument("--port", type=int, default=6379)
 parser.add_argument(
     "--max-draws-multiplier",
     type=int,
@@ -36,14 +37,16 @@ def key_namespace(key: str) -> str:
     return m.group(0) if m else "(no-namespace)"
 
 
-def audit_redis(client, keys):
+def audit_redis(client, keys, progress):
     totals = defaultdict(int)
     totals["total"] = 0
 
     for key in keys:
         ns = key_namespace(key)
+        progress.add_keys(None)
         try:
-            bytes_used = client.memory_usage(key)
+            with progress.timed("memory_usage"):
+                bytes_used = client.memory_usage(key)
             if bytes_used is None:
                 continue
             totals["total"] += bytes_used
@@ -76,24 +79,32 @@ def print_summary(data):
 
 
 def main():
-    startup_nodes = [Node(args.host, args.port)]
-    client = Redis(startup_nodes=startup_nodes, password=args.password)
+    client = get_client(args)
+    progress = Progress.from_args("redis_audit", args)
 
     db_size = client.dbsize(target_nodes=Redis.ALL_NODES)
     sample_size = max(int(db_size * sample), 1)
+    progress.set_phase("randomkey", target=sample_size)
 
     keys = set()
     max_draws = sample_size * args.max_draws_multiplier
     draws = 0
 
     while len(keys) < sample_size and draws < max_draws:
-        k = client.randomkey()
+        with progress.timed("randomkey"):
+            k = client.randomkey()
         draws += 1
         if not k:
             continue
-        keys.add(k.decode("utf-8"))
+        key = k.decode("utf-8")
+        if key not in keys:
+            keys.add(key)
+            progress.add_keys(None)
+
+    progress.set_phase("memory_usage", target=len(keys))
 
-    namespace_data = audit_redis(client, list(keys))
+    namespace_data = audit_redis(client, list(keys), progress)
+    progress.close()
 
     print(f"sampled {len(keys)} unique keys (drew {draws}) of {db_size}")
     print_summary(namespace_data)
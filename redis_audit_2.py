@@ -1,22 +1,44 @@
 #!/usr/bin/env python3
 import argparse
+import gzip
+import os
 import re
-from collections import OrderedDict, defaultdict
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 
 from redis.cluster import RedisCluster as Redis
-from redis.cluster import ClusterNode as Node
+
+from redis_client import add_connection_args, get_client, is_compressed
+from redis_progress import Progress, add_progress_args
 
 parser = argparse.ArgumentParser(description="Audit memory usage of Redis Cluster")
-parser.add_argument("host", type=str)
-parser.add_argument("password", type=str)
+add_connection_args(parser)
+add_progress_args(parser)
 parser.add_argument("--percentage", "-p", type=float, default=100)
-parser.add_argument("--port", type=int, default=6379)
 parser.add_argument(
     "--max-draws-multiplier",
     type=int,
     default=20,
     help="Max randomkey draws = sample_size * multiplier (to avoid infinite loops)",
 )
+parser.add_argument(
+    "--decompress",
+    action="store_true",
+    help="Fetch sampled values and report compressed/raw sizes and remaining "
+    "gzip savings per namespace instead of MEMORY USAGE",
+)
+parser.add_argument(
+    "--batch-size",
+    type=int,
+    default=500,
+    help="Values fetched per pipelined GET batch in --decompress mode",
+)
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=os.cpu_count() or 4,
+    help="Threads measuring (de)compressed sizes in --decompress mode",
+)
 args = parser.parse_args()
 
 sample = args.percentage / 100.0
@@ -36,7 +58,102 @@ def key_namespace(key: str) -> str:
     return m.group(0) if m else "(no-namespace)"
 
 
-def audit_redis(client, keys):
+def measure_value(value):
+    """Return (stored, raw, compressed, stored size if gzipped) for one value."""
+    stored = len(value)
+    if is_compressed(value):
+        try:
+            return stored, len(gzip.decompress(value)), True, stored
+        except (OSError, EOFError):
+            # gzip magic but not a valid stream; treat as raw data
+            pass
+    return stored, stored, False, len(gzip.compress(value))
+
+
+def audit_compression(client, keys, progress):
+    ns_stats = defaultdict(lambda: defaultdict(int))
+    pending = deque()
+
+    def collect(limit):
+        while len(pending) > limit:
+            ns, future = pending.popleft()
+            stored, raw, compressed, gzipped = future.result()
+            stats = ns_stats[ns]
+            stats["values"] += 1
+            stats["stored"] += stored
+            stats["raw"] += raw
+            if compressed:
+                stats["compressed"] += 1
+            else:
+                stats["savings"] += max(stored - gzipped, 0)
+
+    # zlib releases the GIL, so threads overlap measuring with the next fetch
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        for start in range(0, len(keys), args.batch_size):
+            batch = keys[start : start + args.batch_size]
+            pipe = client.pipeline(transaction=False)
+            for key in batch:
+                pipe.get(key)
+            with progress.timed("get", pipeline_size=len(batch)):
+                values = pipe.execute(raise_on_error=False)
+
+            for key, value in zip(batch, values):
+                progress.add_keys(None)
+                ns = key_namespace(key)
+                if isinstance(value, Exception):
+                    # WRONGTYPE for non-string keys
+                    ns_stats[ns]["skipped"] += 1
+                    progress.error(f"get:{type(value).__name__}")
+                    continue
+                if value is None:
+                    ns_stats[ns]["skipped"] += 1
+                    continue
+                pending.append((ns, pool.submit(measure_value, value)))
+            collect(2 * args.batch_size)
+        collect(0)
+
+    return {ns: dict(stats) for ns, stats in ns_stats.items()}
+
+
+def print_compression_summary(ns_stats, db_size):
+    if not ns_stats:
+        print("No values fetched.")
+        return
+
+    scale = 1 / sample
+    print(
+        f"{'Namespace':<80} | {'Values':<8} | {'Compressed':<10} | {'Stored':<12} | {'Raw':<12} | {'Ratio':<6} | {'Remaining savings':<17}"
+    )
+    print("-" * 175)
+    totals = defaultdict(int)
+    ranked = sorted(
+        ns_stats.items(), key=lambda kv: kv[1].get("savings", 0), reverse=True
+    )
+    for namespace, stats in ranked:
+        if re.search("de-dupe", namespace):
+            continue
+        for field, value in stats.items():
+            totals[field] += value
+        values = stats.get("values", 0)
+        compressed_pct = (
+            round(100 * stats.get("compressed", 0) / values, 1) if values else 0
+        )
+        ratio = stats["stored"] / stats["raw"] if stats.get("raw") else 0
+        print(
+            f"{namespace:<80} | {values:<8} | {compressed_pct:<9}% | {sizeof_fmt(stats.get('stored', 0) * scale):<12} | {sizeof_fmt(stats.get('raw', 0) * scale):<12} | {ratio:<6.2f} | {sizeof_fmt(stats.get('savings', 0) * scale):<17}"
+        )
+
+    print()
+    print(f"Stored (scaled): {sizeof_fmt(totals['stored'] * scale)}")
+    print(f"Raw (scaled): {sizeof_fmt(totals['raw'] * scale)}")
+    print(
+        f"Remaining possible savings (scaled): {sizeof_fmt(totals['savings'] * scale)}"
+    )
+    print(f"Skipped (non-string or expired): {totals['skipped']}")
+    print(f"Estimated total keys: {db_size}")
+
+
+def audit_redis(client, keys, progress):
     totals = defaultdict(int)
     totals["total"] = 0
     ns_key_counts = defaultdict(int)
@@ -46,8 +163,10 @@ def audit_redis(client, keys):
     for key in keys:
         ns = key_namespace(key)
         ns_key_counts[ns] += 1
+        progress.add_keys(None)
         try:
-            bytes_used = client.memory_usage(key)
+            with progress.timed("memory_usage"):
+                bytes_used = client.memory_usage(key)
             if bytes_used is None:
                 continue
             totals["total"] += bytes_used
@@ -113,26 +232,43 @@ def print_summary(data, ns_key_counts, db_size, ns_avg_size, ns_max_size):
 
 
 def main():
-    startup_nodes = [Node(args.host, args.port)]
-    client = Redis(startup_nodes=startup_nodes, password=args.password)
+    client = get_client(args)
+    progress = Progress.from_args("redis_audit_2", args)
 
     db_size = client.dbsize(target_nodes=Redis.ALL_NODES)
     sample_size = max(int(db_size * sample), 1)
+    progress.set_phase("randomkey", target=sample_size)
 
     keys = set()
     max_draws = sample_size * args.max_draws_multiplier
     draws = 0
 
     while len(keys) < sample_size and draws < max_draws:
-        k = client.randomkey()
+        with progress.timed("randomkey"):
+            k = client.randomkey()
         draws += 1
         if not k:
             continue
-        keys.add(k.decode("utf-8"))
+        key = k.decode("utf-8")
+        if key not in keys:
+            keys.add(key)
+            progress.add_keys(None)
+
+    if args.decompress:
+        progress.set_phase("decompress", target=len(keys))
+        ns_stats = audit_compression(client, list(keys), progress)
+        progress.close()
+
+        print(f"sampled {len(keys)} unique keys (drew {draws}) of {db_size}")
+        print_compression_summary(ns_stats, db_size)
+        return
+
+    progress.set_phase("memory_usage", target=len(keys))
 
     namespace_data, ns_key_counts, ns_avg_size, ns_max_size = audit_redis(
-        client, list(keys)
+        client, list(keys), progress
     )
+    progress.close()
 
     print(f"sampled {len(keys)} unique keys (drew {draws}) of {db_size}")
     print_summary(namespace_data, ns_key_counts, db_size, ns_avg_size, ns_max_size)
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Benchmark the redis_* tools against a throwaway local Redis Cluster.
+
+Starts --nodes redis-server processes in cluster mode, seeds a synthetic
+keyspace (namespaces, value sizes and a TTL mix), then runs each tool as
+a subprocess and records wall time, keys/sec, peak RSS and network round
+trips. Client round trips come from the tool's --status-file (see
+redis_progress.py); server-side commands are the INFO stats delta summed
+over all nodes.
+
+redis_compress rewrites values, so it always runs after the read-only
+audits; the decompression-aware audit runs last to measure what it saved.
+
+Usage:
+  uv run ./redis_bench.py --keys 200000 --namespaces 20 \\
+    --value-sizes 128,1024,8192 --ttl-mix none:0.3,1h:0.2,1d:0.3,30d:0.2 \\
+    --report-md redis_reports/bench.md
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from redis import Redis as NodeRedis
+
+from redis_client import add_connection_args, get_client
+
+HERE = Path(__file__).resolve().parent
+
+TTL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Tool name -> (script, extra args). Order matters: compress mutates data.
+TOOLS = {
+    "redis_audit": ("redis_audit.py", ["--percentage", "100"]),
+    "redis_audit_2": ("redis_audit_2.py", ["--percentage", "100"]),
+    "redis_ttl_audit": ("redis_ttl_audit.py", ["--limit", "0"]),
+    "redis_compress": ("redis_compress.py", []),
+    "redis_audit_2_decompress": (
+        "redis_audit_2.py",
+        ["--percentage", "100", "--decompress"],
+    ),
+}
+
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description="Benchmark the redis tools against a local Redis Cluster"
+    )
+    p.add_argument("--redis-server", default="redis-server", help="redis-server binary")
+    p.add_argument("--redis-cli", default="redis-cli", help="redis-cli binary")
+    p.add_argument("--nodes", type=int, default=3, help="Cluster primaries (min 3)")
+    p.add_argument("--base-port", type=int, default=7100, help="First node port")
+    p.add_argument("--password", default="bench", help="Cluster password")
+    p.add_argument("--keys", type=int, default=100000, help="Keys to seed")
+    p.add_argument("--namespaces", type=int, default=20, help="Distinct namespaces")
+    p.add_argument(
+        "--value-sizes",
+        default="128,1024,8192",
+        help="Comma-separated value sizes in bytes, picked uniformly per key",
+    )
+    p.add_argument(
+        "--ttl-mix",
+        default="none:0.3,1h:0.2,1d:0.3,30d:0.2",
+        help="Comma-separated ttl:weight pairs; ttl is 'none' or <n>[smhd]",
+    )
+    p.add_argument(
+        "--tools",
+        default=",".join(TOOLS),
+        help=f"Comma-separated tools to run (default: {','.join(TOOLS)})",
+    )
+    p.add_argument("--seed", type=int, default=1, help="Random seed for the keyspace")
+    p.add_argument("--workdir", default=None, help="Directory for node and tool files")
+    p.add_argument(
+        "--keep-cluster",
+        action="store_true",
+        help="Leave the cluster running after the benchmark",
+    )
+    p.add_argument("--report-md", default=None, help="Write a markdown report here")
+    p.add_argument("--report-json", default=None, help="Write raw results as JSON here")
+    return p.parse_args()
+
+
+def parse_ttl_mix(spec: str):
+    mix = []
+    for part in spec.split(","):
+        ttl, _, weight = part.strip().partition(":")
+        if ttl == "none":
+            seconds = None
+        elif ttl[:-1].isdigit() and ttl[-1] in TTL_UNITS:
+            seconds = int(ttl[:-1]) * TTL_UNITS[ttl[-1]]
+        else:
+            raise SystemExit(f"Bad --ttl-mix entry: {part}")
+        mix.append((seconds, float(weight or 1)))
+    return mix
+
+
+def start_cluster(args, workdir: Path):
+    ports = [args.base_port + i for i in range(args.nodes)]
+    procs = []
+    for port in ports:
+        node_dir = workdir / f"node_{port}"
+        node_dir.mkdir(parents=True, exist_ok=True)
+        # The server keeps its own copy of the log fd
+        with open(node_dir / "redis.log", "w") as log:
+            procs.append(
+                subprocess.Popen(
+                    [
+                        args.redis_server,
+                        "--port",
+                        str(port),
+                        "--bind",
+                        "127.0.0.1",
+                        "--cluster-enabled",
+                        "yes",
+                        "--cluster-config-file",
+                        "nodes.conf",
+                        "--requirepass",
+                        args.password,
+                        "--masterauth",
+                        args.password,
+                        "--save",
+                        "",
+                        "--appendonly",
+                        "no",
+                    ],
+                    cwd=node_dir,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                )
+            )
+
+    for port in ports:
+        node = NodeRedis(port=port, password=args.password)
+        for _ in range(100):
+            try:
+                node.ping()
+                break
+            except Exception:
+                time.sleep(0.1)
+        else:
+            stop_cluster(procs)
+            raise SystemExit(f"redis-server on port {port} did not start")
+
+    subprocess.run(
+        [
+            args.redis_cli,
+            "-a",
+            args.password,
+            "--no-auth-warning",
+            "--cluster",
+            "create",
+        ]
+        + [f"127.0.0.1:{port}" for port in ports]
+        + ["--cluster-replicas", "0", "--cluster-yes"],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+    for port in ports:
+        node = NodeRedis(port=port, password=args.password)
+        for _ in range(100):
+            if node.cluster("info").get("cluster_state") == "ok":
+                break
+            time.sleep(0.1)
+        else:
+            stop_cluster(procs)
+            raise SystemExit(f"cluster did not converge on port {port}")
+    return procs, ports
+
+
+def stop_cluster(procs) -> None:
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def make_value(rng: random.Random, size: int) -> bytes:
+    # Half random, half repetitive so compression ratios look like real JSON
+    noise = "".join(rng.choices(string.ascii_letters + string.digits, k=size // 2))
+    filler = '{"status":"ok","items":[]}' * (size // 52 + 1)
+    return (noise + filler)[:size].encode("utf-8")
+
+
+def seed_keyspace(args, client) -> dict:
+    rng = random.Random(args.seed)
+    sizes = [int(s) for s in args.value_sizes.split(",")]
+    ttl_mix = parse_ttl_mix(args.ttl_mix)
+    ttl_choices = [ttl for ttl, _ in ttl_mix]
+    ttl_weights = [weight for _, weight in ttl_mix]
+    # A small pool of values per size keeps seeding fast without making every
+    # value identical
+    values = {size: [make_value(rng, size) for _ in range(16)] for size in sizes}
+
+    start = time.perf_counter()
+    pipe = client.pipeline(transaction=False)
+    for i in range(args.keys):
+        ns = f"bench:ns{rng.randrange(args.namespaces):03d}:"
+        key = f"{ns}{i:010d}"
+        value = rng.choice(values[rng.choice(sizes)])
+        ttl = rng.choices(ttl_choices, ttl_weights)[0]
+        if ttl is None:
+            pipe.set(key, value)
+        else:
+            pipe.set(key, value, ex=ttl)
+        if len(pipe) >= 1000:
+            pipe.execute()
+    if len(pipe):
+        pipe.execute()
+    return {"keys": args.keys, "seed_s": time.perf_counter() - start}
+
+
+def server_commands(args, ports) -> int:
+    total = 0
+    for port in ports:
+        info = NodeRedis(port=port, password=args.password).info("stats")
+        total += int(info.get("total_commands_processed", 0))
+    return total
+
+
+def run_tool(args, name: str, ports, workdir: Path) -> dict:
+    script, extra = TOOLS[name]
+    tool_dir = workdir / name
+    tool_dir.mkdir(parents=True, exist_ok=True)
+    status_file = tool_dir / "status.json"
+    if name == "redis_compress":
+        (tool_dir / "ttl_data.json").write_text(
+            json.dumps([{"regex": r"^bench:ns\d+:", "ttl_ms": 86400 * 1000}])
+        )
+
+    cmd = [
+        sys.executable,
+        str(HERE / script),
+        "127.0.0.1",
+        args.password,
+        "--port",
+        str(ports[0]),
+        "--progress-interval",
+        "0",
+        "--status-file",
+        str(status_file),
+        *extra,
+    ]
+    commands_before = server_commands(args, ports)
+    start = time.perf_counter()
+    with (
+        open(tool_dir / "stdout.log", "w") as out,
+        open(tool_dir / "stderr.log", "w") as err,
+    ):
+        proc = subprocess.Popen(cmd, cwd=tool_dir, stdout=out, stderr=err)
+        # wait4 for the child's own rusage; tell Popen it has been reaped
+        _, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    wall_s = time.perf_counter() - start
+    commands_after = server_commands(args, ports)
+
+    if proc.returncode != 0:
+        # A crashed tool's partial counts would read as a (fast) result
+        print(
+            f"{name} exited with code {proc.returncode}; see {tool_dir / 'stderr.log'}",
+            file=sys.stderr,
+        )
+        return {
+            "tool": name,
+            "exit_code": proc.returncode,
+            "wall_s": wall_s,
+            "keys": None,
+            "keys_per_s": None,
+            "peak_rss_mib": None,
+            "client_round_trips": None,
+            "server_commands": None,
+            "errors": None,
+        }
+
+    status_data = {}
+    if status_file.exists():
+        status_data = json.loads(status_file.read_text())
+    keys = status_data.get("keys", 0)
+    return {
+        "tool": name,
+        "exit_code": proc.returncode,
+        "wall_s": wall_s,
+        "keys": keys,
+        "keys_per_s": keys / wall_s if wall_s > 0 else 0.0,
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mib": rusage.ru_maxrss / 1024.0,
+        "client_round_trips": status_data.get("round_trips", 0),
+        "server_commands": commands_after - commands_before,
+        "errors": sum(status_data.get("errors", {}).values()),
+    }
+
+
+def build_report(args, seed: dict, results) -> str:
+    lines = [
+        "# Redis Tools Benchmark",
+        "",
+        f"- Nodes: {args.nodes}",
+        f"- Keys: {seed['keys']:,} (seeded in {seed['seed_s']:.1f}s)",
+        f"- Namespaces: {args.namespaces}",
+        f"- Value sizes: {args.value_sizes}",
+        f"- TTL mix: {args.ttl_mix}",
+        "",
+        "| Tool | Exit | Wall (s) | Keys | Keys/s | Peak RSS (MiB) "
+        "| Client round trips | Server commands | Errors |",
+        "| --- | --- | --- | --- | --- | --- | --- | --- | --- |",
+    ]
+    for r in results:
+        if r["exit_code"]:
+            lines.append(
+                f"| {r['tool']} | {r['exit_code']} | {r['wall_s']:.2f} "
+                "| failed | | | | | |"
+            )
+            continue
+        lines.append(
+            f"| {r['tool']} | {r['exit_code']} | {r['wall_s']:.2f} | {r['keys']:,} "
+            f"| {r['keys_per_s']:,.0f} | {r['peak_rss_mib']:.1f} "
+            f"| {r['client_round_trips']:,} | {r['server_commands']:,} "
+            f"| {r['errors']} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    args = parse_args()
+    if args.nodes < 3:
+        raise SystemExit("Redis Cluster needs at least 3 primaries (--nodes)")
+    for binary in (args.redis_server, args.redis_cli):
+        if not shutil.which(binary):
+            raise SystemExit(f"{binary} not found on PATH")
+    tools = [t.strip() for t in args.tools.split(",") if t.strip()]
+    unknown = [t for t in tools if t not in TOOLS]
+    if unknown:
+        raise SystemExit(f"Unknown tools: {', '.join(unknown)}")
+    tools = [t for t in TOOLS if t in tools]
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="redis_bench_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    print(f"Working directory: {workdir}", file=sys.stderr)
+
+    procs, ports = start_cluster(args, workdir)
+    try:
+        conn = argparse.ArgumentParser()
+        add_connection_args(conn)
+        conn_args = conn.parse_args(
+            ["127.0.0.1", args.password, "--port", str(ports[0])]
+        )
+        seed = seed_keyspace(args, get_client(conn_args))
+        print(f"Seeded {seed['keys']:,} keys in {seed['seed_s']:.1f}s", file=sys.stderr)
+
+        results = []
+        for name in tools:
+            print(f"Running {name}", file=sys.stderr)
+            results.append(run_tool(args, name, ports, workdir))
+    finally:
+        if args.keep_cluster:
+            print(f"Cluster left running on ports {ports}", file=sys.stderr)
+        else:
+            stop_cluster(procs)
+
+    report = build_report(args, seed, results)
+    print(report)
+    if args.report_md:
+        path = Path(args.report_md)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(report, encoding="utf-8")
+        print(f"Report written: {path}")
+    if args.report_json:
+        path = Path(args.report_json)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"seed": seed, "results": results}, indent=2))
+    return 1 if any(r["exit_code"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
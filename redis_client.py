@@ -0,0 +1,94 @@
+"""
+Shared Redis Cluster connection setup for the redis_* scripts.
+
+Every tool takes the same positional host/password arguments plus the
+pool tuning flags added by add_connection_args(), and builds its client
+with get_client() so connection behaviour is identical across tools.
+MOVED/ASK redirections are followed by redis-py itself; the retry policy
+configured here covers connection errors and timeouts, and a MOVED storm
+triggers a slot-map refresh every --reinitialize-steps redirections.
+Value helpers shared by the tools (is_compressed) live here too.
+"""
+
+import argparse
+
+from redis.backoff import ExponentialWithJitterBackoff
+from redis.cluster import ClusterNode as Node
+from redis.cluster import RedisCluster as Redis
+from redis.retry import Retry
+
+
+def add_connection_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("host", type=str, help="Redis cluster hostname or IP address")
+    parser.add_argument("password", type=str, help="Password for Redis authentication")
+    parser.add_argument(
+        "--port", type=int, default=6379, help="Redis server port (default: 6379)"
+    )
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=32,
+        help="Max pooled connections per cluster node (default: 32)",
+    )
+    parser.add_argument(
+        "--socket-timeout",
+        type=float,
+        default=10.0,
+        help="Socket read/write timeout in seconds (default: 10)",
+    )
+    parser.add_argument(
+        "--connect-timeout",
+        type=float,
+        default=5.0,
+        help="Socket connect timeout in seconds (default: 5)",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Retries on connection errors/timeouts with jittered backoff (default: 3)",
+    )
+    parser.add_argument(
+        "--reinitialize-steps",
+        type=int,
+        default=25,
+        help="MOVED redirections before the slot map is refreshed (default: 25)",
+    )
+
+
+def get_client(args: argparse.Namespace) -> Redis:
+    return Redis(
+        startup_nodes=[Node(args.host, args.port)],
+        password=args.password,
+        max_connections=args.max_connections,
+        socket_keepalive=True,
+        socket_timeout=args.socket_timeout,
+        socket_connect_timeout=args.connect_timeout,
+        retry=Retry(ExponentialWithJitterBackoff(base=0.05, cap=2.0), args.retries),
+        reinitialize_steps=args.reinitialize_steps,
+    )
+
+
+def scan_node(client: Redis, node: Node, cursor: int = 0, match=None, count=None):
+    """One SCAN step on a single cluster node: (next cursor, keys)."""
+    return client.get_redis_connection(node).scan(
+        cursor=cursor, match=match, count=count
+    )
+
+
+def is_compressed(data) -> bool:
+    """True for values written by redis_compress (gzip magic bytes)."""
+    return data[:2] == b"\x1f\x8b"
+
+
+def get_masters(client):
+    masters = [
+        n for n in client.get_nodes() if getattr(n, "server_type", None) == "master"
+    ]
+    if masters:
+        return masters
+    # fallback for older redis-py-cluster
+    try:
+        return client.get_primaries()
+    except Exception:
+        return [Redis.ALL_NODES]  # last resort
@@ -8,16 +8,22 @@ import os
 import random
 import re
 import sys
-import time
 
-from redis.cluster import RedisCluster as Redis
-from redis.cluster import ClusterNode as Node
+from redis_client import (
+    add_connection_args,
+    get_client,
+    get_masters,
+    is_compressed,
+    scan_node,
+)
+from redis_progress import Progress, add_progress_args
 
 
 parser = argparse.ArgumentParser(description="Audit memory usage of Redis Cluster")
-parser.add_argument('host', type=str)
-parser.add_argument('password', type=str)
+add_connection_args(parser)
+add_progress_args(parser)
 parser.add_argument('--verbose', '-v', action='store_true')
+parser.add_argument('--count', type=int, default=1000, help='Number of keys to scan per iteration (default: 1000)')
 args = parser.parse_args()
 
 if not os.path.exists('compressed_keys_file.log'):
@@ -29,9 +35,6 @@ error_log = open('errors.log', 'a')
 de_dupe_regex = re.compile("de-dupe")
 
 
-def is_compressed(data):
-    return data[:2] == b'\x1f\x8b'
-
 def convert_size(size_bytes):
     if size_bytes == 0:
         return "0B"
@@ -72,15 +75,17 @@ def verify_compressed(client, key):
         raise Exception(f"Found uncompressed key {key}")
     
 
-def compress_redis_data(client, key, ttl_data):
+def compress_redis_data(client, key, ttl_data, progress, node):
 
-    data = client.get(key)
+    with progress.timed('get', node):
+        data = client.get(key)
     if is_compressed(data):
         return
 
     ttl = get_ttl(key, ttl_data)
     compressed_string = gzip.compress(data)
-    client.set(key, compressed_string, px=ttl)
+    with progress.timed('set', node):
+        client.set(key, compressed_string, px=ttl)
 
     if args.verbose:
         if random.randint(1,10000) == 1234:
@@ -91,33 +96,44 @@ def compress_redis_data(client, key, ttl_data):
 
 def main():
 
-    startup_nodes = [Node(args.host, 6379)]
-    client = Redis(startup_nodes=startup_nodes, password=args.password)
+    client = get_client(args)
     
     compressed_keys=set([key.strip() for key in compressed_keys_log.readlines()])
     ttl_data = generate_ttl_data()
 
-    start_time = time.time()
-    num_keys = 0
-
-    for key in client.scan_iter():
-        key = key.decode("utf-8")
-        num_keys +=1
-        # print out keys/min stats
-        if num_keys % 10000 == 0:
-            stat = num_keys*60/(time.time()-start_time)
-            print(f"Compressing {round(stat,2)} keys/min", end="\r")
-
-        # skip deduplication keys
-        if de_dupe_regex.search(key):
-            continue
-
-        # skip keys that have already been compressed
-        if key in compressed_keys:
-            continue
-        
-        compress_redis_data(client, key, ttl_data)
-        compressed_keys_log.write(key+"\n")
+    progress = Progress.from_args('redis_compress', args)
+    masters = get_masters(client)
+    for node in masters:
+        try:
+            progress.set_expected(node, client.dbsize(target_nodes=node))
+        except Exception:
+            pass
+
+    for node in masters:
+        cursor = 0
+        while True:
+            with progress.timed('scan', node):
+                cursor, keys = scan_node(client, node, cursor, count=args.count)
+
+            for key in keys:
+                key = key.decode("utf-8")
+                progress.add_keys(node)
+
+                # skip deduplication keys
+                if de_dupe_regex.search(key):
+                    continue
+
+                # skip keys that have already been compressed
+                if key in compressed_keys:
+                    continue
+
+                compress_redis_data(client, key, ttl_data, progress, node)
+                compressed_keys_log.write(key+"\n")
+
+            if cursor == 0:
+                break
+
+    progress.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,340 @@
+"""
+Live progress and throughput instrumentation for the redis_* scripts.
+
+A Progress object counts keys per node, records round-trip latency and
+pipeline-size histograms per operation and node, counts errors, and
+estimates an ETA from DBSIZE (or whatever target the tool sets). It
+reports to stderr every --progress-interval seconds, rewrites
+--status-file as JSON on the same cadence, and can serve the current
+counters as Prometheus text on --metrics-port.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds; the last bucket is +Inf
+LATENCY_BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+PIPELINE_BUCKETS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+CLUSTER = "cluster"
+
+
+def add_progress_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--progress-interval",
+        type=float,
+        default=10.0,
+        help="Seconds between progress lines on stderr (default: 10, 0 = off)",
+    )
+    parser.add_argument(
+        "--status-file",
+        type=str,
+        default=None,
+        help="Rewrite this file with a JSON progress snapshot every interval",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=0,
+        help="Serve Prometheus text metrics on this local port (default: 0 = off)",
+    )
+
+
+def node_name(node) -> str:
+    if node is None:
+        return CLUSTER
+    name = getattr(node, "name", None)
+    if name:
+        return name
+    return f"{getattr(node, 'host', node)}:{getattr(node, 'port', '')}".rstrip(":")
+
+
+def fmt_duration(seconds) -> str:
+    if seconds is None:
+        return "?"
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{(seconds % 3600) // 60:02d}m"
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value) -> None:
+        for i, upper in enumerate(self.bounds):
+            if value <= upper:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += 1
+        self.sum += value
+
+    def percentile(self, p: float):
+        # Upper bound of the bucket holding the p-th percentile
+        if not self.total:
+            return None
+        rank = p / 100.0 * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.total,
+            "sum": self.sum,
+            "buckets": dict(zip([*map(str, self.bounds), "+Inf"], self.counts)),
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+        }
+
+
+class Progress:
+    def __init__(
+        self,
+        tool: str,
+        interval: float = 10.0,
+        status_file: str | None = None,
+        metrics_port: int = 0,
+        stream=sys.stderr,
+    ):
+        self.tool = tool
+        self.interval = interval
+        self.status_file = status_file
+        self.stream = stream
+        self.lock = threading.Lock()
+
+        self.start_time = time.time()
+        self.phase = "scan"
+        self.phase_start = self.start_time
+        self.target = None
+        self.expected = {}
+        self.keys = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS_MS))
+        self.pipelines = defaultdict(lambda: Histogram(PIPELINE_BUCKETS))
+        self.last_report = self.start_time
+
+        self.server = None
+        if metrics_port:
+            self.server = self._serve_metrics(metrics_port)
+
+    @classmethod
+    def from_args(cls, tool: str, args: argparse.Namespace) -> "Progress":
+        return cls(
+            tool,
+            interval=args.progress_interval,
+            status_file=args.status_file,
+            metrics_port=args.metrics_port,
+        )
+
+    # --- recording ---
+
+    def set_phase(self, phase: str, target=None) -> None:
+        """Start a new phase; key counts and the ETA restart, latencies do not."""
+        with self.lock:
+            self.phase = phase
+            self.phase_start = time.time()
+            self.target = target
+            self.expected = {}
+            self.keys = defaultdict(int)
+
+    def set_expected(self, node, total: int) -> None:
+        with self.lock:
+            self.expected[node_name(node)] = total
+
+    def set_target(self, total) -> None:
+        with self.lock:
+            self.target = total
+
+    def add_keys(self, node, count: int = 1) -> None:
+        with self.lock:
+            self.keys[node_name(node)] += count
+        self.maybe_report()
+
+    def observe(self, op: str, seconds: float, node=None, pipeline_size=None) -> None:
+        name = node_name(node)
+        with self.lock:
+            self.latency[(op, name)].observe(seconds * 1000.0)
+            if pipeline_size is not None:
+                self.pipelines[(op, name)].observe(pipeline_size)
+
+    def error(self, kind: str, node=None) -> None:
+        with self.lock:
+            self.errors[(kind, node_name(node))] += 1
+
+    @contextmanager
+    def timed(self, op: str, node=None, pipeline_size=None):
+        """Time one round trip; exceptions are counted as errors and re-raised."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as exc:
+            self.error(f"{op}:{type(exc).__name__}", node)
+            raise
+        finally:
+            self.observe(op, time.perf_counter() - start, node, pipeline_size)
+
+    # --- reporting ---
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        with self.lock:
+            scanned = sum(self.keys.values())
+            expected = self.target
+            if expected is None and self.expected:
+                expected = sum(self.expected.values())
+            elapsed = max(now - self.phase_start, 1e-6)
+            rate = scanned / elapsed
+            eta = None
+            if expected is not None and rate > 0:
+                eta = max(expected - scanned, 0) / rate
+            nodes = {}
+            for name in sorted(set(self.keys) | set(self.expected)):
+                nodes[name] = {
+                    "keys": self.keys.get(name, 0),
+                    "expected": self.expected.get(name),
+                }
+            return {
+                "tool": self.tool,
+                "phase": self.phase,
+                "time": now,
+                "elapsed_s": now - self.start_time,
+                "phase_elapsed_s": now - self.phase_start,
+                "keys": scanned,
+                "expected": expected,
+                "keys_per_s": rate,
+                "eta_s": eta,
+                "nodes": nodes,
+                "round_trips": sum(h.total for h in self.latency.values()),
+                "errors": {f"{k}@{n}": c for (k, n), c in self.errors.items()},
+                "latency_ms": {
+                    f"{op}@{n}": h.to_dict() for (op, n), h in self.latency.items()
+                },
+                "pipeline_sizes": {
+                    f"{op}@{n}": h.to_dict() for (op, n), h in self.pipelines.items()
+                },
+            }
+
+    def format_line(self, snap: dict) -> str:
+        expected = snap["expected"]
+        if expected:
+            done = (
+                f"{snap['keys']:,}/{expected:,} ({100 * snap['keys'] / expected:.1f}%)"
+            )
+        else:
+            done = f"{snap['keys']:,}"
+        parts = [
+            f"[{self.tool}:{snap['phase']}] keys {done}",
+            f"{snap['keys_per_s']:,.0f} keys/s",
+            f"eta {fmt_duration(snap['eta_s'])}",
+            f"rtt {snap['round_trips']:,}",
+            f"errors {sum(snap['errors'].values())}",
+        ]
+        slowest = None
+        for label, hist in snap["latency_ms"].items():
+            if hist["p99"] is not None and (
+                slowest is None or hist["p99"] > slowest[1]
+            ):
+                slowest = (label, hist["p99"])
+        if slowest:
+            parts.append(f"slowest p99 {slowest[0]} <={slowest[1]}ms")
+        return " | ".join(parts)
+
+    def maybe_report(self, force: bool = False) -> None:
+        now = time.time()
+        if not force and (self.interval <= 0 or now - self.last_report < self.interval):
+            return
+        self.last_report = now
+        snap = self.snapshot()
+        if self.interval > 0:
+            print(self.format_line(snap), file=self.stream, flush=True)
+        if self.status_file:
+            tmp = f"{self.status_file}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(snap, f, indent=2)
+            os.replace(tmp, self.status_file)
+
+    def close(self) -> None:
+        self.maybe_report(force=True)
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    # --- prometheus ---
+
+    def prometheus_text(self) -> str:
+        snap = self.snapshot()
+        tool = self.tool
+        lines = [
+            "# TYPE redis_tool_keys_total counter",
+            *(
+                f'redis_tool_keys_total{{tool="{tool}",phase="{snap["phase"]}",node="{n}"}} {v["keys"]}'
+                for n, v in snap["nodes"].items()
+            ),
+            "# TYPE redis_tool_keys_per_second gauge",
+            f'redis_tool_keys_per_second{{tool="{tool}"}} {snap["keys_per_s"]:.3f}',
+            "# TYPE redis_tool_eta_seconds gauge",
+            f'redis_tool_eta_seconds{{tool="{tool}"}} {snap["eta_s"] if snap["eta_s"] is not None else "NaN"}',
+            "# TYPE redis_tool_errors_total counter",
+        ]
+        with self.lock:
+            errors = dict(self.errors)
+            latency = {
+                k: (list(h.counts), h.sum, h.total) for k, h in self.latency.items()
+            }
+        for (kind, n), count in errors.items():
+            lines.append(
+                f'redis_tool_errors_total{{tool="{tool}",kind="{kind}",node="{n}"}} {count}'
+            )
+        lines.append("# TYPE redis_tool_roundtrip_seconds histogram")
+        for (op, n), (counts, total_ms, count) in latency.items():
+            labels = f'tool="{tool}",op="{op}",node="{n}"'
+            cumulative = 0
+            for upper, bucket in zip([*LATENCY_BUCKETS_MS, None], counts):
+                cumulative += bucket
+                le = "+Inf" if upper is None else f"{upper / 1000.0:g}"
+                lines.append(
+                    f'redis_tool_roundtrip_seconds_bucket{{{labels},le="{le}"}} {cumulative}'
+                )
+            lines.append(
+                f"redis_tool_roundtrip_seconds_sum{{{labels}}} {total_ms / 1000.0}"
+            )
+            lines.append(f"redis_tool_roundtrip_seconds_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def _serve_metrics(self, port: int):
+        progress = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = progress.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 import argparse
+import random
 from collections import defaultdict
 
-from redis.cluster import RedisCluster as Redis
-from redis.cluster import ClusterNode as Node
+from redis_client import add_connection_args, get_client, get_masters, scan_node
+from redis_progress import Progress, add_progress_args
 
 
 def two_part_namespace(key: str) -> str:
@@ -28,34 +29,54 @@ def ttl_bucket(ttl_seconds: int) -> str:
     return ">=90d"
 
 
+# Log-scale (powers of ten seconds) TTL buckets for the namespace matrix
+LOG_TTL_BUCKETS = [
+    (10, "<10s"),
+    (100, "<100s"),
+    (1_000, "<17m"),
+    (10_000, "<2.8h"),
+    (100_000, "<1.2d"),
+    (1_000_000, "<12d"),
+    (10_000_000, "<116d"),
+]
+LOG_TTL_COLUMNS = (
+    ["no-ttl(-1)"] + [label for _, label in LOG_TTL_BUCKETS] + [">=116d", "other"]
+)
+
+FORECAST_HORIZONS = [("1h", 3600), ("1d", 86400), ("1w", 7 * 86400)]
+
+
+def ttl_log_bucket(ttl_seconds: int) -> str:
+    if ttl_seconds == -1:
+        return "no-ttl(-1)"
+    if ttl_seconds < 0:
+        return "other"
+    for upper, label in LOG_TTL_BUCKETS:
+        if ttl_seconds < upper:
+            return label
+    return ">=116d"
+
+
+def sizeof_fmt(num, suffix="B"):
+    for unit in ["", "Ki", "Mi", "Gi", "Ti", "Pi", "Ei", "Zi"]:
+        if abs(num) < 1024.0:
+            return f"{num:3.1f}{unit}{suffix}"
+        num /= 1024.0
+    return f"{num:.1f}Yi{suffix}"
+
+
 def decode_key(x):
     if isinstance(x, (bytes, bytearray)):
         return x.decode("utf-8", errors="replace")
     return str(x)
 
 
-def get_masters(client):
-    masters = [
-        n for n in client.get_nodes() if getattr(n, "server_type", None) == "master"
-    ]
-    if masters:
-        return masters
-    # fallback for older redis-py-cluster
-    try:
-        return client.get_primaries()
-    except Exception:
-        return [Redis.ALL_NODES]  # last resort
-
-
 def main():
     p = argparse.ArgumentParser(
         description="Investigate Redis Cluster keyspace: counts + TTL health + expiry signals"
     )
-    p.add_argument("host", type=str, help="Redis cluster hostname or IP address")
-    p.add_argument("password", type=str, help="Password for Redis authentication")
-    p.add_argument(
-        "--port", type=int, default=6379, help="Redis server port (default: 6379)"
-    )
+    add_connection_args(p)
+    add_progress_args(p)
     p.add_argument(
         "--match", type=str, default="*", help="Pattern to match keys (default: '*')"
     )
@@ -77,14 +98,44 @@ def main():
         default=30,
         help="Number of top key namespaces to display (default: 30)",
     )
+    p.add_argument(
+        "--memory-sample",
+        type=float,
+        default=1.0,
+        help="Percentage of visited keys to run MEMORY USAGE on for the expiry "
+        "forecast (default: 1.0, 0 = disabled)",
+    )
     args = p.parse_args()
+    memory_rate = max(0.0, min(args.memory_sample, 100.0)) / 100.0
 
-    client = Redis(startup_nodes=[Node(args.host, args.port)], password=args.password)
+    client = get_client(args)
 
     masters = get_masters(client)
+    progress = Progress.from_args("redis_ttl_audit", args)
+    dbsize_total = 0
+    for node in masters:
+        try:
+            size = client.dbsize(target_nodes=node)
+        except Exception:
+            continue
+        progress.set_expected(node, size)
+        dbsize_total += size
+    # --limit only becomes the ETA target when it stops the scan before DBSIZE
+    if args.limit and (not dbsize_total or args.limit < dbsize_total):
+        progress.set_target(args.limit)
 
     ns_counts = defaultdict(int)
     ttl_counts = defaultdict(int)
+    ns_ttl_counts = defaultdict(lambda: defaultdict(int))
+
+    # Expiry forecast from the memory-sampled keys (raw sampled bytes)
+    mem_sampled = 0
+    mem_errors = 0
+    mem_total = 0
+    mem_expiring = defaultdict(int)
+    ns_mem_bytes = defaultdict(int)
+    ns_no_ttl_bytes = defaultdict(int)
+    ns_expiring = defaultdict(lambda: defaultdict(int))
 
     total = 0
     missing = 0
@@ -98,29 +149,52 @@ def main():
             pass
 
     for node in masters:
-        node_client = client.get_node_client(node)
         cursor = 0
         while True:
-            cursor, keys = node_client.scan(
-                cursor=cursor, match=args.match, count=args.count
-            )
+            with progress.timed("scan", node):
+                cursor, keys = scan_node(client, node, cursor, args.match, args.count)
 
             for k in keys:
                 key = decode_key(k)
                 ns = two_part_namespace(key)
                 ns_counts[ns] += 1
                 total += 1
+                progress.add_keys(node)
 
                 # TTL
                 try:
-                    ttl = client.ttl(key)
+                    with progress.timed("ttl", node):
+                        ttl = client.ttl(key)
                     b = ttl_bucket(ttl)
                     ttl_counts[b] += 1
+                    ns_ttl_counts[ns][ttl_log_bucket(ttl)] += 1
                     if ttl == -2:
                         missing += 1
                 except Exception:
                     ttl_errors += 1
                     ttl_counts["(ttl-error)"] += 1
+                    ns_ttl_counts[ns]["other"] += 1
+                    ttl = None
+
+                # Memory usage for a sample of keys, joined with the TTL
+                if ttl is not None and ttl != -2 and random.random() < memory_rate:
+                    try:
+                        with progress.timed("memory_usage", node):
+                            bytes_used = client.memory_usage(key)
+                    except Exception:
+                        bytes_used = None
+                        mem_errors += 1
+                    if bytes_used is not None:
+                        mem_sampled += 1
+                        mem_total += bytes_used
+                        ns_mem_bytes[ns] += bytes_used
+                        if ttl == -1:
+                            ns_no_ttl_bytes[ns] += bytes_used
+                        else:
+                            for horizon, seconds in FORECAST_HORIZONS:
+                                if ttl <= seconds:
+                                    mem_expiring[horizon] += bytes_used
+                                    ns_expiring[ns][horizon] += bytes_used
 
                 if args.limit and total >= args.limit:
                     break
@@ -130,6 +204,8 @@ def main():
             if cursor == 0:
                 break
 
+    progress.close()
+
     # --- Snapshot INFO stats after scan ---
     info_after = []
     for node in masters:
@@ -179,6 +255,71 @@ def main():
     ]:
         print(f"{ns} {c}")
 
+    top_namespaces = [
+        ns
+        for ns, _ in sorted(ns_counts.items(), key=lambda kv: kv[1], reverse=True)[
+            : args.top_ns
+        ]
+    ]
+    if top_namespaces:
+        ns_width = max(len(ns) for ns in top_namespaces)
+        col_width = max(len(col) for col in LOG_TTL_COLUMNS)
+        print("\nNamespace x TTL bucket (log scale, key counts):")
+        print(
+            f"{'Namespace':<{ns_width}} | "
+            + " | ".join(f"{col:>{col_width}}" for col in LOG_TTL_COLUMNS)
+        )
+        print("-" * (ns_width + (col_width + 3) * len(LOG_TTL_COLUMNS)))
+        for ns in top_namespaces:
+            row = ns_ttl_counts[ns]
+            print(
+                f"{ns:<{ns_width}} | "
+                + " | ".join(
+                    f"{row.get(col, 0):>{col_width}}" for col in LOG_TTL_COLUMNS
+                )
+            )
+
+    if memory_rate > 0:
+        # Scale sampled bytes up to the visited keyspace
+        scale = total / mem_sampled if mem_sampled else 0.0
+        print(
+            f"\nExpiry forecast (MEMORY USAGE on {mem_sampled} sampled keys, "
+            f"scaled x{scale:.1f}, errors: {mem_errors}):"
+        )
+        print(f"{'visited keys':>14}: {sizeof_fmt(mem_total * scale)}")
+        for horizon, _ in FORECAST_HORIZONS:
+            print(
+                f"{'next ' + horizon:>14}: {sizeof_fmt(mem_expiring[horizon] * scale)}"
+            )
+        print(
+            f"{'never (no-ttl)':>14}: "
+            f"{sizeof_fmt(sum(ns_no_ttl_bytes.values()) * scale)}"
+        )
+
+        ranked = sorted(
+            ns_mem_bytes.items(),
+            key=lambda kv: (ns_no_ttl_bytes.get(kv[0], 0), kv[1]),
+            reverse=True,
+        )[: args.top_ns]
+        if ranked:
+            ns_width = max(len(ns) for ns, _ in ranked)
+            print("\nBytes by namespace (sorted by no-ttl bytes, scaled):")
+            print(
+                f"{'Namespace':<{ns_width}} | {'Total':>10} | {'No TTL':>10} | "
+                + " | ".join(f"{'<=' + h:>10}" for h, _ in FORECAST_HORIZONS)
+            )
+            print("-" * (ns_width + 13 * (2 + len(FORECAST_HORIZONS))))
+            for ns, ns_bytes in ranked:
+                expiring = ns_expiring.get(ns, {})
+                print(
+                    f"{ns:<{ns_width}} | {sizeof_fmt(ns_bytes * scale):>10} | "
+                    f"{sizeof_fmt(ns_no_ttl_bytes.get(ns, 0) * scale):>10} | "
+                    + " | ".join(
+                        f"{sizeof_fmt(expiring.get(h, 0) * scale):>10}"
+                        for h, _ in FORECAST_HORIZONS
+                    )
+                )
+
     print("\nExpiry/eviction signals (INFO stats delta during scan):")
     print(
         f"expired_keys:  {expired_before} -> {expired_after}  (Δ {expired_after-expired_before})"
@@ -1,22 +1,3 @@
-
-uv run ./es_performance_transactions.py --accounts-file accounts --root-size 25 --range 1m
-uv run ./es_performance_transactions.py --accounts-file accounts --root-size 50 --range 1m
-uv run ./es_performance_transactions.py --accounts-file accounts --root-size 100 --range 1m
-uv run ./es_performance_transactions.py --accounts-file accounts --root-size 200 --range 1m
-
-
-uv run ./es_performance_transactions.py --accounts-file accounts --root-size 25 --range 3m
-uv run ./es_performance_transactions.py --accounts-file accounts --root-size 50 --range 3m
-uv run ./es_performance_transactions.py --accounts-file accounts --root-size 100 --range 3m
-uv run ./es_performance_transactions.py --accounts-file accounts --root-size 200 --range 3m
-
-
-uv run ./es_performance_transactions.py --accounts-file accounts --root-size 25 --range 6m
-uv run ./es_performance_transactions.py --accounts-file accounts --root-size 50 --range 6m
-uv run ./es_performance_transactions.py --accounts-file accounts --root-size 100 --range 6m
-uv run ./es_performance_transactions.py --accounts-file accounts --root-size 200 --range 6m
-
-uv run ./es_performance_transactions.py --accounts-file accounts --root-size 25 --range 12m
-uv run ./es_performance_transactions.py --accounts-file accounts --root-size 50 --range 12m
-uv run ./es_performance_transactions.py --accounts-file accounts --root-size 100 --range 12m
-uv run ./es_performance_transactions.py --accounts-file accounts --root-size 200 --range 12m
+# One process, one warm connection pool, one consolidated report with a
+# range x root-size matrix (es_reports/es_performance_report_1m-3m-6m-12m_root25-50-100-200.md)
+uv run ./es_performance_transactions.py --accounts-file accounts --root-size 25,50,100,200 --range 1m,3m,6m,12m